@@ -3,13 +3,27 @@
 # Den bruker Firebase som database og er koblet til frontend gjennom et API-kall.
 # Importerer nødvendige moduler og funksjoner.
 from flask import Blueprint, request, jsonify # Flask-moduler for routing og HTTP-respons.
-from firebase_config import db                # Firebase Firestore-klienten.
-from firebase_admin import firestore          # Firebase-admin for spesielle operasjoner.
+from flask import Response, stream_with_context # Strømmer store svar i biter i stedet for én stor liste.
+from storage import get_store                 # Lagringslaget (Firestore, minne eller SQLite).
+from storage.base import public_task, encode_cursor, decode_cursor, task_record # Oppgaveformat og sidevisning.
+from storage.base import completed_at, empty_stats
+from storage.base import MemberNotFound, TaskNotFound, AccessDenied, ContentionError
 from auth import verify_firebase_token        # Funksjon for å verifisere JWT-token fra Firebase.
+from member_cache import member_cache, json_entry # Lesecache for medlemmer, må invalideres ved endringer.
+from ownership import ownership               # Indeks over hvilken admin som eier hvert medlem.
+from profile_cache import profile_cache       # Brukerprofiler (med admin-PIN) i minnet.
+from elevation import ELEVATION_TTL, issue_token, is_elevated, elevation_enabled, check_pin, hash_pin, pin_attempts
+from changes import change_hub, format_event, HEARTBEAT_SECONDS, MAX_THREAD_STREAMS # Endringsstrømmen (GET /changes).
+from idempotency import idempotent            # Idempotency-Key på ruter som oppretter eller endrer data.
+from compaction import compact_admin, cutoff, TASK_ARCHIVE_DAYS # Flytter gamle fullførte oppgaver til historikken.
 import uuid                                   # Genererer ulike ID-er.
+import time                                   # Tidsstempel for oppgaver som opprettes i batch.
+import json                                   # Serialiserer medlemmer ett og ett når svaret strømmes.
+import logging                                # Logger uten å blokkere forespørselen (se logging_setup.py).
 
 # Oppretter et Flask Blueprint for for å gruppere admin-relaterte routes.
 admin = Blueprint('admin', __name__)
+log = logging.getLogger(__name__)
 
 # Funksjon for å hente UID fra token i header.
 # UID blir returnert hvis token er gydlig, ellers blir det en feilmedling.
@@ -20,10 +34,10 @@ def get_uid_from_token():
     
     try:
         decoded = verify_firebase_token(token) # Dekoder token og henter brukerinfo. 
-        print(" Firebase UID:", decoded["uid"]) # Debug-utskrift av UID. 
+        log.debug("Firebase UID: %s", decoded["uid"]) # Kun med LOG_LEVELS=admin=DEBUG, og kan samples.
         return decoded["uid"], None, None # Returnerer UID og ingen feil.
     except Exception as e:
-        print("Token verifisereing feilet:", e) # Logger eventuelle feil.
+        log.info("Token verifisereing feilet: %s", e) # Logger eventuelle feil.
         return None, jsonify({"error": "Ugyldig token"}), 401 # Returnerer feil ved ugyldig token.
 
 # Endepunkt: Verifiserer at admin-PIN stemmer med det som er lagert i databasen.
@@ -37,21 +51,66 @@ def verify_admin_pin():
 
     if not pin:
         return jsonify({"error": "PIN er påkrevd!"}), 400
+
+    # Uten SECRET_KEY kan admin-tokenet ikke signeres trygt, så PIN-en sjekkes ikke engang.
+    if not elevation_enabled():
+        log.error("SECRET_KEY er ikke satt, /verify-pin er slått av.")
+        return jsonify({"error": "Admin-PIN er ikke tilgjengelig på serveren."}), 503
+
+    # Sperrer brukeren en stund etter for mange forsøk, så PIN-en ikke kan gjettes.
+    # Forsøket telles før PIN-en sjekkes, og nullstilles igjen hvis PIN-en er riktig.
+    wait = pin_attempts.reserve(uid)
+    if wait:
+        response = jsonify({"error": "For mange forsøk, prøv igjen senere."})
+        response.headers['Retry-After'] = str(wait)
+        return response, 429
     
-    user_doc = db.collection('users').document(uid).get()
-    if not user_doc.exists:
+    user_data = profile_cache.by_uid(uid)
+    if user_data is None:
         return jsonify({"error": "Bruker ikke funnet!"}), 404
     
-    user_data = user_doc.to_dict()
-    stored_pin = user_data.get('admin_pin')
-
-    if stored_pin == pin:
-        return jsonify({"message": "PIN er gyldig!"}), 200
-    else:
+    valid, upgrade = check_pin(user_data.get('admin_pin'), pin)
+    if not valid:
         return jsonify({"error": "Ugyldig PIN!"}), 401
 
+    pin_attempts.reset(uid)
+    if upgrade:
+        # PIN lagret i klartekst (eldre brukere) erstattes med en hash.
+        get_store().users.update(uid, {"admin_pin": hash_pin(pin)})
+        profile_cache.invalidate(uid)
+
+    # Tokenet lar frontend utføre admin-handlinger en stund uten å spørre om PIN på nytt.
+    return jsonify({
+        "message": "PIN er gyldig!",
+        "elevationToken": issue_token(uid),
+        "expiresIn": ELEVATION_TTL,
+    }), 200
+
+# Funksjon: Lager et nytt medlem. Brukes av create-member, batch og import (bulk.py).
+def new_member_data(name, code, color, admin_id):
+    return {
+        "name": name,
+        "code": code,
+        "money": 0,
+        "character": {
+            "type": "pinnefigur", # Dette er en standard karaktertype som gjelder alle medlemmer.
+            "color": color,
+        },
+        "adminId": admin_id
+    }
+
+# Funksjon: Lager en ny oppgave. Brukes av add-task, batch og import (bulk.py).
+def new_task_data(title, price, task_id=None):
+    return {
+        "id": task_id or str(uuid.uuid4()), # Dette er en unik ID for hver oppgave som opprettes.
+        "title": title,
+        "price": price,
+        "completed": False
+    }
+
 # Endepunkt: Oppretter et nytt medlem knyttet til admin som er logget inn.     
 @admin.route('/create-member', methods=['POST'])
+@idempotent
 def create_member():
     uid, error, code = get_uid_from_token()
     if error: return error, code
@@ -65,22 +124,14 @@ def create_member():
         return jsonify({"error": "Alle felt er påkrevd!"}), 400
         
     try:
-            member_data = {
-                "name": name,
-                "code": code,
-                "money": 0,
-                "tasks": [],
-                "character": {
-                    "type": "pinnefigur", # Dette er en standard karaktertype som gjelder alle medlemmer.
-                    "color": color,
-            },
-            "adminId": uid
-            }
+            member_data = new_member_data(name, code, color, uid)
 
-            doc_ref = db.collection('members').document() # Her opprettes et nytt dokument med en tilfeldig ID.
-            doc_ref.set(member_data)
+            member_id = get_store().members.create(member_data) # Her opprettes et nytt dokument med en tilfeldig ID.
+            ownership.set(member_id, uid)
+            member_cache.invalidate(uid)
+            change_hub.member_created(uid, member_id, member_data)
 
-            return jsonify({"message": "Medlem opprettet!", "member_id": doc_ref.id}), 201
+            return jsonify({"message": "Medlem opprettet!", "member_id": member_id}), 201
     except Exception as e:
             return jsonify({"error": str(e)}), 500
 
@@ -91,41 +142,169 @@ def delete_member(member_id):
     if error: return error, code
 
     try:
-        member_ref = db.collection('members').document(member_id)
-        doc = member_ref.get()
-
-        if not doc.exists:
+        # Eierskapet sjekkes mot indeksen, så medlemmet trenger ikke leses før det slettes.
+        status = ownership.check(member_id, uid)
+        if status == 404:
             return jsonify({"error": "Medlem ikke funnet!"}), 404
         
-        if doc.to_dict().get("adminId") != uid:
+        if status == 403:
             return jsonify({"error": "Ingen tilgang til å slette dette medlemmet."}), 403
         
-        member_ref.delete()
+        store = get_store()
+        store.members.delete(member_id)
+        store.tasks.delete_for_member(member_id) # Oppgavene ligger i egen samling og må slettes separat.
+        store.history.delete_for_member(member_id)
+        ownership.discard(member_id)
+        member_cache.invalidate(uid, member_id)
+        change_hub.member_deleted(uid, member_id)
         return jsonify({"message": "Medlem slettet!"}), 200
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Funksjon: Leser alle medlemmene til admin med oppgaver fra lagringslaget.
+def load_members(uid):
+    store = get_store()
+    members = []
+    tasks = store.tasks.list_by_admin(uid) # Alle oppgavene til adminen hentes med én spørring.
+
+    for member_id, data in store.members.list_by_admin(uid):
+        ownership.set(member_id, uid) # Varmer opp eierskapsindeksen.
+        data['id'] = member_id # Legger til ID til dokumentet i resultatet.
+        data['tasks'] = [public_task(task) for task in tasks.get(member_id, [])]
+        members.append(data)
+    return members
+
+# Funksjon: Lager svaret for en cachet lesing. Svarer 304 uten body hvis klienten
+# sender If-None-Match med samme ETag. Svaret er per admin og må alltid valideres på nytt.
+def conditional_json(entry):
+    response = Response(entry["body"], mimetype='application/json')
+    response.set_etag(entry["etag"])
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+# Funksjon: Som load_member, men returnerer et ferdig serialisert svar med ETag.
+def load_member_entry(member_id, limit=None, after=None):
+    data = load_member(member_id, limit, after)
+    return json_entry(data) if data is not None else None
+
+# Felter som kan velges med ?fields= på /members. ID-en er alltid med.
+MEMBER_FIELDS = ('name', 'code', 'money', 'character', 'cosmetics', 'equippedCosmetics', 'tasks')
+
+# Maks antall medlemmer per side på /members.
+MAX_MEMBERS_PAGE = 500
+
+# Funksjon: Strømmer medlemmene til admin som JSON, ett medlem om gangen.
+# fields sendes videre til lagringen slik at kun de valgte feltene leses. Oppgaver hentes bare
+# når de er valgt, og da kun for medlemmene på siden. Med limit/after pakkes lista i et objekt
+# med nextCursor, ellers returneres en ren liste som før.
+def stream_members(uid, limit=None, after=None, fields=None):
+    store = get_store()
+    with_tasks = fields is None or 'tasks' in fields
+    store_fields = [field for field in fields if field != 'tasks'] if fields is not None else None
+    members = store.members.list_by_admin(uid, limit=limit, after=after, fields=store_fields)
+
+    tasks = {}
+    if with_tasks:
+        members = list(members) # Må vite hvilke medlemmer som er på siden før oppgavene hentes.
+        tasks = store.tasks.list_by_members([member_id for member_id, _ in members])
+
+    paged = limit is not None or after is not None
+    yield '{"members": [' if paged else '['
+    count = 0
+    last_id = None
+    for member_id, data in members:
+        ownership.set(member_id, uid) # Spørringen er filtrert på admin, så eieren er kjent.
+        data['id'] = member_id
+        if with_tasks:
+            data['tasks'] = [public_task(task) for task in tasks.get(member_id, [])]
+        yield (', ' if count else '') + json.dumps(data)
+        count += 1
+        last_id = member_id
+
+    if paged:
+        next_cursor = last_id if limit is not None and count == limit else None # Det kan finnes flere medlemmer.
+        yield '], "nextCursor": ' + json.dumps(next_cursor) + '}'
+    else:
+        yield ']'
+
+# Funksjon: Leser ett medlem med oppgaver. Returnerer None hvis medlemmet ikke finnes.
+def load_member(member_id, limit=None, after=None):
+    store = get_store()
+    data = store.members.get(member_id)
+    if data is None:
+        ownership.discard(member_id)
+        return None
+
+    ownership.set(member_id, data.get('adminId'))
+    tasks = store.tasks.list(member_id, limit=limit, after=after)
+    data['tasks'] = [public_task(task) for task in tasks]
+    if limit is not None and len(tasks) == limit:
+        data['nextCursor'] = encode_cursor(tasks[-1]) # Det kan finnes flere oppgaver.
+    return data
+
 # Endepunkt: Henter alle medlemmene som tilhører innlogget admin.    
 @admin.route('/members', methods=['GET'])
 def get_members():
     uid, error, code = get_uid_from_token()
     if error: return error, code
 
-    try: 
-        snapshot = db.collection('members').where('adminId', '==', uid).stream()
-        members = []
-
-        for doc in snapshot:
-            data = doc.to_dict()
-            data['id'] = doc.id # Legger til ID til dokumentet i resultatet.
-            members.append(data)
+    limit = request.args.get('limit', type=int)
+    after = request.args.get('after') or None
+    fields = request.args.get('fields')
 
-        return jsonify(members), 200
+    try: 
+        # Standardsvaret (alle medlemmer med alle felter) går gjennom cachen.
+        if limit is None and after is None and fields is None:
+            entry = member_cache.members(uid, lambda: json_entry(load_members(uid)))
+            return conditional_json(entry) # Ikke (svar, 200), ellers overstyres en eventuell 304.
+
+        if limit is not None and not 0 < limit <= MAX_MEMBERS_PAGE:
+            return jsonify({"error": f"limit må være mellom 1 og {MAX_MEMBERS_PAGE}."}), 400
+        if fields is not None:
+            fields = [field.strip() for field in fields.split(',') if field.strip()]
+            unknown = [field for field in fields if field not in MEMBER_FIELDS]
+            if unknown:
+                return jsonify({"error": f"Ukjente felter: {', '.join(unknown)}"}), 400
+
+        body = stream_members(uid, limit=limit, after=after, fields=fields)
+        return Response(stream_with_context(body), mimetype='application/json'), 200
     
     except Exception as e:
        return jsonify({"error": str(e)}), 500
-    
+
+# Endepunkt: Strømmer endringer i medlemmene til innlogget admin som server-sent events.
+# Se changes.py for hendelsene. Klienten henter /members først og oppdaterer deretter lista fra strømmen.
+# Her holder hver strøm av en tråd, så antallet er begrenset (MAX_THREAD_STREAMS). asgi.py har sin egen
+# versjon av ruten som ikke bruker tråder.
+@admin.route('/changes', methods=['GET'])
+def get_changes():
+    uid, error, code = get_uid_from_token()
+    if error: return error, code
+
+    subscription = change_hub.subscribe(uid, max_total=MAX_THREAD_STREAMS)
+    if subscription is None:
+        return jsonify({"error": "For mange åpne tilkoblinger."}), 429
+
+    def events():
+        try:
+            yield "retry: 3000\n\n" # Nettleseren kobler til på nytt etter 3 sekunder.
+            yield format_event({"type": "ready"})
+            while True:
+                event = subscription.get(timeout=HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": heartbeat\n\n"
+                else:
+                    yield format_event(event)
+        finally:
+            change_hub.unsubscribe(subscription) # Kjøres også når klienten kobler fra.
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # Ikke buffer strømmen i nginx.
+    return response
+
 
 # Endepunkt: Oppdaterer informasjon om et spesifikt medlem.
 @admin.route('/update-member/<member_id>', methods=['PUT'])
@@ -135,13 +314,13 @@ def update_member(member_id):
 
     try:
         data = request.get_json()
-        allowed_fields = ['name', 'money', 'character', 'cosmetics', 'equippedCosmetics', 'tasks' ]
-        member_ref = db.collection('members').document(member_id)
+        allowed_fields = ['name', 'money', 'character', 'cosmetics', 'equippedCosmetics' ]
+        store = get_store()
 
-        doc = member_ref.get()
-        if not doc.exists:
+        status = ownership.check(member_id, uid)
+        if status == 404:
             return jsonify({"error": "Medlem ikke funnet!"}), 404
-        if doc.to_dict().get("adminId") != uid:
+        if status == 403:
             return jsonify({"error": "Ingen tilgang!"}), 403
         
         update_data = {}
@@ -158,18 +337,34 @@ def update_member(member_id):
             if field in data and field != 'character':
                 update_data[field] = data[field]
 
-        if not update_data:
+        # Oppgavene lagres for seg, og kun de som faktisk er endret blir skrevet.
+        # Status og pris på eksisterende oppgaver endres ikke her, bare gjennom complete-rutene.
+        tasks = data.get('tasks')
+        if not update_data and not isinstance(tasks, list):
             return jsonify({"error": "Ingen gydlige felter å oppdatere."}), 400
+        if isinstance(tasks, list) and not all(isinstance(task, dict) and task.get('id') and isinstance(task['id'], str)
+                                               for task in tasks):
+            return jsonify({"error": "Alle oppgaver må ha en id."}), 400
         
-        member_ref.update(update_data)
+        if update_data and not store.members.update(member_id, update_data):
+            ownership.discard(member_id) # Medlemmet er slettet av en annen prosess.
+            return jsonify({"error": "Medlem ikke funnet!"}), 404
+        if isinstance(tasks, list):
+            update_data["tasks"] = store.tasks.replace(member_id, uid, tasks) # Hele lista erstattes hos klientene.
+        member_cache.invalidate(uid, member_id)
+        change_hub.member_updated(uid, member_id, changes=update_data)
 
         return jsonify ({"message": "Medlem oppdatert!"}), 200
     
+    except MemberNotFound:
+        ownership.discard(member_id) # Medlemmet er slettet av en annen prosess.
+        return jsonify({"error": "Medlem ikke funnet!"}), 404
     except Exception as e:
         return jsonify({"Error": str(e)}), 500
 
 # Endepunkt: Legger til en ny oppgave knyttet til et medlem.    
 @admin.route('/add-task/<member_id>', methods=['POST'])
+@idempotent
 def add_task(member_id):
     uid, error, code = get_uid_from_token()
     if error: return error, code
@@ -181,96 +376,367 @@ def add_task(member_id):
     if not title or price is None:
         return jsonify({"error": "Tittel og pris er påkrevd"}), 400
     
-    member_ref = db.collection('members').document(member_id)
-    doc = member_ref.get()
-    if not doc.exists:
+    status = ownership.check(member_id, uid)
+    if status == 404:
         return jsonify({"error": "Medlem ikke funnet!"}),404
-    if doc.to_dict().get("adminId") != uid:
+    if status == 403:
         return jsonify({"error": "Ingen tilgang!"}), 403
     
-    new_task = {
-        "id": str(uuid.uuid4()), # Dette er en unik ID for hver oppgave som opprettes.
-        "title": title,
-        "price": price,
-        "completed": False
-    }
+    new_task = new_task_data(title, price)
     
-    # Her brukes ArrayUnion for å legge til en ny oppgave uten at den overskiver allerede eksisterende oppgaver.
-    member_ref.update({
-        "tasks": firestore.ArrayUnion([new_task])
-    })
+    # Oppgaven lagres som en egen post, så medlemsdokumentet blir ikke skrevet.
+    try:
+        get_store().tasks.add(member_id, uid, new_task)
+    except MemberNotFound:
+        ownership.discard(member_id) # Medlemmet er slettet av en annen prosess.
+        return jsonify({"error": "Medlem ikke funnet!"}), 404
+    member_cache.invalidate(uid, member_id)
+    change_hub.member_updated(uid, member_id, tasks=[new_task])
 
     return jsonify({"message": "Oppgave lagt til!"}), 200
 
 # Endepunkt: Henter informasjon for et spesifikt medlem.
+# Oppgavene kan hentes side for side med ?limit=<antall>&after=<nextCursor fra forrige side>.
 @admin.route('/member/<member_id>', methods=['GET'])
 def get_member(member_id):
     uid, error, code = get_uid_from_token()
     if error: return error, code
 
     try:
-        doc = db.collection('members').document(member_id).get()
-        if not doc.exists:
+        limit = request.args.get('limit', type=int)
+        after = request.args.get('after')
+        if limit is not None and limit <= 0:
+            return jsonify({"error": "limit må være et positivt tall."}), 400
+        try:
+            after = decode_cursor(after) if after else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Tilgangen sjekkes før medlemmet leses, så andres medlemmer blir aldri hentet.
+        status = ownership.check(member_id, uid)
+        if status == 404:
             return jsonify({"error": "Medlem ikke funnet!"}), 404
-        
-        data = doc.to_dict()
+        if status == 403:
+            return jsonify({"error": "Ingen tilgang!"}), 403
 
-        if data.get("adminId") != uid:
+        # Hele medlemmet caches ferdig serialisert. Sider med oppgaver hentes alltid direkte.
+        if limit is None and after is None:
+            entry = member_cache.member(member_id, lambda: load_member_entry(member_id))
+        else:
+            entry = load_member_entry(member_id, limit, after)
+
+        if entry is None:
+            return jsonify({"error": "Medlem ikke funnet!"}), 404
+
+        if entry["adminId"] != uid:
             return jsonify({"error": "Ingen tilgang!"}), 403
-        
-        return jsonify(data), 200
+
+        return conditional_json(entry)
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+# Maks antall oppgaver per side i historikken.
+MAX_HISTORY_PAGE = 500
+
+# Endepunkt: Henter arkiverte oppgaver for et medlem, side for side med ?limit=<antall>&after=<nextCursor>.
+@admin.route('/member/<member_id>/history', methods=['GET'])
+def get_member_history(member_id):
+    uid, error, code = get_uid_from_token()
+    if error: return error, code
+
+    limit = request.args.get('limit', 50, type=int)
+    if not 0 < limit <= MAX_HISTORY_PAGE:
+        return jsonify({"error": f"limit må være mellom 1 og {MAX_HISTORY_PAGE}."}), 400
+    try:
+        after = request.args.get('after')
+        after = decode_cursor(after) if after else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    status = ownership.check(member_id, uid)
+    if status == 404:
+        return jsonify({"error": "Medlem ikke funnet!"}), 404
+    if status == 403:
+        return jsonify({"error": "Ingen tilgang!"}), 403
+
+    try:
+        records = get_store().history.list(member_id, limit=limit, after=after)
+        page = {"tasks": [dict(public_task(record), completedAt=completed_at(record)) for record in records]}
+        page["nextCursor"] = encode_cursor(records[-1]) if len(records) == limit else None
+        return jsonify(page), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Endepunkt: Henter tellerne for innlogget admin (hele husstanden), eller for ett medlem med ?memberId=<id>.
+# Tellerne holdes oppdatert ved hver skriving, så dette er alltid én lesing uansett hvor mye historikk det er.
+@admin.route('/stats', methods=['GET'])
+def get_stats():
+    uid, error, code = get_uid_from_token()
+    if error: return error, code
+
+    member_id = request.args.get('memberId')
+    try:
+        if member_id is None:
+            return jsonify({"stats": get_store().stats.get(uid)}), 200
+
+        status = ownership.check(member_id, uid)
+        if status == 404:
+            return jsonify({"error": "Medlem ikke funnet!"}), 404
+        if status == 403:
+            return jsonify({"error": "Ingen tilgang!"}), 403
+        member = get_store().members.get(member_id)
+        if member is None:
+            ownership.discard(member_id)
+            return jsonify({"error": "Medlem ikke funnet!"}), 404
+        return jsonify({"memberId": member_id, "stats": dict(empty_stats(), **member.get('stats', {}))}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Endepunkt: Flytter fullførte oppgaver eldre enn olderThanDays (standard TASK_ARCHIVE_DAYS) til historikken
+# for alle medlemmene til innlogget admin.
+@admin.route('/compact-tasks', methods=['POST'])
+def compact_tasks():
+    uid, error, code = get_uid_from_token()
+    if error: return error, code
+
+    data = request.get_json(silent=True) or {}
+    days = data.get('olderThanDays', TASK_ARCHIVE_DAYS)
+    if isinstance(days, bool) or not isinstance(days, (int, float)) or days < 0:
+        return jsonify({"error": "olderThanDays må være et tall som ikke er negativt."}), 400
+
+    try:
+        archived = compact_admin(get_store(), uid, cutoff(days))
+        for member_id, records in archived.items():
+            member_cache.invalidate(uid, member_id)
+            change_hub.member_updated(uid, member_id, removed_tasks=[record['id'] for record in records])
+        return jsonify({
+            "message": "Oppgaver arkivert!",
+            "members": len(archived),
+            "archived": sum(len(records) for records in archived.values()),
+        }), 200
+    except Exception as e:
+        log.exception("Komprimering feilet!")
+        return jsonify({"error": str(e)}), 500
     
 
 # Endepunkt: Markerer en oppgave som fullført og øker saldoen til medlemmet.
 @admin.route('/complete-task/<member_id>/<task_id>', methods=['POST'])
+@idempotent
 def complete_task(member_id, task_id):
     uid, error, code = get_uid_from_token()
     if error: return error, code
 
+    # Krever et gyldig admin-token fra /verify-pin. Sjekkes lokalt, uten å lese databasen.
+    if not is_elevated(uid):
+        return jsonify({"error": "Admin-PIN må bekreftes."}), 403
+
     try:
-        member_ref = db.collection('members').document(member_id)
-        doc = member_ref.get()
-        if not doc.exists:
+        status = ownership.check(member_id, uid)
+        if status == 404:
             return jsonify({"error": "Medlem ikke funnet!"}), 404
-        
-        member = doc.to_dict()
-        if member.get("adminId") != uid:
+        if status == 403:
             return jsonify({"error": "Ingen tilgang!"}), 403
-            
-        tasks = member.get("tasks", [])
-        updated_tasks = []
-        added_money = 0
-        
-        # Går gjennom de ulike oppgavene som finnes og markerer riktig oppgave som fullført.
-        for task in tasks:
-            if task["id"] == task_id and not task.get("completed"):
-                task["completed"] = True
-                added_money = task["price"]
-            updated_tasks.append(task)
 
-        new_money = member.get("money", 0) + added_money
-
-        member_ref.update({
-            "tasks": updated_tasks,
-            "money": new_money
-        })
+        # Oppgaven og saldoen oppdateres atomisk i lagringslaget, og eierskapet sjekkes på nytt i samme lesing.
+        # En oppgave som allerede er fullført gir ikke penger på nytt.
+        task, added_money, new_money = get_store().tasks.complete(member_id, task_id, admin_id=uid)
+        member_cache.invalidate(uid, member_id)
+        if added_money:
+            change_hub.member_updated(uid, member_id, changes={"money": new_money}, tasks=[task])
 
         return jsonify({
             "message": "Oppgave fullført!",
             "UpdatedMember": {
-                "tasks": updated_tasks,
+                "task": public_task(task),
                 "money": new_money
             }
         }), 200
     
+    except MemberNotFound:
+        ownership.discard(member_id)
+        return jsonify({"error": "Medlem ikke funnet!"}), 404
+    except AccessDenied:
+        return jsonify({"error": "Ingen tilgang!"}), 403
+    except TaskNotFound:
+        return jsonify({"error": "Oppgave ikke funnet!"}), 404
+    except ContentionError as e:
+        return jsonify({"error": str(e)}), 409 # For mange samtidige endringer, klienten kan prøve igjen.
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Maks antall elementer i én batch-forespørsel. Fullføring skrives i én Firestore-batch (maks 500 skrivinger)
+# med oppgaven og medlemmet per element pluss tellerne til admin: 249 * 2 + 1 = 499.
+MAX_BATCH_ITEMS = 249
+
+# Feilmeldinger for hvert element i batch-svarene.
+ACCESS_ERRORS = {404: "Medlem ikke funnet!", 403: "Ingen tilgang!"}
+STORAGE_ERRORS = {
+    MemberNotFound: (404, "Medlem ikke funnet!"),
+    AccessDenied: (403, "Ingen tilgang!"),
+    TaskNotFound: (404, "Oppgave ikke funnet!"),
+}
+
+# Funksjon: Leser og validerer listen med elementer i en batch-forespørsel.
+# Returnerer (liste, None) eller (None, feilrespons).
+def get_batch_items(field):
+    items = (request.get_json(silent=True) or {}).get(field)
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({"error": f"{field} må være en liste med minst ett element."}), 400)
+    if len(items) > MAX_BATCH_ITEMS:
+        return None, (jsonify({"error": f"Maks {MAX_BATCH_ITEMS} elementer per forespørsel."}), 400)
+    if not all(isinstance(item, dict) for item in items):
+        return None, (jsonify({"error": f"Alle elementene i {field} må være objekter."}), 400)
+    return items, None
+
+# Funksjon: Sjekker eierskap én gang per medlem i batchen. Returnerer medlem-ID -> None, 404 eller 403.
+def check_members_access(member_ids, uid):
+    return {member_id: ownership.check(member_id, uid) for member_id in set(member_ids) if member_id}
+
+# Endepunkt: Legger til mange oppgaver hos mange medlemmer i én forespørsel.
+# Body: {"items": [{"memberId": "...", "title": "...", "price": 10}, ...]}
+# Svarer med ett resultat per element, i samme rekkefølge.
+@admin.route('/batch/add-tasks', methods=['POST'])
+@idempotent
+def batch_add_tasks():
+    uid, error, code = get_uid_from_token()
+    if error: return error, code
 
+    items, error = get_batch_items('items')
+    if error: return error
 
+    try:
+        access = check_members_access([item.get('memberId') for item in items], uid)
+        now = time.time()
+        results = []
+        records = []
+
+        for index, item in enumerate(items):
+            member_id = item.get('memberId')
+            if not member_id or not item.get('title') or item.get('price') is None:
+                results.append({"status": 400, "error": "memberId, tittel og pris er påkrevd"})
+                continue
+            if access[member_id]:
+                results.append({"status": access[member_id], "memberId": member_id, "error": ACCESS_ERRORS[access[member_id]]})
+                continue
+
+            new_task = new_task_data(item['title'], item['price'])
+            new_task["createdAt"] = now + index * 1e-6 # Bevarer rekkefølgen fra forespørselen.
+            records.append(task_record(member_id, uid, new_task, now))
+            results.append({"status": 201, "memberId": member_id, "taskId": new_task['id']})
+
+        # Alle oppgavene skrives samlet i batcher, uansett hvor mange medlemmer de tilhører.
+        # Medlemmer som er slettet siden eierskapet ble sjekket hoppes over og gir 404 på sine elementer.
+        missing = get_store().tasks.insert_skip_missing(records)
+        for member_id in missing:
+            ownership.discard(member_id)
+        for result in results:
+            if result["status"] == 201 and result["memberId"] in missing:
+                result.pop("taskId")
+                result.update(status=404, error=ACCESS_ERRORS[404])
+        added = {}
+        for record in records:
+            if record['memberId'] not in missing:
+                added.setdefault(record['memberId'], []).append(record)
+        for member_id, member_tasks in added.items():
+            member_cache.invalidate(uid, member_id)
+            change_hub.member_updated(uid, member_id, tasks=member_tasks)
+
+        return jsonify({"results": results}), 200
 
-    
-        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Endepunkt: Fullfører mange oppgaver i én forespørsel.
+# Body: {"items": [{"memberId": "...", "taskId": "..."}, ...]}
+# Alle oppgavene og saldoene oppdateres atomisk. Svarer med ett resultat per element.
+@admin.route('/batch/complete-tasks', methods=['POST'])
+@idempotent
+def batch_complete_tasks():
+    uid, error, code = get_uid_from_token()
+    if error: return error, code
+
+    if not is_elevated(uid):
+        return jsonify({"error": "Admin-PIN må bekreftes."}), 403
+
+    items, error = get_batch_items('items')
+    if error: return error
+
+    try:
+        access = check_members_access([item.get('memberId') for item in items], uid)
+        results = [None] * len(items)
+        pairs = []
+        positions = []
+
+        for index, item in enumerate(items):
+            member_id, task_id = item.get('memberId'), item.get('taskId')
+            if not member_id or not task_id:
+                results[index] = {"status": 400, "error": "memberId og taskId er påkrevd"}
+            elif access[member_id]:
+                results[index] = {"status": access[member_id], "memberId": member_id, "taskId": task_id,
+                                  "error": ACCESS_ERRORS[access[member_id]]}
+            else:
+                pairs.append((member_id, task_id))
+                positions.append(index)
+
+        outcomes = get_store().tasks.complete_many(pairs, admin_id=uid) if pairs else []
+        completed = {} # medlem -> (fullførte oppgaver, ny saldo)
+        for index, (member_id, task_id), outcome in zip(positions, pairs, outcomes):
+            if isinstance(outcome, Exception):
+                status, message = STORAGE_ERRORS.get(type(outcome), (500, str(outcome)))
+                results[index] = {"status": status, "memberId": member_id, "taskId": task_id, "error": message}
+            else:
+                task, added_money, new_money = outcome
+                results[index] = {"status": 200, "memberId": member_id, "task": public_task(task), "money": new_money}
+                if added_money:
+                    member_tasks, _ = completed.get(member_id, ([], None))
+                    completed[member_id] = (member_tasks + [task], new_money)
+
+        for member_id in {member_id for member_id, _ in pairs}:
+            member_cache.invalidate(uid, member_id)
+        for member_id, (member_tasks, new_money) in completed.items():
+            change_hub.member_updated(uid, member_id, changes={"money": new_money}, tasks=member_tasks)
+
+        return jsonify({"results": results}), 200
+
+    except ContentionError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Endepunkt: Oppretter mange medlemmer i én forespørsel.
+# Body: {"members": [{"name": "...", "code": "...", "color": "..."}, ...]}
+@admin.route('/batch/create-members', methods=['POST'])
+@idempotent
+def batch_create_members():
+    uid, error, code = get_uid_from_token()
+    if error: return error, code
+
+    items, error = get_batch_items('members')
+    if error: return error
+
+    try:
+        results = []
+        new_members = []
+
+        for item in items:
+            if not item.get('name') or not item.get('code') or not item.get('color'):
+                results.append({"status": 400, "error": "Alle felt er påkrevd!"})
+                continue
+            new_members.append(new_member_data(item['name'], item['code'], item['color'], uid))
+            results.append(None) # Fylles inn med ID-en når medlemmene er lagret.
+
+        member_ids = iter(get_store().members.create_many(new_members))
+        created = iter(new_members)
+        for index, result in enumerate(results):
+            if result is None:
+                member_id = next(member_ids)
+                ownership.set(member_id, uid)
+                change_hub.member_created(uid, member_id, next(created))
+                results[index] = {"status": 201, "member_id": member_id}
+        member_cache.invalidate(uid)
+
+        return jsonify({"results": results}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
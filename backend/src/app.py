@@ -1,9 +1,15 @@
 # app.py - Hovedfilen for hele Flask-applikasjonen. Fungerer som inngangspunktet for backend.
 # Initierer Flask, aktiverer CORS og registrerer alle blueprint-moduler.
+# Appen lages med create_app(). Firebase initieres først når en rute trenger det, så oppstarten er rask.
+# I produksjon kjøres appen med gunicorn (se wsgi.py og gunicorn.conf.py).
 
 import os                                # Brukes for å hente inn miljøvariabler.
 from flask import Flask, redirect        # Flask-rammeverk og redirect-funksjon.
 from flask_cors import CORS              # Tillater cross-origin-request fra frontend.
+import metrics                           # Svartider, databasekall og /metrics.
+import logging_setup                     # Logging via bakgrunnstråd og request-ID.
+import logging                          # Advarer når SECRET_KEY mangler.
+from elevation import DEFAULT_SECRET_KEY # Standardnøkkelen som ikke kan signere admin-tokens.
 
 # Import av blueprint-moduler som definerer forskjellige API-ruter.
 from login import login
@@ -11,33 +17,50 @@ from logout import logout
 from register import register
 from admin import admin
 from purchase import purchase
+from catalog import catalog_blueprint
+from bulk import bulk_blueprint
 
-# Oppretter Flask-applikasjon.
-app = Flask(__name__)
+log = logging.getLogger(__name__)
 
-# Aktiverer CORS for at frontend kan kommunisere med backend.
-# Cookies og headers sendes med gjennom supports_credentials=True.
-CORS(app, supports_credentials=True)
+# Standardrute som videresender til login.
+def index():
+    return redirect('/login')
 
-# Setter en hemmelig nøkkel til Flask og bruker "default_secret_key" hvis miljøvariabel ikke finnes.
-app.config['SECRET_KEY'] = os.getenv("SECRET_KEY", "default_secret_key")
+# Funksjon: Oppretter og konfigurerer Flask-applikasjonen.
+def create_app():
+    app = Flask(__name__)
 
-# Registrerer blueprint for kjøpsrutene i butikken.
-app.register_blueprint(purchase)
+    # Logging settes opp først, slik at alle rutene logger gjennom køen med request-ID.
+    logging_setup.init_app(app)
 
-# Registrerer resten av rutemodulene.
-app.register_blueprint(login)
-app.register_blueprint(logout) 
-app.register_blueprint(register)
-app.register_blueprint(admin)
+    # Aktiverer CORS for at frontend kan kommunisere med backend.
+    # Cookies og headers sendes med gjennom supports_credentials=True.
+    CORS(app, supports_credentials=True)
 
-# Standardrute som videresender til login.
-@app.route('/')
-def index():
-    return redirect('/login')
+    # Setter en hemmelig nøkkel til Flask og bruker "default_secret_key" hvis miljøvariabel ikke finnes.
+    # Med standardverdien lages og godtas ingen admin-tokens (se elevation.py).
+    app.config['SECRET_KEY'] = os.getenv("SECRET_KEY", DEFAULT_SECRET_KEY)
+    if app.config['SECRET_KEY'] == DEFAULT_SECRET_KEY:
+        log.warning("SECRET_KEY er ikke satt. Admin-PIN (/verify-pin) og fullføring av oppgaver er slått av.")
+
+    # Registrerer blueprint for kjøpsrutene i butikken.
+    app.register_blueprint(purchase)
+    app.register_blueprint(catalog_blueprint)
+
+    # Registrerer resten av rutemodulene.
+    app.register_blueprint(login)
+    app.register_blueprint(logout)
+    app.register_blueprint(register)
+    app.register_blueprint(admin)
+    app.register_blueprint(bulk_blueprint)
+
+    app.add_url_rule('/', 'index', index)
+
+    # Måler svartid per rute og legger på Server-Timing-header.
+    metrics.init_app(app)
+    return app
 
-# Kjører Flask-applikasjonen lokalt på port 3000.
+# Kjører utviklingsserveren lokalt på port 3000. Debug-modus slås på med FLASK_DEBUG=1.
 # Bruker 0.0.0.0 for å kunne nås fra f.eks mobilen.
 if __name__== '__main__':
-    app.run(host='0.0.0.0', port=int(os.getenv("PORT", 3000)), debug=True)
-    
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=int(os.getenv("PORT", 3000)), debug=os.getenv("FLASK_DEBUG") == "1")
@@ -0,0 +1,312 @@
+# asgi.py - ASGI-inngangspunkt for backend (asynkron modus).
+# Start med: uvicorn asgi:application --host 0.0.0.0 --port 3000 (fra src-mappa).
+# GET /members og GET /member/<id> uten parametere kjøres direkte på asyncio med firestore.AsyncClient,
+# slik at ventetid på Firestore og token-verifisering ikke holder av en tråd. Uavhengige kall kjøres samtidig.
+# GET /changes kjøres også på asyncio, så en åpen strøm venter uten å holde av en tråd.
+# Disse rutene får samme request-ID, logging, målinger og Server-Timing som Flask-rutene.
+# Alle andre forespørsler sendes videre til Flask-appen, så API-et er det samme som før. Flask-forespørslene
+# kjøres i en trådpool med ASGI_THREADS tråder (standard 32), slik at flere kan kjøre samtidig.
+
+import asyncio                            # Kjører uavhengige kall samtidig.
+import json                               # Serialiserer feilmeldinger.
+import os                                 # Leser STORAGE_BACKEND og ASGI_THREADS.
+import time                               # Måler svartiden.
+import uuid                               # Genererer request-ID.
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance # Kjører Flask-appen inne i ASGI-serveren.
+from app import create_app                # Flask-appen med alle blueprints.
+from auth import verify_firebase_token    # Samme verifisering og tokencache som Flask-rutene.
+from member_cache import member_cache, json_entry
+from ownership import ownership
+from changes import change_hub, format_event, HEARTBEAT_SECONDS
+from storage.base import public_task
+from logging_setup import request_id      # Request-ID i loggpostene, som i Flask-rutene.
+from metrics import metrics, begin_request, end_request, server_timing
+import admin as admin_routes              # Synkrone loadere når lagringen ikke er Firestore.
+
+log = logging.getLogger(__name__)
+
+# Tråder for Flask-forespørslene.
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", 32))
+_flask_threads = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix='flask')
+
+# Klasse: Som WsgiToAsgi, men hver forespørsel kjører i en tråd fra _flask_threads.
+# asgiref kjører ellers alle forespørslene i én og samme tråd (thread_sensitive=True), én om gangen.
+# run_wsgi_app erstattes med en egen versjon, så vi bruker bare det offentlige sync_to_async(executor=...).
+class ThreadedWsgiInstance(WsgiToAsgiInstance):
+    async def run_wsgi_app(self, body):
+        await sync_to_async(self._run_in_thread, thread_sensitive=False, executor=_flask_threads)(body)
+
+    # Kjører Flask-appen i tråden og sender svaret tilbake til event-loopen. start_response og sync_send
+    # er fra WsgiToAsgiInstance og må kalles fra samme tråd som appen.
+    def _run_in_thread(self, body):
+        environ = self.build_environ(self.scope, body)
+        output = self.wsgi_application(environ, self.start_response)
+        sent = 0
+        try:
+            for chunk in output:
+                if not self.response_started:
+                    self.response_started = True
+                    self.sync_send(self.response_start)
+                # Aldri mer enn Content-Length sier.
+                if self.response_content_length is not None:
+                    chunk = chunk[:self.response_content_length - sent]
+                self.sync_send({"type": "http.response.body", "body": chunk, "more_body": True})
+                sent += len(chunk)
+                if sent == self.response_content_length:
+                    break
+        finally:
+            if hasattr(output, 'close'):
+                output.close() # WSGI krever close(), ellers kjøres ikke call_on_close i Flask.
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({"type": "http.response.body"})
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await ThreadedWsgiInstance(self.wsgi_application)(scope, receive, send)
+
+flask_app = ThreadedWsgiToAsgi(create_app())
+
+_async_store = None
+
+# Klasse: Feil ved token-verifisering. Gir 401 med samme melding som Flask-rutene.
+class AuthError(Exception):
+    pass
+
+# Funksjon: Returnerer det asynkrone Firestore-lageret, eller None når en lokal lagring brukes.
+# Klienten opprettes ved første forespørsel, inne i event-loopen den skal brukes fra.
+def get_async_store():
+    global _async_store
+    if os.getenv("STORAGE_BACKEND", "firestore").lower() != 'firestore':
+        return None
+    if _async_store is None:
+        from firebase_config import get_async_db
+        from storage.firestore_async import AsyncFirestoreStore
+        _async_store = AsyncFirestoreStore(get_async_db())
+    return _async_store
+
+# Funksjon: Verifiserer tokenet i en tråd, slik at event-loopen ikke blokkeres av RSA-sjekken.
+async def verify_uid(headers):
+    token = headers.get('authorization', '').replace('Bearer ', '')
+    if not token:
+        raise AuthError("Manglende token")
+    try:
+        decoded = await asyncio.to_thread(verify_firebase_token, token)
+    except Exception:
+        raise AuthError("Ugyldig token")
+    return decoded["uid"]
+
+# Funksjon: Leser medlemmene og oppgavene til admin samtidig. Samme format som admin.load_members.
+async def load_members(uid):
+    store = get_async_store()
+    if store is None:
+        return await asyncio.to_thread(admin_routes.load_members, uid)
+
+    members, tasks = await asyncio.gather(store.members.list_by_admin(uid), store.tasks.list_by_admin(uid))
+    result = []
+    for member_id, data in members:
+        ownership.set(member_id, uid)
+        data['id'] = member_id
+        data['tasks'] = [public_task(task) for task in tasks.get(member_id, [])]
+        result.append(data)
+    return result
+
+# Funksjon: Finner admin som eier medlemmet via eierskapsindeksen. Ved bom leses kun adminId.
+async def member_owner(member_id):
+    store = get_async_store()
+    if store is None:
+        return await asyncio.to_thread(ownership.owner, member_id)
+    return await ownership.owner_async(member_id, store.members.get_owner)
+
+# Funksjon: Leser ett medlem og oppgavene samtidig. Samme format som admin.load_member.
+async def load_member(member_id):
+    store = get_async_store()
+    if store is None:
+        return await asyncio.to_thread(admin_routes.load_member, member_id)
+
+    data, tasks = await asyncio.gather(store.members.get(member_id), store.tasks.list(member_id))
+    if data is None:
+        ownership.discard(member_id)
+        return None
+    ownership.set(member_id, data.get('adminId'))
+    data['tasks'] = [public_task(task) for task in tasks]
+    return data
+
+# Funksjon: Sjekker If-None-Match mot ETag-en til svaret.
+def etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or any(tag.removeprefix('W/').strip('"') == etag for tag in tags)
+
+# Funksjon: CORS-headerne, de samme som flask_cors setter.
+def cors_headers(headers):
+    origin = headers.get('origin')
+    if not origin:
+        return []
+    return [
+        (b'access-control-allow-origin', origin.encode('latin-1')),
+        (b'access-control-allow-credentials', b'true'),
+        (b'vary', b'Origin'),
+    ]
+
+# Funksjon: Sender et komplett HTTP-svar.
+async def respond(send, headers, status, body=b'', extra=()):
+    response_headers = [(b'content-type', b'application/json'), *extra, *cors_headers(headers)]
+    response_headers.append((b'content-length', str(len(body)).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": response_headers})
+    await send({"type": "http.response.body", "body": body})
+
+async def respond_error(send, headers, status, message):
+    await respond(send, headers, status, json.dumps({"error": message}).encode('utf-8'))
+
+# Funksjon: Sender et cachet svar, eller 304 hvis klienten allerede har samme versjon.
+async def respond_entry(send, headers, entry):
+    extra = [(b'etag', f'"{entry["etag"]}"'.encode()), (b'cache-control', b'private, no-cache')]
+    if etag_matches(headers.get('if-none-match'), entry["etag"]):
+        await respond(send, headers, 304, extra=extra)
+    else:
+        await respond(send, headers, 200, entry["body"].encode('utf-8'), extra)
+
+# Endepunkt: GET /members. Tokenet må verifiseres først, siden spørringen trenger UID.
+async def get_members(send, headers):
+    uid = await verify_uid(headers)
+
+    async def loader():
+        return json_entry(await load_members(uid))
+
+    entry = await member_cache.read_through_async(member_cache.members_key(uid), loader)
+    await respond_entry(send, headers, entry)
+
+# Endepunkt: GET /member/<id>. Token-verifisering og oppslag av eieren kjøres samtidig.
+# Medlemmet leses og caches først når det er sikkert at det tilhører admin.
+async def get_member(send, headers, member_id):
+    uid, owner = await asyncio.gather(verify_uid(headers), member_owner(member_id))
+    if owner is None:
+        return await respond_error(send, headers, 404, "Medlem ikke funnet!")
+    if owner != uid:
+        return await respond_error(send, headers, 403, "Ingen tilgang!")
+
+    async def loader():
+        data = await load_member(member_id)
+        return json_entry(data) if data is not None else None
+
+    entry = await member_cache.read_through_async(member_cache.member_key(member_id), loader)
+    if entry is None:
+        return await respond_error(send, headers, 404, "Medlem ikke funnet!")
+    if entry["adminId"] != uid: # Medlemmet har byttet eier siden indeksen ble fylt.
+        return await respond_error(send, headers, 403, "Ingen tilgang!")
+    await respond_entry(send, headers, entry)
+
+# Funksjon: Venter til klienten kobler fra.
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+# Endepunkt: GET /changes som server-sent events, med de samme hendelsene som Flask-ruten i admin.py.
+# Strømmen venter på asyncio.Event som Subscription.push setter, så den holder ikke av en tråd mens den venter.
+async def get_changes(send, headers, receive):
+    uid = await verify_uid(headers)
+    subscription = change_hub.subscribe(uid)
+    if subscription is None:
+        return await respond_error(send, headers, 429, "For mange åpne tilkoblinger.")
+
+    loop = asyncio.get_running_loop()
+    wakeup = asyncio.Event()
+    subscription.on_push = lambda: loop.call_soon_threadsafe(wakeup.set) # push kan kalles fra Flask-trådene.
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+
+    async def write(text):
+        await send({"type": "http.response.body", "body": text.encode('utf-8'), "more_body": True})
+
+    try:
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b'content-type', b'text/event-stream; charset=utf-8'), (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'), *cors_headers(headers)]})
+        await write("retry: 3000\n\n" + format_event({"type": "ready"}))
+        while not disconnected.done():
+            wakeup.clear() # Nullstilles før køen sjekkes, så en hendelse som kommer mellom dem ikke går tapt.
+            event = subscription.get_nowait()
+            if event is not None:
+                await write(format_event(event))
+                continue
+            woken = asyncio.ensure_future(wakeup.wait())
+            done, _ = await asyncio.wait({woken, disconnected}, timeout=HEARTBEAT_SECONDS,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            woken.cancel()
+            if not done:
+                await write(": heartbeat\n\n")
+    finally:
+        disconnected.cancel()
+        subscription.on_push = None
+        change_hub.unsubscribe(subscription)
+
+# Funksjon: Finner en asynkron rute for forespørselen. Returnerer (regel, rute), eller None hvis Flask skal ta den.
+# Regelen er den samme som i Flask, slik at målingene havner på samme rute.
+# Forespørsler med parametere (sider, felter) går alltid til Flask.
+def match_route(scope):
+    if scope['method'] != 'GET' or scope.get('query_string'):
+        return None
+    path = scope['path']
+    if path == '/members':
+        return '/members', lambda send, headers, receive: get_members(send, headers)
+    if path == '/changes':
+        return '/changes', get_changes
+    if path.startswith('/member/'):
+        member_id = path[len('/member/'):]
+        if member_id and '/' not in member_id:
+            return '/member/<member_id>', lambda send, headers, receive: get_member(send, headers, member_id)
+    return None
+
+# Funksjon: Kjører en asynkron rute med det samme som Flask-hookene gjør (logging_setup.init_app og
+# metrics.init_app): request-ID i loggene og svaret, svartid per rute og Server-Timing-header.
+async def run_route(rule, route, scope, receive, send, headers):
+    rid = (headers.get('x-request-id') or uuid.uuid4().hex)[:64]
+    id_token = request_id.set(rid)
+    timings, metrics_token = begin_request()
+    start = time.perf_counter()
+    started = False
+
+    async def send_with_headers(message):
+        nonlocal started
+        if message['type'] == 'http.response.start':
+            started = True
+            total = time.perf_counter() - start
+            metrics.observe_request('admin', rule, scope['method'], message['status'], total)
+            message = dict(message, headers=[*message['headers'], (b'x-request-id', rid.encode('latin-1')),
+                                             (b'server-timing', server_timing(timings, total).encode('latin-1'))])
+        await send(message)
+
+    try:
+        await route(send_with_headers, headers, receive)
+    except AuthError as e:
+        await respond_error(send_with_headers, headers, 401, str(e))
+    except Exception as e:
+        log.exception("Feil i %s", rule)
+        if not started: # Etter at svaret er startet (f.eks. en strøm) kan det ikke sendes et nytt.
+            await respond_error(send_with_headers, headers, 500, str(e))
+    finally:
+        end_request(metrics_token)
+        request_id.reset(id_token)
+
+# Selve ASGI-applikasjonen.
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({"type": "lifespan.startup.complete"})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    match = match_route(scope) if scope['type'] == 'http' else None
+    if match is None:
+        return await flask_app(scope, receive, send)
+
+    headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+    await run_route(*match, scope, receive, send, headers)
@@ -1,20 +1,157 @@
 # auth.py - Modul som håndterer autentifisering via Firebase Admin SDK.
-# Inkluderer initialisering og funksjon for å verifisere ID-tokens.
-import firebase_admin                         #Hovedbibilotek for Firebase Admin SDK.
-from firebase_admin import credentials, auth  # Importerer verktøy for autentifisering og nøkkelhåndtering.
+# Inkluderer funksjon for å verifisere ID-tokens. Firebase-appen initieres i firebase_config ved behov.
+# Verifiserte tokens mellomlagres lokalt, og Googles offentlige nøkler hentes via en felles nøkkelcache.
+from firebase_admin import auth              # Verifisering med Firebase Admin SDK (emulator).
+from firebase_config import get_app           # Firebase-appen, initieres først når den trengs.
 import os                                     # For å jobbe med filer og miljøvariabler.
+import re                                     # Leser max-age fra Cache-Control-headeren.
+import json                                   # Tolker nøklene som hentes fra Google.
+import time                                   # Utløpstid for nøkler og tokens.
+import hashlib                                # Lager en digest av tokenet som brukes som nøkkel i cachen.
+import threading                              # Bakgrunnstråd som fornyer nøklene før de utløper.
+from google.auth import jwt                   # Lokal verifisering av signaturen på ID-tokenet.
+from google.auth.transport import requests as google_requests
+from cache import LRUCache                    # Felles LRU-cache.
+from metrics import metrics, timed            # Måler tiden token-verifiseringen tar.
 
-# Sjekker om Firebase allerede er initialisert for å unngå dobbel initialisering.
-if not firebase_admin._apps:
-    cred_path = os.path.join(os.path.dirname(__file__), 'serviceAccountKey.json')
-    cred = credentials.Certificate(cred_path)
-    firebase_admin.initialize_app(cred)
+# Offentlige sertifikater som Firebase bruker til å signere ID-tokens.
+PUBLIC_KEYS_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+ISSUER_PREFIX = 'https://securetoken.google.com/'
+
+# Klasse: Felles cache for Googles offentlige nøkler.
+# Nøklene hentes første gang de trengs, og deretter fornyes de av en bakgrunnstråd
+# litt før de utløper, slik at ingen forespørsel må vente på nettverkskallet.
+class PublicKeyCache:
+    def __init__(self, url=PUBLIC_KEYS_URL, refresh_margin=300, retry_delay=60, unknown_kid_interval=60):
+        self.url = url
+        self.refresh_margin = refresh_margin # Antall sekunder før utløp nøklene fornyes.
+        self.retry_delay = retry_delay       # Ventetid før nytt forsøk hvis hentingen feiler.
+        self.unknown_kid_interval = unknown_kid_interval # Minste tid mellom hentinger på grunn av ukjent kid.
+        self.fetches = 0
+        self._keys = {}
+        self._expires_at = 0
+        self._unknown_kid_at = 0 # Når nøklene sist ble hentet på grunn av en ukjent kid.
+        self._lock = threading.Lock()
+        self._refresher = None
+        self._request = google_requests.Request()
+
+    # Returnerer gjeldende nøkler og henter dem synkront kun hvis cachen er tom eller utløpt.
+    def get_keys(self):
+        if not self._keys or time.time() >= self._expires_at:
+            self.refresh()
+        self._start_refresher()
+        return self._keys
+
+    # Henter nøklene på nytt. Uten force hoppes hentingen over hvis en annen tråd nettopp har gjort den.
+    def refresh(self, force=False):
+        with self._lock:
+            if not force and self._keys and time.time() < self._expires_at:
+                return self._keys
+            return self._fetch()
+
+    # Henter nøklene på nytt fordi et token har en kid som ikke finnes i cachen (Google kan ha rotert nøklene).
+    # Kid-en kommer fra klienten, så hentingen skjer høyst én gang per unknown_kid_interval. Ellers returneres
+    # nøklene som de er, og tokenet avvises.
+    def refresh_for_kid(self, kid):
+        with self._lock:
+            if kid in self._keys or time.time() - self._unknown_kid_at < self.unknown_kid_interval:
+                return self._keys
+            self._unknown_kid_at = time.time()
+            return self._fetch()
+
+    # Kalles med låsen holdt.
+    def _fetch(self):
+        response = self._request(self.url, method='GET')
+        if response.status != 200:
+            raise ValueError(f"Kunne ikke hente offentlige nøkler (status {response.status})")
+
+        data = response.data.decode('utf-8') if isinstance(response.data, bytes) else response.data
+        self._keys = json.loads(data)
+        self._expires_at = time.time() + _max_age(response.headers)
+        self.fetches += 1
+        return self._keys
+
+    # Starter bakgrunnstråden første gang nøklene brukes.
+    def _start_refresher(self):
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop, name='public-key-refresher', daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(max(self._expires_at - time.time() - self.refresh_margin, 1))
+            try:
+                self.refresh(force=True)
+            except Exception:
+                time.sleep(self.retry_delay) # Beholder de gamle nøklene og prøver igjen senere.
+
+# Funksjon: Leser max-age fra Cache-Control. Bruker én time hvis headeren mangler.
+def _max_age(headers, default=3600):
+    match = re.search(r'max-age=(\d+)', headers.get('cache-control', '') or '')
+    return int(match.group(1)) if match else default
+
+# Delt nøkkelcache og tokencache for hele prosessen.
+_public_keys = PublicKeyCache()
+_token_cache = LRUCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", 1024)))
+
+# Funksjon: Verifiserer tokenet lokalt med de mellomlagrede nøklene.
+# Gjør de samme sjekkene som Firebase Admin SDK (algoritme, signatur, utløp, aud, iss og sub).
+def _verify_locally(token, project_id):
+    header = jwt.decode_header(token)
+    if header.get('alg') != 'RS256':
+        raise ValueError("Feil signeringsalgoritme")
+
+    kid = header.get('kid')
+    keys = _public_keys.get_keys()
+    if kid not in keys:
+        keys = _public_keys.refresh_for_kid(kid)
+        if kid not in keys:
+            raise ValueError("Ukjent nøkkel")
+
+    claims = jwt.decode(token, certs=keys, audience=project_id)
+    if claims.get('iss') != ISSUER_PREFIX + project_id:
+        raise ValueError("Feil utsteder")
+
+    subject = claims.get('sub')
+    if not isinstance(subject, str) or not subject or len(subject) > 128:
+        raise ValueError("Ugyldig sub")
+
+    claims['uid'] = subject
+    return claims
+
+# Funksjon: Verifiserer uten cache. Faller tilbake på Firebase Admin SDK når
+# prosjekt-ID mangler eller når Auth-emulatoren brukes (usignerte tokens).
+def _verify_uncached(token):
+    app = get_app()
+    project_id = app.project_id
+    if not project_id or os.getenv('FIREBASE_AUTH_EMULATOR_HOST'):
+        return auth.verify_id_token(token, app=app)
+    return _verify_locally(token, project_id)
 
 # Funksjon for å verifisere Firebase-token fra Authorization-headeren.
 # Returnerer tokenet eller gir ValueError hvis den ikke er gydlig.
+# Allerede verifiserte tokens hentes fra cachen frem til tokenets egen exp.
 def verify_firebase_token(token):
-    try:
-        decoded_token = auth.verify_id_token(token)
-        return decoded_token
-    except Exception as e:
-        raise ValueError(f"Ugyldig token: {e}")
\ No newline at end of file
+    with timed(metrics.observe_auth):
+        key = hashlib.sha256(token.encode('utf-8')).digest()
+        cached = _token_cache.get(key)
+        if cached is not None:
+            return dict(cached)
+
+        try:
+            decoded_token = _verify_uncached(token)
+        except Exception as e:
+            raise ValueError(f"Ugyldig token: {e}")
+
+        _token_cache.set(key, decoded_token, expires_at=decoded_token.get('exp'))
+        return dict(decoded_token)
+
+# Funksjon: Tellere for tokencachen og nøkkelcachen.
+def token_cache_stats():
+    stats = _token_cache.stats()
+    stats["public_key_fetches"] = _public_keys.fetches
+    return stats
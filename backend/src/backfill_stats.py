@@ -0,0 +1,57 @@
+# backfill_stats.py - Regner ut tellerne (feltet stats på medlemmene og admin_stats per admin) fra eksisterende data.
+# Nye skrivinger oppdaterer tellerne selv; dette trengs for data som fantes før tellerne ble innført.
+# Kjøres med: python backfill_stats.py [--dry-run] (inne i src-mappa), helst når appen ikke er i bruk,
+# siden skrivinger som skjer mens skriptet kjører kan bli overskrevet.
+#
+# Kjøp er ikke logget, så purchases og spent regnes ut fra kosmetikken medlemmet eier nå og prisene i katalogen.
+# Solgte varer kommer derfor ikke med.
+
+import sys
+import argparse
+from storage import get_store
+from storage.base import empty_stats, add_stats
+from catalog import catalog
+
+# Funksjon: Regner ut tellerne for ett medlem.
+def member_stats(store, member_id, member):
+    tasks = store.tasks.list(member_id)
+    completed = [task for task in tasks if task.get('completed')]
+    history = member.get('history', {}) # Oppgaver som er flyttet til historikken (compaction.py).
+    cosmetics = member.get('cosmetics', [])
+    prices = [catalog.get(item_id) for item_id in cosmetics]
+    return {
+        "tasksAdded": len(tasks) + history.get('count', 0),
+        "tasksCompleted": len(completed) + history.get('count', 0),
+        "earned": sum(task.get('price', 0) for task in completed) + history.get('earned', 0),
+        "purchases": len(cosmetics),
+        "spent": sum(item['price'] for item in prices if item is not None),
+    }
+
+# Funksjon: Går gjennom alle medlemmene og skriver tellerne. Returnerer {admin-ID: tellere}.
+def backfill_all(store, dry_run=False):
+    totals = {}
+    for member_id, member in store.members.iter_all():
+        stats = member_stats(store, member_id, member)
+        if not dry_run:
+            store.members.update(member_id, {"stats": stats})
+        if member.get('adminId'):
+            add_stats(totals.setdefault(member['adminId'], empty_stats()), stats)
+
+    if not dry_run:
+        for admin_id, stats in totals.items():
+            store.stats.set(admin_id, stats)
+    return totals
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regner ut tellerne for medlemmer og admins fra eksisterende data.")
+    parser.add_argument('--dry-run', action='store_true', help="vis tellerne uten å skrive dem")
+    args = parser.parse_args(argv)
+
+    totals = backfill_all(get_store(), args.dry_run)
+    for admin_id, stats in sorted(totals.items()):
+        print(admin_id, ' '.join(f"{field}={value}" for field, value in stats.items()))
+    print(f"{'(prøvekjøring) ' if args.dry_run else ''}Oppdaterte tellerne for {len(totals)} admins.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
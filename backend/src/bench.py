@@ -0,0 +1,298 @@
+# bench.py - Lasttest av backend uten Firebase.
+# Starter Flask-appen fra create_app() i en lokal server med minne-, SQLite- eller emulator-lagring
+# og en stubbet token-verifisering, og sender en blanding av forespørsler fra flere tråder samtidig.
+# Rapporterer p50/p95/p99 og forespørsler per sekund per rute, og kan lagre og sammenligne mot en baseline.
+#
+# Eksempler (inne i src-mappa):
+#   python bench.py --duration 20 --concurrency 16
+#   python bench.py --mix members=50,member=50 --save-baseline ../bench_baseline.json
+#   python bench.py --baseline ../bench_baseline.json   (avslutter med kode 1 ved regresjon)
+#   FIRESTORE_EMULATOR_HOST=localhost:8080 python bench.py --storage firestore
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import secrets
+import shutil
+import tempfile
+import argparse
+import threading
+import http.client
+
+# Standard blanding av forespørsler (relative vekter), omtrent som frontend bruker API-et.
+DEFAULT_MIX = {"members": 30, "member": 30, "add_task": 15, "complete_task": 15, "purchase": 10}
+
+# Funksjon: Leser en blanding på formen "members=50,member=50".
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        if name not in DEFAULT_MIX:
+            raise SystemExit(f"Ukjent rute i --mix: {name}")
+        mix[name] = float(weight)
+    return mix
+
+# Funksjon: Persentil med nearest-rank på en sortert liste.
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+# Funksjon: Stubbet token-verifisering. Tokenet "bench-<uid>" gir brukeren <uid>.
+def fake_verify(token):
+    if not token.startswith('bench-'):
+        raise ValueError("Ugyldig token")
+    return {"uid": token[len('bench-'):]}
+
+# Funksjon: Legger inn testdata direkte i lagringen. Returnerer admins, medlemmer per admin og åpne oppgaver.
+def seed(store, admins, members_per_admin, tasks_per_member):
+    members = {}
+    open_tasks = []
+    for a in range(admins):
+        admin_id = f"admin-{a}"
+        store.users.create(admin_id, {"email": f"{admin_id}@bench.local", "admin_pin": "1234"})
+        datas = [{
+            "name": f"Barn {m}",
+            "code": "1234",
+            "money": 10 ** 9, # Nok penger til alle kjøpene i testen.
+            "cosmetics": [],
+            "character": {"type": "pinnefigur", "color": "blue"},
+            "adminId": admin_id,
+        } for m in range(members_per_admin)]
+        member_ids = store.members.create_many(datas)
+        members[admin_id] = member_ids
+        for member_id in member_ids:
+            tasks = [{"id": f"{member_id}-{t}", "title": f"Oppgave {t}", "price": 1, "completed": False}
+                     for t in range(tasks_per_member)]
+            store.tasks.add_many(member_id, admin_id, tasks)
+            open_tasks.extend((admin_id, member_id, task["id"]) for task in tasks)
+    random.shuffle(open_tasks)
+    return members, open_tasks
+
+# Funksjon: Starter appen i en lokal server med HTTP/1.1 (keep-alive) i en bakgrunnstråd.
+def start_server(app):
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, name='bench-server', daemon=True)
+    thread.start()
+    return server
+
+# Klasse: Én simulert klient. Bruker én tilkobling og velger ruter etter vektene i blandingen.
+class Worker(threading.Thread):
+    def __init__(self, port, mix, members, elevations, open_tasks, tasks_lock, deadline, results):
+        super().__init__(daemon=True)
+        self.port = port
+        self.elevations = elevations # admin -> token fra /verify-pin
+        self.routes = list(mix)
+        self.weights = [mix[name] for name in self.routes]
+        self.members = members
+        self.open_tasks = open_tasks
+        self.tasks_lock = tasks_lock
+        self.deadline = deadline
+        self.results = results # rute -> liste med (sekunder, status)
+        self.conn = None
+
+    def request(self, method, path, uid, body=None, elevation=None):
+        headers = {"Authorization": f"Bearer bench-{uid}"}
+        if elevation:
+            headers["X-Admin-Elevation"] = elevation
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        for attempt in range(2): # Ny tilkobling hvis serveren har lukket den gamle.
+            try:
+                if self.conn is None:
+                    self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+                self.conn.request(method, path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                response.read()
+                return response.status
+            except (http.client.HTTPException, ConnectionError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+    def run(self):
+        admin_ids = list(self.members)
+        while time.perf_counter() < self.deadline:
+            route = random.choices(self.routes, self.weights)[0]
+            admin_id = random.choice(admin_ids)
+            member_id = random.choice(self.members[admin_id])
+
+            start = time.perf_counter()
+            if route == "members":
+                status = self.request('GET', '/members', admin_id)
+            elif route == "member":
+                status = self.request('GET', f'/member/{member_id}', admin_id)
+            elif route == "add_task":
+                status = self.request('POST', f'/add-task/{member_id}', admin_id, {"title": "Rydde", "price": 2})
+            elif route == "complete_task":
+                with self.tasks_lock:
+                    task = self.open_tasks.pop() if self.open_tasks else None
+                if task is None:
+                    continue # Alle oppgavene er fullført, flere seedes med --tasks.
+                admin_id, member_id, task_id = task
+                start = time.perf_counter()
+                status = self.request('POST', f'/complete-task/{member_id}/{task_id}', admin_id,
+                                      elevation=self.elevations[admin_id])
+            else:
+                status = self.request('POST', '/purchase', admin_id,
+                                      {"memberId": member_id, "itemId": "1"})
+            self.results.setdefault(route, []).append((time.perf_counter() - start, status))
+
+# Funksjon: Slår sammen resultatene og regner ut persentiler og RPS per rute.
+def summarize(all_results, elapsed):
+    merged = {}
+    for results in all_results:
+        for route, samples in results.items():
+            merged.setdefault(route, []).extend(samples)
+
+    report = {}
+    for route, samples in sorted(merged.items()):
+        latencies = sorted(seconds for seconds, _ in samples)
+        report[route] = {
+            "requests": len(samples),
+            "errors": sum(1 for _, status in samples if status >= 400),
+            "rps": round(len(samples) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        }
+    total = sum(route["requests"] for route in report.values())
+    report["total"] = {"requests": total, "rps": round(total / elapsed, 1)}
+    return report
+
+# Funksjon: Sammenligner med en baseline. Returnerer en liste med regresjoner.
+# En rute regnes som tregere hvis p95 har økt, eller RPS har sunket, mer enn toleransen.
+def compare(report, baseline, tolerance):
+    regressions = []
+    for route, current in report.items():
+        base = baseline.get(route)
+        if base is None:
+            continue
+        if "p95_ms" in base and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {base['p95_ms']} ms -> {current['p95_ms']} ms")
+        if base.get("rps") and current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{route}: {base['rps']} -> {current['rps']} req/s")
+    return regressions
+
+def print_report(report):
+    print(f"{'rute':<15}{'antall':>9}{'feil':>7}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route, row in report.items():
+        if route == "total":
+            continue
+        print(f"{route:<15}{row['requests']:>9}{row['errors']:>7}{row['rps']:>10}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}")
+    print(f"{'total':<15}{report['total']['requests']:>9}{'':>7}{report['total']['rps']:>10}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lasttest av backend uten Firebase.")
+    parser.add_argument('--storage', default='memory', choices=['memory', 'sqlite', 'firestore'],
+                        help="firestore krever FIRESTORE_EMULATOR_HOST")
+    parser.add_argument('--duration', type=float, default=10.0, help="sekunder")
+    parser.add_argument('--warmup', type=float, default=1.0, help="sekunder før målingen starter")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--admins', type=int, default=20)
+    parser.add_argument('--members', type=int, default=5, help="medlemmer per admin")
+    parser.add_argument('--tasks', type=int, default=50, help="åpne oppgaver per medlem")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', help="sammenlign med denne baseline-filen")
+    parser.add_argument('--save-baseline', help="lagre resultatet som baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="tillatt forverring, 0.2 = 20 %%")
+    args = parser.parse_args(argv)
+
+    if args.storage == 'firestore' and not os.getenv('FIRESTORE_EMULATOR_HOST'):
+        raise SystemExit("--storage firestore krever FIRESTORE_EMULATOR_HOST, benchmark skal aldri gå mot produksjon.")
+    os.environ['STORAGE_BACKEND'] = args.storage
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('SECRET_KEY', secrets.token_hex(32)) # Admin-tokens krever en ekte nøkkel (elevation.py).
+    random.seed(args.seed)
+
+    # SQLite får en ny, midlertidig database for hver kjøring. Med en fast fil ville testdataene fra forrige
+    # kjøring ligget der fortsatt, og tallene kunne ikke sammenlignes med en baseline. Sett SQLITE_PATH for å
+    # bruke en egen fil.
+    tmp_dir = None
+    if args.storage == 'sqlite' and not os.getenv('SQLITE_PATH'):
+        tmp_dir = tempfile.mkdtemp(prefix='bench-')
+        os.environ['SQLITE_PATH'] = os.path.join(tmp_dir, 'bench.sqlite3')
+    try:
+        return run(args)
+    finally:
+        if tmp_dir is not None:
+            from storage import get_store, set_store
+            get_store().close()
+            set_store(None)
+            del os.environ['SQLITE_PATH']
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+# Funksjon: Legger inn testdata, starter appen og kjører lasttesten. Returnerer utgangskoden.
+def run(args):
+    import admin
+    import purchase
+    import elevation
+    from app import create_app
+    from storage import get_store
+
+    # Tokenene verifiseres uten nettverk og uten Firebase-prosjekt.
+    admin.verify_firebase_token = fake_verify
+    purchase.verify_firebase_token = fake_verify
+
+    members, open_tasks = seed(get_store(), args.admins, args.members, args.tasks)
+    app = create_app()
+    with app.app_context():
+        elevations = {admin_id: elevation.issue_token(admin_id) for admin_id in members}
+    server = start_server(app)
+    tasks_lock = threading.Lock()
+
+    if args.warmup > 0:
+        warmup = [Worker(server.server_port, args.mix, members, elevations, open_tasks, tasks_lock,
+                         time.perf_counter() + args.warmup, {}) for _ in range(args.concurrency)]
+        for worker in warmup:
+            worker.start()
+        for worker in warmup:
+            worker.join()
+
+    results = [{} for _ in range(args.concurrency)]
+    start = time.perf_counter()
+    workers = [Worker(server.server_port, args.mix, members, elevations, open_tasks, tasks_lock,
+                      start + args.duration, result) for result in results]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    report = summarize(results, elapsed)
+    print(f"lagring={args.storage} samtidighet={args.concurrency} varighet={elapsed:.1f}s")
+    print_report(report)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline lagret i {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESJON {line}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,580 @@
+# bulk.py - Import og eksport av husstander (admins), medlemmer og oppgaver i store mengder.
+# Formatet er NDJSON (én JSON-post per linje) eller CSV med de samme feltene som kolonner. Hver post har feltet type:
+#   household - username, email, admin_pin, valgfritt phone, og enten password (brukeren opprettes i Firebase
+#               Authentication) eller uid (kun profilen lagres, brukeren finnes fra før). Bare fra kommandolinja.
+#   member    - name, code, color, valgfritt money, cosmetics og equippedCosmetics. Hører til household (ref til
+#               en husstand) eller adminId. Ved import via API hører alt til innlogget admin.
+#   task      - title, price, valgfritt completed. Hører til member (ref til et medlem) eller memberId.
+# Valideringen er den samme som i /register, /create-member og /add-task.
+#
+# Postene skrives i biter (IMPORT_CHUNK_SIZE) av IMPORT_WORKERS tråder, og bare et begrenset antall biter ligger
+# i minnet om gangen. ID-ene lages fra ref (eller linjenummeret), så en import som kjøres på nytt ikke lager
+# duplikater: medlemmer som finnes flettes med postene (tellerne og historikken beholdes), og oppgaver som finnes
+# hoppes over, slik at tellerne ikke økes to ganger. Fra kommandolinja lagres et sjekkpunkt (linjen der alt før er
+# skrevet) i <fil>.checkpoint, og en avbrutt import fortsetter derfra.
+#
+#   python bulk.py import familier.ndjson [--format csv] [--workers 8] [--chunk-size 400]
+#   python bulk.py export backup.ndjson [--admin <uid>] [--format csv]
+# Via API: POST /import?format=ndjson|csv (body er filen) og GET /export?format=ndjson|csv for innlogget admin.
+
+import os
+import io
+import sys
+import csv
+import json
+import time
+import uuid
+import argparse
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from storage import get_store
+from storage.base import stable_id, task_record
+from register import is_valid_email, is_valid_phone       # Samme validering som /register.
+from admin import get_uid_from_token, new_member_data, new_task_data
+from elevation import hash_pin, is_hashed
+from ownership import ownership
+from member_cache import member_cache
+from changes import change_hub, RESYNC
+from cache import LRUCache
+
+log = logging.getLogger(__name__)
+
+# Antall poster som skrives samlet.
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 400))
+
+# Antall tråder som skriver samtidig.
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", 8))
+
+# Antall medlemmer som får oppgavene sine hentet samlet ved eksport.
+EXPORT_CHUNK_SIZE = 200
+
+# Maks antall feil som tas med i rapporten. Resten telles bare.
+MAX_REPORTED_ERRORS = 100
+
+RECORD_TYPES = ('household', 'member', 'task')
+FORMATS = ('ndjson', 'csv')
+MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+CSV_FIELDS = ['type', 'ref', 'id', 'uid', 'household', 'adminId', 'member', 'memberId',
+              'username', 'email', 'phone', 'password', 'admin_pin',
+              'name', 'code', 'color', 'money', 'title', 'price', 'completed']
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _number(text):
+    try:
+        value = float(text)
+    except ValueError:
+        return text # Valideringen gir feilmelding.
+    return int(value) if value.is_integer() else value
+
+# Funksjon: Leser NDJSON. Gir (linjenummer, post, feilmelding) for hver linje som ikke er tom.
+def read_ndjson(lines):
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_no, None, "Ugyldig JSON"
+            continue
+        if isinstance(record, dict):
+            yield line_no, record, None
+        else:
+            yield line_no, None, "Posten må være et objekt"
+
+# Funksjon: Leser CSV med overskriftsrad. Tomme celler utelates, og tall og sannhetsverdier gjøres om.
+def read_csv(lines):
+    reader = csv.DictReader(lines)
+    for row in reader:
+        record = {key: value for key, value in row.items() if key and value not in (None, '')}
+        for field in ('money', 'price'):
+            if field in record:
+                record[field] = _number(record[field])
+        if 'completed' in record:
+            record['completed'] = record['completed'].strip().lower() in ('1', 'true', 'ja', 'yes')
+        yield reader.line_num, record, None
+
+READERS = {'ndjson': read_ndjson, 'csv': read_csv}
+
+# Funksjon: uid for en husstand med ref (eller e-post) uten egen uid.
+def household_uid(key):
+    return stable_id('household', key)
+
+# Klasse: Sjekkpunkt for en import fra fil. Lagrer linjen der alt før er skrevet.
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self.line = 0
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.line = json.load(f).get('line', 0)
+        except FileNotFoundError:
+            self.line = 0
+        return self.line
+
+    # Skriver til en midlertidig fil og bytter den inn, så sjekkpunktet aldri blir halvskrevet.
+    def save(self, line):
+        with self._lock:
+            if line <= self.line:
+                return
+            self.line = line
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({"line": line}, f)
+            os.replace(tmp, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+# Klasse: Validerer postene og skriver dem i biter med flere tråder.
+# Postene skrives i rekkefølgen de kommer. Når typen endres (f.eks. fra medlemmer til oppgaver) ventes det
+# til alle bitene før er skrevet, siden oppgavene trenger medlemmene.
+class Importer:
+    def __init__(self, store, admin_id=None, trusted=False, workers=IMPORT_WORKERS, chunk_size=IMPORT_CHUNK_SIZE,
+                 on_progress=None, create_user=None):
+        self.store = store
+        self.admin_id = admin_id       # Satt ved import via API: alt hører til denne admin.
+        self.trusted = trusted         # Fra kommandolinja: id og uid i postene brukes som de er.
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.on_progress = on_progress # Kalles med linjen der alt før er skrevet.
+        self.create_user = create_user # Oppretter brukeren i Firebase Authentication (household med password).
+        self.counts = dict.fromkeys(RECORD_TYPES, 0)
+        self.skipped = 0               # Oppgaver som fantes fra før.
+        self.errors = []
+        self.error_count = 0
+        self.failed_chunks = 0
+        self.line = 0                  # Alle linjer til og med denne er ferdige.
+        self.touched = set()           # Medlemmer som er skrevet ved import via API, for å invalidere cachen.
+        self._started = time.time()
+        self._failed_households = set()
+        self._owners = LRUCache(maxsize=10000) # medlem-ID -> admin, for oppgaver
+        self._in_flight = {}           # første linje -> siste linje for biter som skrives
+        self._submitted = 0            # Siste linje som er sendt til skriving eller avvist.
+        self._lock = threading.Lock()
+
+    def _error(self, line_no, message):
+        with self._lock:
+            self.error_count += 1
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                self.errors.append({"line": line_no, "error": message})
+
+    # Funksjon: Leser postene, validerer dem og skriver dem. start_after er linjen fra sjekkpunktet.
+    def run(self, rows, start_after=0):
+        self.line = self._submitted = start_after
+        slots = threading.BoundedSemaphore(self.workers * 2) # Begrenser hvor mange biter som ligger i minnet.
+        futures = []
+        kind, chunk = None, []
+        last_line = start_after
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='import') as pool:
+            def submit():
+                if not chunk:
+                    return
+                slots.acquire()
+                items = list(chunk)
+                chunk.clear()
+                with self._lock:
+                    self._in_flight[items[0][0]] = items[-1][0]
+                    self._submitted = items[-1][0]
+                future = pool.submit(self._write_chunk, kind, items)
+                future.add_done_callback(lambda _: slots.release())
+                futures[:] = [f for f in futures if not f.done()]
+                futures.append(future)
+
+            def drain():
+                submit()
+                for future in futures:
+                    future.result()
+                futures.clear()
+
+            for line_no, record, error in rows:
+                if line_no <= start_after:
+                    continue
+                last_line = line_no
+                if error is None:
+                    # Typen byttes før posten valideres, slik at f.eks. medlemmene er skrevet før oppgavene slår dem opp.
+                    if record.get('type') != kind and record.get('type') in RECORD_TYPES:
+                        drain()
+                        kind = record['type']
+                    try:
+                        _, payload = self.prepare(line_no, record)
+                    except ValueError as e:
+                        error = str(e)
+                if error is not None:
+                    self._error(line_no, error)
+                    if not chunk:
+                        with self._lock:
+                            self._submitted = line_no
+                    continue
+
+                chunk.append((line_no, payload))
+                if len(chunk) >= self.chunk_size:
+                    submit()
+            drain()
+        with self._lock:
+            self._submitted = max(self._submitted, last_line) # Avviste linjer etter siste bit er også ferdige.
+        self._advance()
+        return self
+
+    # Funksjon: Validerer en post og gjør den om til det som skal skrives. Kaster ValueError med feilmeldingen.
+    def prepare(self, line_no, record):
+        kind = record.get('type')
+        if kind == 'household':
+            return kind, self._household(record)
+        if kind == 'member':
+            return kind, self._member(line_no, record)
+        if kind == 'task':
+            return kind, self._task(line_no, record)
+        raise ValueError(f"Ukjent type: {kind}")
+
+    def _household(self, record):
+        if self.admin_id is not None:
+            raise ValueError("Husstander kan bare importeres fra kommandolinja.")
+        username, email, phone = record.get('username'), record.get('email'), record.get('phone')
+        if not username or not email or not record.get('admin_pin'):
+            raise ValueError("Fyll ut alle felt!")
+        if not is_valid_email(email):
+            raise ValueError("Ugyldig e-postadresse!")
+        if phone and not is_valid_phone(phone):
+            raise ValueError("Telefonnummer må være format +4712345678")
+        if not record.get('password') and not record.get('uid'):
+            raise ValueError("password eller uid er påkrevd.")
+
+        uid = record.get('uid') or household_uid(record.get('ref') or email.strip().lower())
+        profile = {"username": username, "email": email, "uid": uid, "phone": phone, "admin_pin": str(record['admin_pin'])}
+        return {"ref": record.get('ref'), "uid": uid, "profile": profile, "password": record.get('password')}
+
+    def _admin_for(self, record):
+        if self.admin_id is not None:
+            return self.admin_id
+        if record.get('adminId'):
+            return record['adminId']
+        household = record.get('household')
+        if not household:
+            raise ValueError("household eller adminId er påkrevd.")
+        if household in self._failed_households:
+            raise ValueError(f"Husstanden {household} ble ikke importert.")
+        return household_uid(household)
+
+    # Medlemmer fra en ref får samme ID hver gang. Via API er ref-ene per admin, så to admins kan bruke samme ref.
+    def member_id(self, ref):
+        return stable_id('member', self.admin_id or '', ref)
+
+    def _member(self, line_no, record):
+        name, code, color = record.get('name'), record.get('code'), record.get('color')
+        if not name or not code or not color:
+            raise ValueError("Alle felt er påkrevd!")
+        admin_id = self._admin_for(record)
+
+        member_id = record.get('id')
+        if member_id:
+            if not self.trusted and ownership.check(member_id, admin_id) == 403:
+                raise ValueError("Ingen tilgang!")
+        else:
+            member_id = self.member_id(record.get('ref') or f"line:{line_no}")
+
+        data = new_member_data(str(name), str(code), color, admin_id)
+        if 'money' in record:
+            if not _is_number(record['money']):
+                raise ValueError("money må være et tall.")
+            data['money'] = record['money']
+        for field in ('cosmetics', 'equippedCosmetics'):
+            if isinstance(record.get(field), list):
+                data[field] = record[field]
+        self._owners.set(member_id, admin_id)
+        return member_id, data
+
+    # Medlemmer fra denne importen finnes i _owners. Andre slås opp i eierskapsindeksen (API) eller i lagringen.
+    def _owner(self, member_id):
+        owner = self._owners.get(member_id)
+        if owner is not None:
+            return owner
+        if self.admin_id is not None:
+            status = ownership.check(member_id, self.admin_id)
+            if status == 403:
+                raise ValueError("Ingen tilgang!")
+            return None if status == 404 else self.admin_id
+        owner = self.store.members.get_owner(member_id)
+        if owner is not None:
+            self._owners.set(member_id, owner)
+        return owner
+
+    def _task(self, line_no, record):
+        title, price = record.get('title'), record.get('price')
+        if not title or price is None:
+            raise ValueError("Tittel og pris er påkrevd")
+        if not _is_number(price):
+            raise ValueError("Pris må være et tall.")
+        if record.get('memberId'):
+            member_id = record['memberId']
+        elif record.get('member'):
+            member_id = self.member_id(record['member'])
+        else:
+            raise ValueError("member eller memberId er påkrevd.")
+        admin_id = self._owner(member_id)
+        if admin_id is None:
+            raise ValueError("Medlem ikke funnet!")
+
+        # En oppgitt oppgave-ID som finnes fra før hoppes over ved skriving, så oppgaven til en annen admin
+        # blir aldri skrevet over.
+        if record.get('id'):
+            task_id = record['id']
+        else:
+            task_id = str(uuid.uuid5(uuid.NAMESPACE_OID, f"{member_id}:{record.get('ref') or f'line:{line_no}'}"))
+        task = new_task_data(str(title), price, task_id)
+        task['completed'] = bool(record.get('completed', False))
+        return task_record(member_id, admin_id, task, self._started + line_no * 1e-6)
+
+    # Skriver én bit. En bit som feiler blir liggende i _in_flight, så sjekkpunktet ikke flyttes forbi den.
+    def _write_chunk(self, kind, items):
+        try:
+            if kind == 'household':
+                written = self._write_households(items)
+            elif kind == 'member':
+                written = self._write_members(items)
+            else:
+                written = self._write_tasks(items)
+        except Exception as e:
+            log.exception("Import av linje %s-%s feilet", items[0][0], items[-1][0])
+            if kind == 'member':
+                for _, (member_id, _) in items: # Oppgavene til disse medlemmene skal gi "Medlem ikke funnet!".
+                    self._owners.delete(member_id)
+            with self._lock:
+                self.failed_chunks += 1
+            self._error(items[0][0], f"Linje {items[0][0]}-{items[-1][0]} ble ikke skrevet: {e}")
+            return
+
+        with self._lock:
+            self.counts[kind] += written
+            del self._in_flight[items[0][0]]
+        self._advance()
+
+    def _write_households(self, items):
+        written = 0
+        for line_no, household in items:
+            profile = household['profile']
+            try:
+                if household['password'] and self.create_user is not None:
+                    self.create_user(household['uid'], profile, household['password'])
+            except ValueError as e:
+                if household['ref']:
+                    self._failed_households.add(household['ref'])
+                self._error(line_no, str(e))
+                continue
+            if not is_hashed(profile['admin_pin']):
+                profile['admin_pin'] = hash_pin(profile['admin_pin'])
+            self.store.users.create(household['uid'], profile)
+            written += 1
+        return written
+
+    def _write_members(self, items):
+        members = [payload for _, payload in items]
+        self.store.members.put_many(members)
+        for member_id, data in members:
+            ownership.set(member_id, data['adminId'])
+            if self.admin_id is not None:
+                self.touched.add(member_id)
+        return len(members)
+
+    def _write_tasks(self, items):
+        records = self.store.tasks.insert_missing([record for _, record in items])
+        with self._lock:
+            self.skipped += len(items) - len(records)
+        if self.admin_id is not None:
+            self.touched.update(record['memberId'] for record in records)
+        return len(records)
+
+    # Flytter linjen der alt før er skrevet, og melder fra om den.
+    def _advance(self):
+        with self._lock:
+            line = min(self._in_flight) - 1 if self._in_flight else self._submitted
+            if line <= self.line:
+                return
+            self.line = line
+        if self.on_progress is not None:
+            self.on_progress(line)
+
+    def report(self):
+        return {
+            "imported": dict(self.counts),
+            "skipped": self.skipped,
+            "errorCount": self.error_count,
+            "errors": list(self.errors),
+            "failedChunks": self.failed_chunks,
+            "line": self.line,
+        }
+
+# Funksjon: Oppretter brukeren i Firebase Authentication med fast uid. Finnes brukeren allerede med samme
+# uid og e-post (f.eks. når en import kjøres på nytt), brukes den.
+def firebase_create_user(uid, profile, password):
+    from firebase_admin import auth
+    from firebase_config import get_app
+
+    kwargs = {"uid": uid, "email": profile['email'], "password": password, "display_name": profile['username']}
+    if profile.get('phone'):
+        kwargs["phone_number"] = profile['phone']
+    try:
+        auth.create_user(**kwargs, app=get_app())
+    except (auth.UidAlreadyExistsError, auth.EmailAlreadyExistsError):
+        try:
+            existing = auth.get_user(uid, app=get_app())
+        except auth.UserNotFoundError:
+            existing = None
+        if existing is None or (existing.email or '').lower() != profile['email'].lower():
+            raise ValueError("Bruker eller email eksisterer allerede!")
+
+def member_row(member_id, data):
+    row = {"type": "member", "id": member_id, "adminId": data.get('adminId'), "name": data.get('name'),
+           "code": data.get('code'), "color": (data.get('character') or {}).get('color'), "money": data.get('money', 0)}
+    for field in ('cosmetics', 'equippedCosmetics'):
+        if data.get(field):
+            row[field] = data[field]
+    return row
+
+def task_rows(store, member_ids):
+    for member_id, records in store.tasks.list_by_members(member_ids).items():
+        for record in records:
+            yield {"type": "task", "id": record['id'], "memberId": member_id, "title": record.get('title'),
+                   "price": record.get('price'), "completed": bool(record.get('completed'))}
+
+# Funksjon: Strømmer alle postene til en admin. Medlemmene leses i rekkefølge og oppgavene for
+# EXPORT_CHUNK_SIZE medlemmer om gangen, så minnebruken er begrenset uansett antall.
+def export_rows(store, admin_id, household=False):
+    if household:
+        profile = store.users.get(admin_id)
+        if profile is not None:
+            yield {"type": "household", "uid": admin_id, "username": profile.get('username'), "email": profile.get('email'),
+                   "phone": profile.get('phone'), "admin_pin": profile.get('admin_pin')}
+
+    member_ids = []
+    for member_id, data in store.members.list_by_admin(admin_id):
+        yield member_row(member_id, data)
+        member_ids.append(member_id)
+        if len(member_ids) == EXPORT_CHUNK_SIZE:
+            yield from task_rows(store, member_ids)
+            member_ids = []
+    yield from task_rows(store, member_ids)
+
+# Funksjon: Gjør om postene til tekst i valgt format, én linje om gangen.
+def format_rows(rows, fmt):
+    if fmt == 'ndjson':
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+bulk_blueprint = Blueprint('bulk', __name__)
+
+# Endepunkt: Importerer medlemmer og oppgaver for innlogget admin. Body er filen (NDJSON eller CSV).
+# Svaret har linjen der alt før er skrevet ("line"); send ?resumeAfter=<line> for å fortsette en avbrutt import.
+@bulk_blueprint.route('/import', methods=['POST'])
+def import_records():
+    uid, error, code = get_uid_from_token()
+    if error: return error, code
+
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        return jsonify({"error": f"format må være {' eller '.join(FORMATS)}."}), 400
+    start_after = request.args.get('resumeAfter', 0, type=int)
+
+    importer = Importer(get_store(), admin_id=uid)
+    try:
+        lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='') # Leses linje for linje, ikke hele body.
+        importer.run(READERS[fmt](lines), start_after)
+    except Exception as e:
+        log.exception("Import feilet!")
+        return jsonify(dict(importer.report(), error=str(e))), 500
+    finally:
+        if importer.touched:
+            keys = [member_cache.member_key(member_id) for member_id in importer.touched]
+            member_cache.invalidate_keys(member_cache.members_key(uid), *keys)
+            change_hub.publish(uid, RESYNC) # Klientene henter /members på nytt i stedet for én hendelse per medlem.
+
+    return jsonify(importer.report()), 200
+
+# Endepunkt: Eksporterer medlemmene og oppgavene til innlogget admin i samme format som importen.
+@bulk_blueprint.route('/export', methods=['GET'])
+def export_records():
+    uid, error, code = get_uid_from_token()
+    if error: return error, code
+
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        return jsonify({"error": f"format må være {' eller '.join(FORMATS)}."}), 400
+
+    response = Response(stream_with_context(format_rows(export_rows(get_store(), uid), fmt)), mimetype=MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=export.{fmt}'
+    return response
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import og eksport av husstander, medlemmer og oppgaver.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    importing = commands.add_parser('import', help="importer fra fil")
+    importing.add_argument('path')
+    importing.add_argument('--format', choices=FORMATS, help="standard er filendelsen")
+    importing.add_argument('--workers', type=int, default=IMPORT_WORKERS)
+    importing.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+    importing.add_argument('--checkpoint', help="standard er <fil>.checkpoint")
+    importing.add_argument('--restart', action='store_true', help="ignorer sjekkpunktet og start fra begynnelsen")
+
+    exporting = commands.add_parser('export', help="eksporter til fil")
+    exporting.add_argument('path')
+    exporting.add_argument('--format', choices=FORMATS, help="standard er filendelsen")
+    exporting.add_argument('--admin', action='append', help="uid, kan gis flere ganger (standard er alle)")
+
+    args = parser.parse_args(argv)
+    fmt = args.format or ('csv' if args.path.lower().endswith('.csv') else 'ndjson')
+    store = get_store()
+
+    if args.command == 'export':
+        admins = args.admin or [uid for uid, _ in store.users.iter_all()]
+        rows = (row for admin_id in admins for row in export_rows(store, admin_id, household=True))
+        with open(args.path, 'w', encoding='utf-8', newline='') as f:
+            for text in format_rows(rows, fmt):
+                f.write(text)
+        print(f"Eksporterte {len(admins)} husstander til {args.path}.")
+        return 0
+
+    checkpoint = Checkpoint(args.checkpoint or args.path + '.checkpoint')
+    start_after = 0 if args.restart else checkpoint.load()
+    if start_after:
+        print(f"Fortsetter etter linje {start_after} (sjekkpunkt {checkpoint.path}).")
+
+    started = time.perf_counter()
+    importer = Importer(store, trusted=True, workers=args.workers, chunk_size=args.chunk_size,
+                        on_progress=checkpoint.save, create_user=firebase_create_user)
+    with open(args.path, encoding='utf-8', newline='') as f:
+        importer.run(READERS[fmt](f), start_after)
+
+    report = importer.report()
+    for error in report["errors"]:
+        print(f"linje {error['line']}: {error['error']}")
+    counts = ', '.join(f"{count} {kind}" for kind, count in report["imported"].items())
+    print(f"Importerte {counts} på {time.perf_counter() - started:.1f}s, {report['skipped']} oppgaver fantes fra før, "
+          f"{report['errorCount']} feil.")
+    if report["failedChunks"]:
+        print(f"{report['failedChunks']} biter feilet. Kjør samme kommando på nytt for å fortsette fra linje {report['line']}.")
+        return 1
+    checkpoint.clear()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
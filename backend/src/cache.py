@@ -0,0 +1,153 @@
+# cache.py - Enkel minnebasert cache som brukes av flere moduler i backend.
+# Holder et begrenset antall elementer, kaster ut de minst brukte først (LRU)
+# og lar hvert element ha sitt eget utløpstidspunkt.
+
+import threading                      # Lås slik at cachen kan brukes fra flere tråder samtidig.
+import time                           # Brukes for å sjekke om et element har utløpt.
+from collections import OrderedDict   # Holder rekkefølgen på elementene for LRU-utkasting.
+
+# Klasse: LRU-cache med valgfritt utløpstidspunkt per element og tellere for treff og bom.
+class LRUCache:
+    def __init__(self, maxsize=1024, clock=time.time):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._data = OrderedDict() # nøkkel -> (verdi, utløpstidspunkt eller None)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # Henter en verdi. Utløpte elementer fjernes og telles som bom.
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key) # Markerer elementet som sist brukt.
+            self.hits += 1
+            return value
+
+    # Lagrer en verdi. expires_at er et absolutt tidspunkt (sekunder siden epoch).
+    def set(self, key, value, expires_at=None):
+        if expires_at is not None and expires_at <= self._clock():
+            return # Ingen vits i å lagre noe som allerede har utløpt.
+
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False) # Kaster ut elementet som er brukt minst nylig.
+                self.evictions += 1
+
+    # Fjerner en nøkkel hvis den finnes.
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    # Tømmer hele cachen.
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    # Returnerer tellere som kan brukes til overvåking.
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+# Klasse: Prosesslokal cache med fast levetid (TTL) for hvert element.
+# Grensesnittet (get, set, delete, stats) er det samme som en delt cache (f.eks. Redis) må tilby
+# for å kunne brukes i stedet, slik at flere prosesser kan dele samme cache.
+class LocalCache:
+    def __init__(self, maxsize=1024, ttl=30, clock=time.time):
+        self.ttl = ttl
+        self._clock = clock
+        self._lru = LRUCache(maxsize=maxsize, clock=clock)
+
+    def get(self, key):
+        return self._lru.get(key)
+
+    def set(self, key, value, ttl=None):
+        self._lru.set(key, value, expires_at=self._clock() + (ttl if ttl is not None else self.ttl))
+
+    def delete(self, *keys):
+        for key in keys:
+            self._lru.delete(key)
+
+    def stats(self):
+        return self._lru.stats()
+
+# Antall tellere som brukes til å oppdage invalidering mens en loader kjører.
+GENERATION_SLOTS = 4096
+
+# Klasse: Read-through-cache foran lagringslaget. backend er en LocalCache eller en delt cache med samme grensesnitt.
+class ReadThroughCache:
+    def __init__(self, backend):
+        self.backend = backend
+        # Tellere som økes ved hver invalidering. Nøklene fordeles på et fast antall tellere
+        # slik at minnebruken er begrenset; en delt teller gjør bare at et svar av og til ikke caches.
+        self._generations = [0] * GENERATION_SLOTS
+        self._lock = threading.Lock()
+
+    def _slot(self, key):
+        return hash(key) % GENERATION_SLOTS
+
+    def _generation(self, key):
+        with self._lock:
+            return self._generations[self._slot(key)]
+
+    # Henter fra cachen, eller kaller loader() og lagrer svaret.
+    # Svaret lagres ikke hvis nøkkelen ble invalidert mens loader() kjørte, ellers kunne gamle data blitt liggende.
+    def read_through(self, key, loader):
+        value = self.backend.get(key)
+        if value is not None:
+            return value
+
+        generation = self._generation(key)
+        value = loader()
+        if value is not None and self._generation(key) == generation:
+            self.backend.set(key, value)
+        return value
+
+    # Som read_through, men for asynkrone loadere (ASGI-modus).
+    async def read_through_async(self, key, loader):
+        value = self.backend.get(key)
+        if value is not None:
+            return value
+
+        generation = self._generation(key)
+        value = await loader()
+        if value is not None and self._generation(key) == generation:
+            self.backend.set(key, value)
+        return value
+
+    # Fjerner nøklene og sørger for at loadere som kjører nå ikke lagrer gamle data.
+    def invalidate_keys(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._generations[self._slot(key)] += 1
+        self.backend.delete(*keys)
+
+    def stats(self):
+        return self.backend.stats()
@@ -0,0 +1,140 @@
+# catalog.py - Varekatalogen for butikken, lest fra backend/catalog.json (kan overstyres med CATALOG_PATH).
+# Katalogen leses inn én gang til et uforanderlig oppslag på vare-ID, og svaret til GET /catalog
+# serialiseres og komprimeres samtidig. /purchase slår opp prisen her i stedet for å stole på klienten.
+# Filen sjekkes på nytt høyst hvert CATALOG_CHECK_SECONDS sekund og lastes inn igjen når den er endret,
+# så en ny katalog tas i bruk uten omstart. En ugyldig fil logges, og forrige katalog beholdes.
+#
+# Format: {"version": 2, "items": [{"id": "1", "name": "🎩 Hatt", "price": 3}, ...]}
+
+import os
+import json
+import gzip
+import hashlib
+import logging
+import threading
+import time
+from types import MappingProxyType            # Skrivebeskyttet visning av en dict.
+from flask import Blueprint, Response, request
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATALOG_PATH = os.getenv("CATALOG_PATH", os.path.join(BASE_DIR, 'catalog.json'))
+
+# Hvor ofte filen kan sjekkes for endringer.
+CATALOG_CHECK_SECONDS = float(os.getenv("CATALOG_CHECK_SECONDS", 5))
+
+# Klasse: Én versjon av katalogen. Endres aldri etter at den er laget, så den kan deles mellom tråder uten lås.
+class Catalog:
+    def __init__(self, data):
+        if not isinstance(data, dict) or not isinstance(data.get('items'), list):
+            raise ValueError("Katalogen må ha en liste med items.")
+
+        items = {}
+        for item in data['items']:
+            item_id = item.get('id') if isinstance(item, dict) else None
+            if not isinstance(item_id, str) or not item_id:
+                raise ValueError(f"Vare uten gyldig id: {item!r}")
+            if item_id in items:
+                raise ValueError(f"Vare-ID {item_id} finnes flere ganger.")
+            price = item.get('price')
+            if isinstance(price, bool) or not isinstance(price, (int, float)) or price < 0:
+                raise ValueError(f"Vare {item_id} har ugyldig pris.")
+            items[item_id] = MappingProxyType(dict(item))
+
+        self.version = data.get('version', 0)
+        self.items = MappingProxyType(items)
+        # Svaret til GET /catalog, ferdig serialisert og komprimert.
+        self.body = json.dumps({"version": self.version, "items": [dict(item) for item in items.values()]},
+                               ensure_ascii=False).encode('utf-8')
+        self.gzipped = gzip.compress(self.body, mtime=0) # mtime=0 gir samme bytes for samme innhold.
+        self.etag = hashlib.sha256(self.body).hexdigest()
+
+    def get(self, item_id):
+        return self.items.get(item_id)
+
+# Klasse: Holder gjeldende katalog og bytter den ut når filen endres.
+class CatalogIndex:
+    def __init__(self, path, check_interval=CATALOG_CHECK_SECONDS, clock=time.monotonic):
+        self.path = path
+        self.check_interval = check_interval
+        self.reloads = 0
+        self.reload_errors = 0
+        self._clock = clock
+        self._catalog = None
+        self._stamp = None      # (mtime, størrelse) for filen katalogen ble lest fra.
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def _stat(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, stamp):
+        with open(self.path, encoding='utf-8') as f:
+            catalog = Catalog(json.load(f))
+        self._catalog, self._stamp = catalog, stamp
+        self.reloads += 1
+        log.info("Katalog versjon %s lastet (%d varer)", catalog.version, len(catalog.items))
+
+    # Returnerer gjeldende katalog. Bare én tråd sjekker filen om gangen; de andre får forrige versjon imens.
+    def current(self):
+        catalog = self._catalog
+        if catalog is not None and self._clock() < self._next_check:
+            return catalog
+        if catalog is not None and not self._lock.acquire(blocking=False):
+            return catalog
+        if catalog is None:
+            self._lock.acquire() # Første innlasting må vente.
+        try:
+            if self._catalog is None or self._clock() >= self._next_check:
+                self._refresh()
+            return self._catalog
+        finally:
+            self._lock.release()
+
+    def _refresh(self):
+        self._next_check = self._clock() + self.check_interval
+        try:
+            stamp = self._stat()
+            if stamp != self._stamp:
+                self._load(stamp)
+        except (OSError, ValueError) as e: # json.JSONDecodeError er en ValueError.
+            if self._catalog is None:
+                raise
+            self.reload_errors += 1
+            log.error("Kunne ikke laste katalogen på nytt, beholder versjon %s: %s", self._catalog.version, e)
+
+    # Slår opp en vare. Returnerer None hvis vare-ID-en ikke finnes.
+    def get(self, item_id):
+        return self.current().get(item_id)
+
+    def stats(self):
+        catalog = self._catalog
+        return {
+            "version": catalog.version if catalog is not None else 0,
+            "items": len(catalog.items) if catalog is not None else 0,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+        }
+
+# Delt katalog for prosessen.
+catalog = CatalogIndex(CATALOG_PATH)
+
+catalog_blueprint = Blueprint('catalog', __name__)
+
+# Endepunkt: Henter varekatalogen. Krever ikke innlogging, innholdet er det samme for alle.
+@catalog_blueprint.route('/catalog', methods=['GET'])
+def get_catalog():
+    current = catalog.current()
+    if 'gzip' in request.accept_encodings:
+        response = Response(current.gzipped, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(f"{current.etag}-gzip") # Hver koding må ha sin egen sterke ETag.
+    else:
+        response = Response(current.body, mimetype='application/json')
+        response.set_etag(current.etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.cache_control.public = True
+    response.cache_control.no_cache = True # Klienten må spørre på nytt, men får 304 hvis katalogen er lik.
+    return response.make_conditional(request)
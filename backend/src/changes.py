@@ -0,0 +1,222 @@
+# changes.py - Endringsstrøm for medlemmer, sendt til frontend som server-sent events (GET /changes).
+# Skriverutene i admin.py og purchase.py melder fra om hva som ble endret, og hver tilkoblede klient
+# får endringene for sin admin i stedet for å spørre /members på nytt.
+#
+# Hendelsene (feltet "type"):
+#   member.created - {"id", "member"}: nytt medlem med alle felter
+#   member.updated - {"id", "changes", "tasks", "removedTasks"}: changes er felt-stier som i
+#                    storage.base.apply_update (f.eks. "character.color"), tasks er oppgaver som er
+#                    lagt til eller endret (erstattes på id), removedTasks er ID-er som er fjernet
+#   member.deleted - {"id"}
+#   resync         - klienten har falt for langt bak og må hente /members på nytt
+#
+# Med CHANGE_FEED_SOURCE=firestore brukes én delt on_snapshot-lytter per admin i stedet for lokale
+# meldinger, slik at endringer fra alle prosesser kommer med. Standard er local (kun denne prosessen).
+
+import os
+import json
+import queue
+import threading
+from storage.base import public_task
+
+# Maks antall hendelser som kan vente per klient før klienten må synkronisere på nytt.
+CHANGE_QUEUE_SIZE = int(os.getenv("CHANGE_QUEUE_SIZE", 256))
+
+# Sekunder mellom heartbeat-kommentarer. Holder tilkoblingen åpen gjennom proxyer og oppdager klienter som er borte.
+HEARTBEAT_SECONDS = float(os.getenv("CHANGE_HEARTBEAT_SECONDS", 15))
+
+# Maks antall samtidige strømmer per admin i denne prosessen.
+MAX_CLIENTS_PER_ADMIN = int(os.getenv("CHANGE_MAX_CLIENTS_PER_ADMIN", 3))
+
+# Maks antall strømmer i alt i denne prosessen når /changes kjøres av Flask (gunicorn). Der holder hver strøm av
+# en tråd, så grensen er én under antall tråder slik at det alltid er en tråd ledig til andre forespørsler.
+# I asgi.py holder ikke strømmene av tråder, og bare grensen per admin gjelder.
+MAX_THREAD_STREAMS = int(os.getenv("CHANGE_MAX_THREAD_STREAMS", max(1, int(os.getenv("GUNICORN_THREADS", 4)) - 1)))
+
+RESYNC = {"type": "resync"}
+
+# Klasse: Én tilkoblet klient med en begrenset kø.
+class Subscription:
+    def __init__(self, admin_id, maxsize=CHANGE_QUEUE_SIZE):
+        self.admin_id = admin_id
+        self.overflows = 0
+        self.on_push = None # Kalles etter hver hendelse, brukes av asgi.py for å vekke strømmen.
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock() # Flere skriveruter kan legge i køen samtidig.
+
+    # Legger en hendelse i køen uten å vente. Er køen full, leser klienten for sakte:
+    # køen tømmes og klienten får beskjed om å hente alt på nytt, så ingen skriving blir holdt igjen.
+    def push(self, event):
+        with self._lock:
+            try:
+                self._queue.put_nowait(event)
+            except queue.Full:
+                self.overflows += 1
+                try:
+                    while True:
+                        self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self._queue.put_nowait(RESYNC)
+        if self.on_push is not None:
+            self.on_push()
+
+    # Neste hendelse uten å vente, eller None.
+    def get_nowait(self):
+        try:
+            return self._queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    # Venter på neste hendelse. Returnerer None ved tidsavbrudd (da sendes heartbeat).
+    def get(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+# Klasse: Fordeler hendelser til alle klientene til en admin.
+class ChangeHub:
+    def __init__(self, max_clients=MAX_CLIENTS_PER_ADMIN, source=None):
+        self.max_clients = max_clients
+        self.source = source # FirestoreFeed eller None for lokale meldinger.
+        self.published = 0
+        self._subscribers = {} # admin -> set med Subscription
+        self._lock = threading.Lock()
+
+    # Kobler til en klient. Returnerer None hvis admin allerede har for mange strømmer,
+    # eller hvis prosessen har max_total strømmer i alt.
+    def subscribe(self, admin_id, max_total=None):
+        with self._lock:
+            if max_total is not None and sum(map(len, self._subscribers.values())) >= max_total:
+                return None
+            subscribers = self._subscribers.setdefault(admin_id, set())
+            if len(subscribers) >= self.max_clients:
+                return None
+            subscription = Subscription(admin_id)
+            subscribers.add(subscription)
+            first = len(subscribers) == 1
+        if first and self.source is not None:
+            self.source.start(admin_id, self.deliver)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.admin_id, set())
+            subscribers.discard(subscription)
+            last = not subscribers
+            if last:
+                self._subscribers.pop(subscription.admin_id, None)
+        if last and self.source is not None:
+            self.source.stop(subscription.admin_id)
+
+    # Sender hendelsen til alle klientene til admin.
+    def deliver(self, admin_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(admin_id, ()))
+            self.published += 1
+        for subscription in subscribers:
+            subscription.push(event)
+
+    # Lokal melding fra en skriverute. Hoppes over når Firestore-lytteren leverer endringene.
+    def publish(self, admin_id, event):
+        if self.source is None:
+            self.deliver(admin_id, event)
+
+    def member_created(self, admin_id, member_id, member):
+        self.publish(admin_id, {"type": "member.created", "id": member_id, "member": dict(member, id=member_id, tasks=[])})
+
+    def member_updated(self, admin_id, member_id, changes=None, tasks=None, removed_tasks=None):
+        event = {"type": "member.updated", "id": member_id}
+        if changes:
+            event["changes"] = changes
+        if tasks:
+            event["tasks"] = [public_task(task) for task in tasks]
+        if removed_tasks:
+            event["removedTasks"] = list(removed_tasks)
+        self.publish(admin_id, event)
+
+    def member_deleted(self, admin_id, member_id):
+        self.publish(admin_id, {"type": "member.deleted", "id": member_id})
+
+    def stats(self):
+        with self._lock:
+            subscribers = [s for group in self._subscribers.values() for s in group]
+            return {
+                "admins": len(self._subscribers),
+                "clients": len(subscribers),
+                "published": self.published,
+                "overflows": sum(s.overflows for s in subscribers),
+            }
+
+# Klasse: Én delt on_snapshot-lytter per admin på medlemmene og oppgavene.
+# Første snapshot inneholder alle dokumentene og hoppes over, klientene har allerede hentet /members.
+class FirestoreFeed:
+    def __init__(self):
+        self._watches = {} # admin -> liste med lyttere
+        self._lock = threading.Lock()
+
+    def start(self, admin_id, deliver):
+        from firebase_config import get_db
+        from member_cache import member_cache # Holder cachen riktig også når endringen kom fra en annen prosess.
+
+        initial = {"members": True, "tasks": True} # Første snapshot fra hver lytter.
+
+        def on_members(snapshot, changes, read_time):
+            if initial.pop("members", False):
+                return
+            for change in changes:
+                member_id = change.document.id
+                member_cache.invalidate(admin_id, member_id)
+                if change.type.name == 'REMOVED':
+                    deliver(admin_id, {"type": "member.deleted", "id": member_id})
+                    continue
+                data = change.document.to_dict()
+                data.pop('adminId', None)
+                if change.type.name == 'ADDED':
+                    deliver(admin_id, {"type": "member.created", "id": member_id, "member": dict(data, id=member_id, tasks=[])})
+                else:
+                    deliver(admin_id, {"type": "member.updated", "id": member_id, "changes": data})
+
+        def on_tasks(snapshot, changes, read_time):
+            if initial.pop("tasks", False):
+                return
+            for change in changes:
+                record = change.document.to_dict() or {}
+                member_id = record.get('memberId')
+                if member_id is None:
+                    continue
+                member_cache.invalidate(admin_id, member_id)
+                if change.type.name == 'REMOVED':
+                    deliver(admin_id, {"type": "member.updated", "id": member_id, "removedTasks": [change.document.id]})
+                else:
+                    deliver(admin_id, {"type": "member.updated", "id": member_id, "tasks": [public_task(record)]})
+
+        db = get_db()
+        watches = [
+            db.collection('members').where('adminId', '==', admin_id).on_snapshot(on_members),
+            db.collection('tasks').where('adminId', '==', admin_id).on_snapshot(on_tasks),
+        ]
+        with self._lock:
+            old = self._watches.pop(admin_id, [])
+            self._watches[admin_id] = watches
+        for watch in old:
+            watch.unsubscribe()
+
+    def stop(self, admin_id):
+        with self._lock:
+            watches = self._watches.pop(admin_id, [])
+        for watch in watches:
+            watch.unsubscribe()
+
+# Funksjon: Formaterer en hendelse som server-sent event.
+def format_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+def _source():
+    if os.getenv("CHANGE_FEED_SOURCE", "local").lower() == 'firestore':
+        return FirestoreFeed()
+    return None
+
+# Delt hub for prosessen.
+change_hub = ChangeHub(source=_source())
@@ -0,0 +1,65 @@
+# compaction.py - Flytter gamle fullførte oppgaver til historikken (task_history).
+# Oppgavene til et medlem leses ved hver /member og /members, så fullførte oppgaver som bare blir liggende
+# gjør hver lesing dyrere. Oppgaver fullført for mer enn TASK_ARCHIVE_DAYS dager siden flyttes derfor ut,
+# og medlemmet får løpende summer i feltet history: {"count": antall, "earned": kroner}.
+# Historikken kan leses side for side med GET /member/<id>/history.
+#
+# Kjøres for alle medlemmene (f.eks. fra cron) med: python compaction.py [--days 30] [--dry-run] (inne i src-mappa).
+# Admin kan også komprimere sine egne medlemmer med POST /compact-tasks.
+
+import os
+import sys
+import time
+import argparse
+from storage import get_store
+from storage.base import ARCHIVE_BATCH, archivable
+
+# Fullførte oppgaver eldre enn dette flyttes til historikken.
+TASK_ARCHIVE_DAYS = float(os.getenv("TASK_ARCHIVE_DAYS", 30))
+
+def cutoff(days=TASK_ARCHIVE_DAYS, now=None):
+    return (now if now is not None else time.time()) - days * 86400
+
+# Funksjon: Arkiverer oppgavene til ett medlem i biter. Returnerer de arkiverte oppgavene.
+def compact_member(store, member_id, completed_before, dry_run=False):
+    if dry_run:
+        return [record for record in store.tasks.list(member_id, completed=True) if archivable(record, completed_before)]
+
+    archived = []
+    while True:
+        records = store.tasks.archive(member_id, completed_before, limit=ARCHIVE_BATCH)
+        archived.extend(records)
+        if len(records) < ARCHIVE_BATCH:
+            return archived
+
+# Funksjon: Arkiverer oppgavene til alle medlemmene til en admin. Returnerer {medlem-ID: arkiverte oppgaver}.
+def compact_admin(store, admin_id, completed_before):
+    result = {}
+    for member_id, _ in store.members.list_by_admin(admin_id, fields=[]):
+        records = compact_member(store, member_id, completed_before)
+        if records:
+            result[member_id] = records
+    return result
+
+# Funksjon: Går gjennom alle medlemmene i lagringen. Returnerer (medlemmer, oppgaver).
+def compact_all(store, completed_before, dry_run=False):
+    members = moved = 0
+    for member_id, _ in store.members.iter_all():
+        records = compact_member(store, member_id, completed_before, dry_run)
+        if records:
+            members += 1
+            moved += len(records)
+    return members, moved
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flytter gamle fullførte oppgaver til historikken.")
+    parser.add_argument('--days', type=float, default=TASK_ARCHIVE_DAYS, help="arkiver oppgaver fullført for mer enn så mange dager siden")
+    parser.add_argument('--dry-run', action='store_true', help="vis hva som ville blitt flyttet")
+    args = parser.parse_args(argv)
+
+    members, moved = compact_all(get_store(), cutoff(args.days), args.dry_run)
+    print(f"{'(prøvekjøring) ' if args.dry_run else ''}Arkiverte {moved} oppgaver fra {members} medlemmer.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+# elevation.py - Admin-PIN og kortlivede admin-tokens.
+# Når PIN-en er bekreftet i /verify-pin får frontend et signert token (SECRET_KEY) som gjelder for én bruker
+# i ADMIN_ELEVATION_TTL sekunder. Ruter som krever admin-PIN sjekker tokenet lokalt, uten å lese databasen.
+# Uten en ekte SECRET_KEY (mangler, eller er standardverdien fra app.py) kunne hvem som helst laget tokenet selv,
+# så da lages og godtas ingen admin-tokens, og /verify-pin svarer 503.
+# PIN-koder lagres som hash, og mislykkede forsøk begrenses per bruker.
+# Begrensningen holdes i minnet i hver prosess: med N gunicorn-workere kan en bruker få opptil N × PIN_MAX_ATTEMPTS
+# forsøk per vindu, avhengig av hvilken worker forespørselen havner hos.
+
+import os
+import hmac                                         # Sammenligning som ikke lekker tid (gamle PIN-er i klartekst).
+import threading
+import time
+from flask import current_app, request
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from werkzeug.security import generate_password_hash, check_password_hash
+from cache import LRUCache
+
+# Hvor lenge et admin-token gjelder.
+ELEVATION_TTL = int(os.getenv("ADMIN_ELEVATION_TTL", 900))
+
+# Headeren frontend sender tokenet i.
+ELEVATION_HEADER = 'X-Admin-Elevation'
+
+# Hash-formatene werkzeug lager, f.eks. "scrypt:32768:8:1$salt$hash".
+HASH_METHODS = ('scrypt', 'pbkdf2')
+
+# Verdien app.py bruker når SECRET_KEY ikke er satt. Den står i koden, så den kan ikke signere noe.
+DEFAULT_SECRET_KEY = "default_secret_key"
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='admin-elevation')
+
+# Funksjon: Sjekker at appen har en hemmelig nøkkel som kan brukes til å signere admin-tokens.
+def elevation_enabled():
+    secret = current_app.config.get('SECRET_KEY')
+    return bool(secret) and secret != DEFAULT_SECRET_KEY
+
+# Funksjon: Lager et admin-token for brukeren.
+def issue_token(uid):
+    if not elevation_enabled():
+        raise RuntimeError("SECRET_KEY er ikke satt, admin-tokens kan ikke lages.")
+    return _serializer().dumps({"uid": uid})
+
+# Funksjon: Sjekker at tokenet er gyldig, ikke utløpt og laget for denne brukeren.
+def check_token(token, uid):
+    if not token or not elevation_enabled():
+        return False
+    try:
+        data = _serializer().loads(token, max_age=ELEVATION_TTL)
+    except (SignatureExpired, BadSignature):
+        return False
+    return isinstance(data, dict) and data.get('uid') == uid
+
+# Funksjon: Sjekker admin-tokenet i forespørselen.
+def is_elevated(uid):
+    return check_token(request.headers.get(ELEVATION_HEADER), uid)
+
+def hash_pin(pin):
+    return generate_password_hash(str(pin))
+
+def is_hashed(stored):
+    return isinstance(stored, str) and '$' in stored and stored.split(':', 1)[0] in HASH_METHODS
+
+# Funksjon: Sjekker PIN mot det som er lagret. Returnerer (gyldig, må_oppgraderes).
+# Eldre brukere har PIN-en i klartekst; den gjøres om til hash første gang den brukes riktig.
+def check_pin(stored, pin):
+    if stored is None or pin is None:
+        return False, False
+    if is_hashed(stored):
+        return check_password_hash(stored, str(pin)), False
+    valid = hmac.compare_digest(str(stored).encode('utf-8'), str(pin).encode('utf-8'))
+    return valid, valid
+
+# Klasse: Begrenser antall forsøk per nøkkel innenfor et tidsvindu.
+# Et forsøk reserveres før PIN-en sjekkes, så samtidige forespørsler ikke kan komme forbi grensen alle på en gang.
+# Vinduet starter ved første forsøk, og nøkkelen er sperret til vinduet er over. Riktig PIN nullstiller telleren.
+class AttemptLimiter:
+    def __init__(self, max_attempts=5, window=300, maxsize=100000, clock=time.time):
+        self.max_attempts = max_attempts
+        self.window = window
+        self._clock = clock
+        self._failures = LRUCache(maxsize=maxsize, clock=clock) # nøkkel -> (antall, vinduet slutter)
+        self._lock = threading.Lock()
+
+    # Returnerer antall sekunder nøkkelen er sperret, eller 0.
+    def blocked_for(self, key):
+        entry = self._failures.get(key)
+        if entry is None or entry[0] < self.max_attempts:
+            return 0
+        return max(0, int(entry[1] - self._clock()) + 1)
+
+    # Teller et forsøk hvis nøkkelen ikke er sperret. Returnerer 0, eller antall sekunder nøkkelen er sperret.
+    def reserve(self, key):
+        with self._lock:
+            wait = self.blocked_for(key)
+            if not wait:
+                count, ends_at = self._failures.get(key) or (0, self._clock() + self.window)
+                self._failures.set(key, (count + 1, ends_at), expires_at=ends_at)
+            return wait
+
+    def reset(self, key):
+        self._failures.delete(key)
+
+# Delt begrensning for /verify-pin.
+pin_attempts = AttemptLimiter(
+    max_attempts=int(os.getenv("PIN_MAX_ATTEMPTS", 5)),
+    window=int(os.getenv("PIN_LOCKOUT_SECONDS", 300)),
+)
@@ -1,19 +1,62 @@
 # firebase_config.py - Konfigurerer tilkoblingen til Firebase-tjenester.
+# Firebase-appen og Firestore-klientene opprettes først når de trengs, og klientene lages på nytt
+# i hver prosess. En gRPC-klient kan ikke deles mellom prosesser etter fork (gunicorn med flere workers).
 
 import firebase_admin                              # Hovedbibilotek for Firebase Admin SDK.
 import os                                          # For å jobbe med filer og miljøvariabler.
-from firebase_admin import credentials, firestore  # Import av relevante moduler.
+import threading                                   # Lås slik at initieringen bare skjer én gang.
+from firebase_admin import credentials             # Leser nøkkelfilen til tjenestekontoen.
+from metrics import instrument_client              # Teller lesinger, skrivinger og spørringer.
 
 # Henter mappen der prosjektet ligger lokalt.
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 # Setter sti til serviceAccountKey.json som brukes for å autentifisere mot Firebase.
-SERVICE_ACCOUNT_PATH = os.path.join(BASE_DIR, 'serviceAccountKey.json')
+SERVICE_ACCOUNT_PATH = os.getenv("SERVICE_ACCOUNT_PATH", os.path.join(BASE_DIR, 'serviceAccountKey.json'))
 
-# Initierer Firebase Admin SDK kun en gang for å unngå dobbel initiering.
-if not firebase_admin._apps:
-    cred = credentials.Certificate(SERVICE_ACCOUNT_PATH)
-    firebase_admin.initialize_app(cred)
+_lock = threading.RLock()
+_clients = {} # navn -> (prosess-ID, klient)
 
-# Lager en NoSQL databse i Firebase.
-db = firestore.client()
+# Funksjon: Returnerer Firebase-appen og initierer den ved første kall.
+# Appen inneholder bare konfigurasjon og kan trygt arves av prosesser som forkes.
+def get_app():
+    if not firebase_admin._apps:
+        with _lock:
+            if not firebase_admin._apps:
+                firebase_admin.initialize_app(credentials.Certificate(SERVICE_ACCOUNT_PATH))
+    return firebase_admin.get_app()
+
+# Funksjon: Returnerer en klient for denne prosessen. Lages på nytt hvis prosessen er forket.
+def _client(name, factory):
+    entry = _clients.get(name)
+    if entry is None or entry[0] != os.getpid():
+        with _lock:
+            entry = _clients.get(name)
+            if entry is None or entry[0] != os.getpid():
+                entry = (os.getpid(), factory())
+                _clients[name] = entry
+    return entry[1]
+
+# Funksjon: Firestore-klienten (NoSQL-databasen i Firebase) for denne prosessen.
+# firestore.client() fra firebase_admin gjenbruker samme klient i alle prosesser, så klienten lages direkte.
+def get_db():
+    def factory():
+        from google.cloud import firestore # Tung import (gRPC), derfor først når databasen brukes.
+        app = get_app()
+        client = firestore.Client(project=app.project_id, credentials=app.credential.get_credential())
+        return instrument_client(client)
+    return _client('firestore', factory)
+
+# Funksjon: Asynkron Firestore-klient for ASGI-modusen. Må først brukes inne i event-loopen.
+def get_async_db():
+    def factory():
+        from google.cloud import firestore
+        app = get_app()
+        return firestore.AsyncClient(project=app.project_id, credentials=app.credential.get_credential())
+    return _client('firestore-async', factory)
+
+# Funksjon: Glemmer klientene som er arvet fra foreldreprosessen. Kalles fra post_fork i gunicorn.conf.py.
+def reset_after_fork():
+    global _lock
+    _lock = threading.RLock() # Låsen kan ha vært holdt av en annen tråd i det prosessen ble forket.
+    _clients.clear()
@@ -0,0 +1,23 @@
+# gunicorn.conf.py - Oppsett for gunicorn i produksjon.
+# Appen lastes én gang i masterprosessen (preload_app), og hver worker forkes fra den.
+# Firebase-appen er bare konfigurasjon og kan arves, men gRPC-klientene må lages på nytt i hver worker.
+
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.getenv('PORT', 3000)}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", 4)) # Rutene venter mest på nettverk, så tråder gir mer samtidighet.
+worker_class = "gthread"
+preload_app = True
+timeout = 30
+graceful_timeout = 30
+
+# Kjøres i hver worker rett etter fork.
+def post_fork(server, worker):
+    import firebase_config
+    import storage
+    import logging_setup
+    logging_setup.restart_after_fork()
+    firebase_config.reset_after_fork()
+    storage.reset_after_fork()
@@ -0,0 +1,141 @@
+# idempotency.py - Støtte for Idempotency-Key på ruter som skriver til databasen.
+# Mobilappen kan sende samme forespørsel flere ganger på dårlig nett. Med samme Idempotency-Key
+# kjøres ruten bare én gang: svaret lagres, og gjentatte forespørsler får det lagrede svaret uten nye
+# databasekall. Kommer gjentakelsen mens den første fortsatt kjører, venter den på det samme svaret.
+#
+# Nøkkelen gjelder per bruker, metode og sti. Brukes samme nøkkel med en annen forespørsel (metode, sti med
+# parametere eller body), svares 422. Svar med 5xx, 401, 403, 409 og 429 lagres ikke, slik at et nytt forsøk
+# faktisk prøver på nytt, f.eks. med fornyet token eller etter at admin-PIN er bekreftet.
+# Svarene ligger i en LocalCache i hver prosess; backend kan byttes med en delt cache med samme grensesnitt.
+
+import os
+import hashlib
+import threading
+import functools
+from flask import Response, current_app, jsonify, request
+import auth                                   # auth.verify_firebase_token, slås opp ved kall.
+from cache import LocalCache
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+# Hvor lenge et lagret svar gjelder.
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 86400))
+
+# Hvor lenge en gjentakelse venter på at den første forespørselen blir ferdig.
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 30))
+
+MAX_KEY_LENGTH = 255
+
+# Status der et nytt forsøk kan gi et annet resultat.
+RETRYABLE_STATUSES = {401, 403, 409, 429}
+
+class KeyReused(Exception):
+    pass
+
+class StillProcessing(Exception):
+    pass
+
+# Klasse: Lagrede svar per nøkkel, og forespørsler som kjører nå.
+class IdempotencyStore:
+    def __init__(self, backend, wait_seconds=IDEMPOTENCY_WAIT_SECONDS):
+        self.backend = backend
+        self.wait_seconds = wait_seconds
+        self.replays = 0
+        self.coalesced = 0
+        self.conflicts = 0
+        self._in_flight = {} # nøkkel -> threading.Event som settes når svaret er klart
+        self._lock = threading.Lock()
+
+    # Kjører handler() én gang per nøkkel. handler returnerer {"status", "body", "mimetype"}.
+    # Returnerer (svar, replayed). Kaster KeyReused hvis nøkkelen er brukt med en annen body,
+    # og StillProcessing hvis den første forespørselen ikke ble ferdig innen wait_seconds.
+    def run(self, key, fingerprint, handler):
+        while True:
+            entry = self.backend.get(key)
+            if entry is not None:
+                if entry["fingerprint"] != fingerprint:
+                    self.conflicts += 1
+                    raise KeyReused()
+                self.replays += 1
+                return entry, True
+
+            with self._lock:
+                pending = self._in_flight.get(key)
+                owner = pending is None
+                if owner:
+                    pending = self._in_flight[key] = threading.Event()
+
+            if not owner:
+                self.coalesced += 1
+                if not pending.wait(self.wait_seconds):
+                    raise StillProcessing()
+                continue # Svaret er lagret, eller det første forsøket feilet og denne forespørselen prøver selv.
+
+            try:
+                entry = dict(handler(), fingerprint=fingerprint)
+                if entry["status"] < 500 and entry["status"] not in RETRYABLE_STATUSES:
+                    self.backend.set(key, entry)
+                return entry, False
+            finally:
+                with self._lock:
+                    self._in_flight.pop(key, None)
+                pending.set()
+
+    def stats(self):
+        stats = self.backend.stats()
+        stats.update(replays=self.replays, coalesced=self.coalesced, conflicts=self.conflicts,
+                     in_flight=len(self._in_flight))
+        return stats
+
+# Delt lager for prosessen.
+idempotency_store = IdempotencyStore(LocalCache(
+    maxsize=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", 10000)),
+    ttl=IDEMPOTENCY_TTL,
+))
+
+# Funksjon: UID fra Authorization-headeren, eller None. Tokenet er som regel allerede i tokencachen.
+def _current_uid():
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    if not token:
+        return None
+    try:
+        return auth.verify_firebase_token(token)["uid"]
+    except Exception:
+        return None
+
+# Dekoratør: Gjør en rute idempotent når klienten sender Idempotency-Key. Uten headeren kjøres ruten som før.
+# Plasseres under @<blueprint>.route(...).
+def idempotent(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{IDEMPOTENCY_HEADER} må være mellom 1 og {MAX_KEY_LENGTH} tegn."}), 400
+
+        uid = _current_uid()
+        if uid is None:
+            return view(*args, **kwargs) # Ruten svarer selv med 401.
+
+        # get_data() cacher, så ruten kan fortsatt lese body.
+        fingerprint = hashlib.sha256(f"{request.method} {request.full_path}\n".encode('utf-8') + request.get_data()).hexdigest()
+        original = {}
+
+        def handler():
+            response = original["response"] = current_app.make_response(view(*args, **kwargs))
+            return {"status": response.status_code, "body": response.get_data(), "mimetype": response.mimetype}
+
+        try:
+            entry, replayed = idempotency_store.run(f"{uid}:{request.method}:{request.path}:{key}", fingerprint, handler)
+        except KeyReused:
+            return jsonify({"error": f"{IDEMPOTENCY_HEADER} er allerede brukt for en annen forespørsel."}), 422
+        except StillProcessing:
+            return jsonify({"error": "Forespørselen behandles fortsatt, prøv igjen."}), 409
+
+        if not replayed:
+            return original["response"]
+        response = Response(entry["body"], status=entry["status"], mimetype=entry["mimetype"])
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+    return wrapper
@@ -0,0 +1,156 @@
+# logging_setup.py - Strukturert logging som ikke blokkerer forespørslene.
+# Rutene legger bare loggposten i en kø. En egen tråd formaterer postene som JSON og skriver dem til stdout,
+# så en treg pipe eller terminal aldri holder igjen en forespørsel. Er køen full, kastes posten og telles.
+#
+# Miljøvariabler:
+#   LOG_LEVEL         - nivå for alle moduler (standard INFO)
+#   LOG_LEVELS        - nivå per modul, f.eks. "admin=DEBUG,auth=WARNING"
+#   LOG_DEBUG_SAMPLE  - andel av DEBUG-postene som beholdes, 0.0-1.0 (standard 1.0)
+#   LOG_QUEUE_SIZE    - maks antall poster som venter på å bli skrevet (standard 10000)
+
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+import threading
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+# ID-en til forespørselen som kjører, slik at alle loggposter fra samme forespørsel kan kobles sammen.
+request_id = ContextVar('request_id', default=None)
+
+# Klasse: Legger request_id på hver post. Kjøres i tråden som logger, før posten legges i køen.
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+# Klasse: Beholder bare en andel av DEBUG-postene. Andre nivåer slipper alltid gjennom.
+class DebugSampler(logging.Filter):
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1.0 or random.random() < self.rate
+
+# Klasse: Legger posten i køen uten å formatere den og uten å vente.
+# Standard QueueHandler formaterer meldingen i prepare(), altså i tråden som logger. Her skjer det i lyttertråden.
+class NonBlockingQueueHandler(QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        if record.exc_info and not record.exc_text:
+            # Traceback må gjøres om til tekst nå, før rammene i exc_info endres eller frigjøres.
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+# Klasse: Formaterer en post som én linje JSON.
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry["request_id"] = record.request_id
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+_handler = None
+_listener = None
+_lock = threading.Lock()
+
+# Funksjon: Leser nivåer per modul fra LOG_LEVELS.
+def _module_levels(spec):
+    levels = {}
+    for part in (spec or '').split(','):
+        name, _, level = part.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def _start_listener(log_queue):
+    global _listener
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+    _listener = QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+
+# Funksjon: Setter opp loggingen for prosessen. Kan kalles flere ganger, bare første kall gjør noe.
+def setup_logging():
+    global _handler
+    with _lock:
+        if _handler is not None:
+            return
+
+        log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", 10000)))
+        _handler = NonBlockingQueueHandler(log_queue)
+        _handler.addFilter(DebugSampler(float(os.getenv("LOG_DEBUG_SAMPLE", 1.0))))
+        _handler.addFilter(RequestIdFilter())
+
+        root = logging.getLogger()
+        root.handlers = [_handler]
+        root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        for name, level in _module_levels(os.getenv("LOG_LEVELS")).items():
+            logging.getLogger(name).setLevel(level)
+
+        _start_listener(log_queue)
+        atexit.register(stop_logging)
+
+# Funksjon: Skriver ut det som ligger i køen og stopper lyttertråden.
+def stop_logging():
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+# Funksjon: Lyttertråden overlever ikke fork. Kalles fra post_fork i gunicorn.conf.py,
+# og gir workeren en ny kø og en ny tråd (køen fra masterprosessen kan ha en låst lås).
+def restart_after_fork():
+    global _lock
+    _lock = threading.Lock()
+    if _handler is None:
+        return
+    _handler.queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", 10000)))
+    _start_listener(_handler.queue)
+
+# Funksjon: Antall poster som er kastet fordi køen var full.
+def dropped_records():
+    return _handler.dropped if _handler is not None else 0
+
+# Funksjon: Gir hver forespørsel en ID. Bruker X-Request-ID fra klienten eller proxyen hvis den finnes.
+def init_app(app):
+    from flask import g, request
+
+    setup_logging()
+
+    @app.before_request
+    def set_request_id():
+        value = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.request_id = value[:64]
+        g.request_id_token = request_id.set(g.request_id)
+
+    @app.after_request
+    def add_request_id(response):
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        token = g.pop('request_id_token', None)
+        if token is not None:
+            request_id.reset(token)
+        return response
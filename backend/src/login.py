@@ -3,8 +3,9 @@
 # Brukeren sendes til dette endepunktet fra frontend, og får tilbake data hvis e-posten finnes i Firebase og Firestore.
 
 from flask import Blueprint, request, jsonify      # Flask-moduler for routing og HTTP-respons.
-from firebase_config import db               # Importerer Firebase Authentication og Firestore-klient.
+from profile_cache import profile_cache            # Profiler i minnet, så en kjent e-post slipper to nettverkskall.
 from firebase_admin import auth
+from firebase_config import get_app                # Firebase-appen, initieres ved første kall.
 from firebase_admin.auth import UserNotFoundError  # For å håndtere feil når bruker ikke finnes.
 
 # Oppretter Flask Blueprint kalt "login".
@@ -23,22 +24,20 @@ def login_api():
         return jsonify({"error": "Fyll ut alle felt!"}), 400
     
     try:
-         # Henter brukeren fra Firebare Authentication via e-posten.
-         user = auth.get_user_by_email(email)
+         # Henter brukeren fra Firebare Authentication via e-posten og profilen fra databasen.
+         # Begge deler hentes fra cachen hvis brukeren har logget inn nylig.
+         account, user_data = profile_cache.by_email(email, lambda: auth.get_user_by_email(email, app=get_app()))
 
          # Sjekker om brukeren finnes i Firestore.
-         user_ref = db.collection('users').document(user.uid).get()
-         if not user_ref.exists:
+         if user_data is None:
                 return jsonify({"error": "Bruker finnes ikke!"}), 404
-         
-         user_data = user_ref.to_dict()
 
          # Returnere info om brukeren til frontend.
          return jsonify({
                 "message": "Bruker logget inn!",
-                "uid": user.uid,
+                "uid": account["uid"],
                 "username": user_data['username'],
-                "email": user.email,
+                "email": account["email"],
          }), 200
     
     # Hvis Firebase Authentication ikke finner brukeren.
@@ -0,0 +1,48 @@
+# member_cache.py - Lesecache for /members og /member/<id>.
+# Svarene caches per admin og per medlem med TTL, og alle ruter som endrer et medlem
+# må kalle invalidate() slik at neste lesing henter ferske data.
+# Rutene cacher ferdig serialiserte svar med ETag, så If-None-Match kan besvares uten databasen.
+
+import os
+import json
+import hashlib
+from cache import LocalCache, ReadThroughCache
+
+# Funksjon: Serialiserer et svar én gang og lager en sterk ETag av innholdet.
+# Det er dette som caches, så et treff slipper både databasen og serialiseringen.
+def json_entry(data):
+    body = json.dumps(data)
+    return {
+        "body": body,
+        "etag": hashlib.sha256(body.encode('utf-8')).hexdigest(),
+        "adminId": data.get('adminId') if isinstance(data, dict) else None, # Brukes til tilgangssjekk uten å parse body.
+    }
+
+# Klasse: Read-through-cache for medlemslister og enkeltmedlemmer.
+class MemberCache(ReadThroughCache):
+    @staticmethod
+    def members_key(admin_id):
+        return f"members:{admin_id}"
+
+    @staticmethod
+    def member_key(member_id):
+        return f"member:{member_id}"
+
+    def members(self, admin_id, loader):
+        return self.read_through(self.members_key(admin_id), loader)
+
+    def member(self, member_id, loader):
+        return self.read_through(self.member_key(member_id), loader)
+
+    # Fjerner medlemslisten til admin og eventuelt ett medlem fra cachen.
+    def invalidate(self, admin_id, member_id=None):
+        keys = [self.members_key(admin_id)]
+        if member_id is not None:
+            keys.append(self.member_key(member_id))
+        self.invalidate_keys(*keys)
+
+# Delt cache for prosessen. MEMBER_CACHE_TTL styrer hvor lenge et svar kan være utdatert i andre prosesser.
+member_cache = MemberCache(LocalCache(
+    maxsize=int(os.getenv("MEMBER_CACHE_SIZE", 2048)),
+    ttl=float(os.getenv("MEMBER_CACHE_TTL", 30)),
+))
@@ -0,0 +1,310 @@
+# metrics.py - Måling av hvor tiden går i hver forespørsel.
+# Registrerer svartid per blueprint og rute i histogrammer, teller lesinger, skrivinger og spørringer
+# mot Firestore og måler token-verifisering for seg. Hver forespørsel får en Server-Timing-header,
+# og alt kan hentes i Prometheus-format fra /metrics.
+
+import os                                  # Leser METRICS_TOKEN.
+import hmac                                # Sammenligner tokenet uten å lekke tid.
+import time                                # Måler varighet.
+import threading                           # Lås rundt tellerne.
+from contextvars import ContextVar         # Tellere for forespørselen som kjører i denne tråden.
+from flask import Blueprint, Response, g, request, jsonify
+
+# Grenser (sekunder) for histogrammene.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Klasse: Histogram med faste grenser, som i Prometheus.
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Siste plass er +Inf.
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+    # Returnerer (grense, kumulativt antall) for hver grense, inkludert +Inf.
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            yield bound, running
+
+# Klasse: Tellere for én forespørsel. Samles i Server-Timing-headeren.
+class RequestTimings:
+    def __init__(self):
+        self.auth = 0.0
+        self.db = 0.0
+        self.reads = 0
+        self.writes = 0
+        self.queries = 0
+
+_current = ContextVar('request_timings', default=None)
+
+# Klasse: Samler alle målinger for prosessen.
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}   # (blueprint, rute, metode) -> Histogram
+        self.statuses = {} # (blueprint, rute, metode, status) -> antall
+        self.auth = Histogram()
+        self.db_ops = {"reads": 0, "writes": 0, "queries": 0}
+
+    def observe_request(self, blueprint, route, method, status, duration):
+        key = (blueprint, route, method)
+        with self._lock:
+            self.routes.setdefault(key, Histogram()).observe(duration)
+            status_key = key + (status,)
+            self.statuses[status_key] = self.statuses.get(status_key, 0) + 1
+
+    def observe_auth(self, duration):
+        with self._lock:
+            self.auth.observe(duration)
+        timings = _current.get()
+        if timings is not None:
+            timings.auth += duration
+
+    def observe_db(self, kind, count, duration):
+        with self._lock:
+            if kind is not None:
+                self.db_ops[kind] += count
+        timings = _current.get()
+        if timings is not None:
+            timings.db += duration
+            if kind is not None:
+                setattr(timings, kind, getattr(timings, kind) + count)
+
+    # Skriver alle målinger i Prometheus sitt tekstformat.
+    def render(self, gauges=()):
+        lines = [
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (blueprint, route, method), histogram in sorted(self.routes.items()):
+                labels = f'blueprint="{blueprint}",route="{route}",method="{method}"'
+                lines.extend(_histogram_lines("http_request_duration_seconds", labels, histogram))
+
+            lines.append("# TYPE http_requests_total counter")
+            for (blueprint, route, method, status), count in sorted(self.statuses.items()):
+                lines.append(f'http_requests_total{{blueprint="{blueprint}",route="{route}",'
+                             f'method="{method}",status="{status}"}} {count}')
+
+            lines.append("# TYPE auth_verify_duration_seconds histogram")
+            lines.extend(_histogram_lines("auth_verify_duration_seconds", "", self.auth))
+
+            lines.append("# TYPE firestore_operations_total counter")
+            for kind, count in sorted(self.db_ops.items()):
+                lines.append(f'firestore_operations_total{{kind="{kind}"}} {count}')
+
+        for name, value in gauges:
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+def _histogram_lines(name, labels, histogram):
+    prefix = labels + "," if labels else ""
+    for bound, count in histogram.cumulative():
+        le = "+Inf" if bound == float('inf') else repr(bound)
+        yield f'{name}_bucket{{{prefix}le="{le}"}} {count}'
+    suffix = f"{{{labels}}}" if labels else ""
+    yield f"{name}_sum{suffix} {histogram.total}"
+    yield f"{name}_count{suffix} {histogram.count}"
+
+metrics = Metrics()
+
+# Klasse: Måler tiden for en blokk med kode, f.eks. token-verifisering.
+class timed:
+    def __init__(self, observe):
+        self._observe = observe
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._observe(time.perf_counter() - self._start)
+        return False
+
+# Hvilke metoder som er lesinger, skrivinger og spørringer på Firestore-objektene.
+READ_METHODS = {"get"}
+WRITE_METHODS = {"set", "create", "update", "delete"}
+QUERY_METHODS = {"stream", "get"}
+QUERY_TYPES = {"CollectionReference", "Query", "CollectionGroup"}
+WRAPPED_TYPES = {"CollectionReference", "DocumentReference", "Query", "CollectionGroup", "WriteBatch"}
+
+# Klasse: Pakker inn Firestore-klienten og objektene den lager, og teller kallene.
+# Argumenter pakkes ut igjen før de sendes til biblioteket, slik at typene er de ekte.
+# Skrivinger i en WriteBatch sendes først ved commit(), så de telles og måles der, med antall skrivinger i batchen.
+class InstrumentedFirestore:
+    def __init__(self, target):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_batched', 0) # Skrivinger lagt i batchen siden forrige commit.
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        type_name = type(self._target).__name__
+        if type_name == "WriteBatch" and name in WRITE_METHODS:
+            def add(*args, **kwargs):
+                attr(*[_unwrap(arg) for arg in args], **{key: _unwrap(value) for key, value in kwargs.items()})
+                object.__setattr__(self, '_batched', self._batched + 1)
+                return self
+            return add
+
+        kind = _operation_kind(type_name, name)
+
+        def call(*args, **kwargs):
+            args = [_unwrap(arg) for arg in args]
+            kwargs = {key: _unwrap(value) for key, value in kwargs.items()}
+            start = time.perf_counter()
+            result = attr(*args, **kwargs)
+            if kind == "queries" or name == "get_all":
+                stream = _counted_stream(result, kind, start)
+                return list(stream) if name == "get" else stream # Query.get() returnerer en liste.
+            if type_name == "WriteBatch" and name == "commit":
+                metrics.observe_db("writes", self._batched, time.perf_counter() - start)
+                object.__setattr__(self, '_batched', 0)
+                return result
+            metrics.observe_db(kind, 1, time.perf_counter() - start)
+            return _wrap(result)
+        return call
+
+    def __repr__(self):
+        return f"InstrumentedFirestore({self._target!r})"
+
+def _operation_kind(type_name, method):
+    if type_name in QUERY_TYPES and method in QUERY_METHODS:
+        return "queries"
+    if type_name == "DocumentReference" and method in WRITE_METHODS:
+        return "writes"
+    if type_name == "DocumentReference" and method in READ_METHODS:
+        return "reads"
+    return None
+
+def _wrap(value):
+    if type(value).__name__ in WRAPPED_TYPES:
+        return InstrumentedFirestore(value)
+    return value
+
+def _unwrap(value):
+    if isinstance(value, InstrumentedFirestore):
+        return value._target
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(item) for item in value)
+    return value
+
+# Funksjon: Teller dokumentene fra en spørring eller get_all mens de leses.
+# Tiden for hele gjennomløpet regnes som databasetid.
+def _counted_stream(result, kind, start):
+    elapsed = time.perf_counter() - start
+    if kind == "queries":
+        metrics.observe_db("queries", 1, 0.0)
+    documents = 0
+    iterator = iter(result)
+    try:
+        while True:
+            step = time.perf_counter()
+            try:
+                doc = next(iterator)
+            except StopIteration:
+                elapsed += time.perf_counter() - step
+                break
+            elapsed += time.perf_counter() - step
+            documents += 1
+            yield doc
+    finally:
+        metrics.observe_db("reads", documents, elapsed)
+
+# Funksjon: Pakker inn en Firestore-klient hvis målingen av databasen er slått på.
+def instrument_client(client):
+    if os.getenv("FIRESTORE_METRICS", "1") == "0":
+        return client
+    return InstrumentedFirestore(client)
+
+# Funksjon: Lager Server-Timing-headeren for forespørselen.
+def server_timing(timings, total):
+    return ", ".join([
+        f"total;dur={total * 1000:.1f}",
+        f"auth;dur={timings.auth * 1000:.1f}",
+        f'db;dur={timings.db * 1000:.1f};desc="reads={timings.reads} writes={timings.writes} queries={timings.queries}"',
+    ])
+
+# Funksjon: Starter tellerne for en forespørsel som ikke går gjennom Flask (asgi.py).
+# Returnerer (tellere, token); token gis til end_request() når svaret er sendt.
+def begin_request():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+def end_request(token):
+    _current.reset(token)
+
+# Blueprint med /metrics for skrapere.
+metrics_blueprint = Blueprint('metrics', __name__)
+
+# Endepunkt: Alle målinger i Prometheus-format. Krever METRICS_TOKEN som Bearer-token.
+# Uten METRICS_TOKEN finnes ruten ikke (404), med mindre METRICS_PUBLIC=1 gjør den åpen med vilje.
+@metrics_blueprint.route('/metrics', methods=['GET'])
+def get_metrics():
+    token = os.getenv("METRICS_TOKEN")
+    if not token:
+        if os.getenv("METRICS_PUBLIC") != "1":
+            return jsonify({"error": "Ikke funnet"}), 404
+    elif not hmac.compare_digest(request.headers.get('Authorization', '').encode('utf-8'),
+                                 f"Bearer {token}".encode('utf-8')):
+        return jsonify({"error": "Ingen tilgang!"}), 403
+
+    # Importeres her for å unngå sirkulære importer (auth bruker selv denne modulen).
+    from auth import token_cache_stats
+    from changes import change_hub
+    from catalog import catalog
+    from idempotency import idempotency_store
+    from member_cache import member_cache
+    from ownership import ownership
+    from profile_cache import profile_cache
+    from storage.retry import write_stats
+    from logging_setup import dropped_records
+
+    gauges = []
+    for prefix, stats in (("write", write_stats.snapshot()), ("member_cache", member_cache.stats()),
+                          ("ownership_index", ownership.stats()), ("profile_cache", profile_cache.stats()),
+                          ("token_cache", token_cache_stats()), ("change_feed", change_hub.stats()),
+                          ("catalog", catalog.stats()), ("idempotency", idempotency_store.stats())):
+        for name, value in stats.items():
+            gauges.append((f"{prefix}_{name}", value))
+    gauges.append(("log_records_dropped", dropped_records()))
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+# Funksjon: Kobler målingen til Flask-appen. Kalles fra create_app().
+def init_app(app):
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        _, g.metrics_token = begin_request()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        token = g.pop('metrics_token', None)
+        if start is None:
+            return response
+
+        total = time.perf_counter() - start
+        timings = _current.get()
+        route = request.url_rule.rule if request.url_rule is not None else "ukjent"
+        metrics.observe_request(request.blueprint or "app", route, request.method, response.status_code, total)
+        if timings is not None:
+            response.headers['Server-Timing'] = server_timing(timings, total)
+        if token is not None:
+            end_request(token)
+        return response
+
+    app.register_blueprint(metrics_blueprint)
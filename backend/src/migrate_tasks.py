@@ -0,0 +1,47 @@
+# migrate_tasks.py - Engangsmigrering av oppgaver fra tasks-listen på medlemmet til egne oppgaveposter.
+# Kjøres én gang etter oppgradering: python migrate_tasks.py (inne i src-mappa).
+# Kan trygt kjøres flere ganger. Oppgaver som allerede er flyttet blir ikke skrevet over.
+# Tellerne (stats) endres ikke, siden oppgavene fantes fra før. De regnes ut med backfill_stats.py.
+
+import sys
+import time
+from storage import get_store
+from storage.base import DELETE_FIELD, task_record
+
+# Funksjon: Flytter oppgavene til ett medlem. Returnerer antall oppgaver som ble flyttet.
+def migrate_member(store, member_id, member, dry_run=False):
+    embedded = member.get('tasks')
+    if embedded is None:
+        return 0
+
+    existing = {record['id'] for record in store.tasks.list(member_id)}
+    # Listen har ingen tidsstempler. Migreringstidspunktet brukes, slik at compaction.py ikke arkiverer
+    # alt med en gang, og indeksen bevarer rekkefølgen fra listen.
+    now = time.time()
+    records = []
+    for index, task in enumerate(embedded):
+        if not task.get('id') or task['id'] in existing:
+            continue
+        task = dict(task, createdAt=now + index * 1e-6)
+        records.append(task_record(member_id, member.get('adminId'), task, now))
+
+    if not dry_run:
+        if records:
+            store.tasks.insert(records, count_stats=False)
+        store.members.update(member_id, {"tasks": DELETE_FIELD}) # Listen fjernes først når oppgavene er lagret.
+    return len(records)
+
+# Funksjon: Går gjennom alle medlemmene i lagringen.
+def migrate_all(store, dry_run=False):
+    members = moved = 0
+    for member_id, member in store.members.iter_all():
+        if 'tasks' not in member:
+            continue
+        moved += migrate_member(store, member_id, member, dry_run)
+        members += 1
+    return members, moved
+
+if __name__ == '__main__':
+    dry_run = '--dry-run' in sys.argv
+    members, moved = migrate_all(get_store(), dry_run)
+    print(f"{'(prøvekjøring) ' if dry_run else ''}Flyttet {moved} oppgaver fra {members} medlemmer.")
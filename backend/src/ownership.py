@@ -0,0 +1,54 @@
+# ownership.py - Indeks over hvilken admin som eier hvert medlem (medlem-ID -> adminId).
+# Lar rutene sjekke tilgang uten å lese hele medlemsdokumentet fra databasen.
+# Indeksen fylles når medlemmer listes, leses eller opprettes, og tømmes for medlemmer som slettes.
+# Elementene har en levetid slik at endringer gjort av andre prosesser blir plukket opp.
+
+import os
+from cache import LocalCache
+from storage import get_store
+
+# Klasse: Eierskapsindeks med LRU-utkasting og levetid per element.
+class OwnershipIndex:
+    def __init__(self, maxsize=100000, ttl=300):
+        self._owners = LocalCache(maxsize=maxsize, ttl=ttl)
+
+    def set(self, member_id, admin_id):
+        if admin_id is not None:
+            self._owners.set(member_id, admin_id)
+
+    def discard(self, member_id):
+        self._owners.delete(member_id)
+
+    # Returnerer adminId for medlemmet. Ved bom leses kun adminId-feltet fra lagringslaget.
+    # Returnerer None hvis medlemmet ikke finnes.
+    def owner(self, member_id):
+        admin_id = self._owners.get(member_id)
+        if admin_id is None:
+            admin_id = get_store().members.get_owner(member_id)
+            self.set(member_id, admin_id)
+        return admin_id
+
+    # Som owner(), for asyncio (asgi.py). lookup er en async-funksjon som leser adminId ved bom.
+    async def owner_async(self, member_id, lookup):
+        admin_id = self._owners.get(member_id)
+        if admin_id is None:
+            admin_id = await lookup(member_id)
+            self.set(member_id, admin_id)
+        return admin_id
+
+    # Sjekker at admin eier medlemmet. Returnerer None ved tilgang, ellers HTTP-statuskoden (404 eller 403).
+    def check(self, member_id, admin_id):
+        owner = self.owner(member_id)
+        if owner is None:
+            return 404
+        if owner != admin_id:
+            return 403
+        return None
+
+    def stats(self):
+        return self._owners.stats()
+
+ownership = OwnershipIndex(
+    maxsize=int(os.getenv("OWNERSHIP_INDEX_SIZE", 100000)),
+    ttl=float(os.getenv("OWNERSHIP_INDEX_TTL", 300)),
+)
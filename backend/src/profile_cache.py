@@ -0,0 +1,52 @@
+# profile_cache.py - Cache for brukerprofiler, brukt av /login og /verify-pin.
+# Profilen (users-dokumentet) caches per uid, og e-post peker til uid slik at innlogging
+# med en kjent e-post slipper både oppslaget i Firebase Authentication og lesingen av dokumentet.
+# Cachen fylles når brukere registreres, og ruter som endrer en profil må kalle invalidate().
+
+import os
+from cache import LocalCache, ReadThroughCache
+from storage import get_store
+
+# Klasse: Profiler per uid og uid per e-post, begge med TTL.
+class ProfileCache(ReadThroughCache):
+    @staticmethod
+    def uid_key(uid):
+        return f"uid:{uid}"
+
+    @staticmethod
+    def email_key(email):
+        return f"email:{email.strip().lower()}" # E-post skiller ikke på store og små bokstaver i Firebase.
+
+    # Returnerer profilen til brukeren, eller None hvis den ikke finnes.
+    def by_uid(self, uid):
+        return self.read_through(self.uid_key(uid), lambda: get_store().users.get(uid))
+
+    # Returnerer (konto, profil) for e-posten. lookup() slår opp i Firebase Authentication ved bom
+    # og kan kaste UserNotFoundError. Kontoen er {"uid", "email"}. Profilen er None hvis dokumentet mangler.
+    def by_email(self, email, lookup):
+        def load_account():
+            user = lookup()
+            return {"uid": user.uid, "email": user.email}
+
+        account = self.read_through(self.email_key(email), load_account)
+        return account, self.by_uid(account["uid"])
+
+    # Legger inn en profil som nettopp er skrevet, f.eks. ved registrering.
+    def put(self, uid, profile, email=None):
+        self.invalidate(uid, email)
+        self.backend.set(self.uid_key(uid), profile)
+        if email:
+            self.backend.set(self.email_key(email), {"uid": uid, "email": email})
+
+    # Fjerner profilen og eventuelt e-posten fra cachen.
+    def invalidate(self, uid, email=None):
+        keys = [self.uid_key(uid)]
+        if email:
+            keys.append(self.email_key(email))
+        self.invalidate_keys(*keys)
+
+# Delt cache for prosessen. PROFILE_CACHE_TTL styrer hvor lenge en endring gjort av en annen prosess kan være usynlig.
+profile_cache = ProfileCache(LocalCache(
+    maxsize=int(os.getenv("PROFILE_CACHE_SIZE", 10000)),
+    ttl=float(os.getenv("PROFILE_CACHE_TTL", 300)),
+))
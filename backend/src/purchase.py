@@ -1,16 +1,26 @@
 # purchase.py - Endepunkt for å kjøpe kosmetiske gjenstander for et medlem.
 # Trekker fra penger, oppdaterer medlemmet med nye kosmetiske elementer og returnerer den nye saldoen etter kjøp.
+# Prisen hentes fra varekatalogen (catalog.py) på vare-ID, ikke fra det klienten sender.
 # Brukeren må være autentisert og må ha tilgang til det gjeldene medlemmet.
 
 from flask import Blueprint, request, jsonify   # Flask-moduler for routing og HTTP-respons.
-from firebase_config import db                  # Firestore-klient.
+from storage import get_store                   # Lagringslaget for medlemmer.
+from storage.base import MemberNotFound, AccessDenied, InsufficientFunds, ContentionError
 from auth import verify_firebase_token          # Funksjon for å validere token til brukeren.
+from member_cache import member_cache           # Lesecachen for medlemmer må invalideres etter kjøp.
+from ownership import ownership                 # Indeks over hvilken admin som eier hvert medlem.
+from changes import change_hub                  # Sender ny saldo til tilkoblede klienter.
+from catalog import catalog                     # Varekatalogen med prisene.
+from idempotency import idempotent              # Et kjøp som sendes på nytt trekker ikke penger to ganger.
+import logging                                  # Logger feil uten å blokkere forespørselen.
 
 # Oppretter et Blueprint for purchase. 
 purchase = Blueprint('purchase', __name__)
+log = logging.getLogger(__name__)
 
 # Endepunkt: Brukes når det kjøpes noe i butikken.
 @purchase.route('/purchase', methods=['POST'])
+@idempotent
 def purchase_item():
     try:
         # Henter og verifiserer token fra Authorization-header.
@@ -21,44 +31,34 @@ def purchase_item():
         decoded_token = verify_firebase_token(token)
         uid = decoded_token["uid"]
 
-        # Leser data fra frontend og forventer memberId og item.
+        # Leser data fra frontend og forventer memberId og itemId (eldre klienter sender item med id).
         data = request.get_json()
-        item = data.get('item')
+        item_id = data.get('itemId')
+        if item_id is None and isinstance(data.get('item'), dict):
+            item_id = data['item'].get('id')
         member_id = data.get('memberId')
 
         # Sjekker at begge felt er sendt inn.
-        if not token or not item:
+        if not token or not item_id:
             return jsonify({"error": "Token og vare er påkrevd!"}), 401
-        
-        # Sikrer at prisen blir behandlet som flyttall.
-        item["price"] = float(item["price"])
-        
-        # Henter medlemmet fra Firestore.
-        member_ref = db.collection('members').document(member_id)
-        member_doc = member_ref.get()
 
-        if not member_doc.exists:
-            return jsonify({"error": "Bruker finnes ikke!"}), 404
+        # Slår opp varen i katalogen. En pris sendt fra klienten ignoreres.
+        item = catalog.get(item_id)
+        if item is None:
+            return jsonify({"error": "Ukjent vare!"}), 400
         
-        member = member_doc.to_dict()
-
-        # Sjekker at admin eier medlemmet.
-        if member.get("adminId") !=uid:
+        # Sjekker at admin eier medlemmet via eierskapsindeksen, uten å lese dokumentet.
+        status = ownership.check(member_id, uid)
+        if status == 404:
+            return jsonify({"error": "Bruker finnes ikke!"}), 404
+        if status == 403:
             return jsonify({"error": "Ingen tilgang til dette medlemmet"}), 403
 
-        # Sjekker om medlemmet har nok penger.
-        if member["money"] < item["price"]:
-            return jsonify({"error": "Ikke nok penger!"}), 400
-        
-        # Trekker fra penger og legger til den kosmetiske gjenstanden som ble kjøpt.
-        new_money = member["money"] - item["price"]
-        new_cosmetics = list(set(member.get("cosmetics", []) + [item["id"]]))
-
-        # Oppdaterer Firestore med ny saldo og kosmetikk.
-        db.collection('members').document(member_doc.id).update({
-            "money": new_money,
-            "cosmetics": new_cosmetics
-        })
+        # Sjekker eierskap og saldo, trekker fra penger og legger til den kosmetiske gjenstanden
+        # i én atomisk operasjon, slik at samtidige kjøp ikke kan overskrive hverandres saldo.
+        new_money, new_cosmetics = get_store().members.purchase(member_id, uid, item["id"], float(item["price"]))
+        member_cache.invalidate(uid, member_id)
+        change_hub.member_updated(uid, member_id, changes={"money": new_money, "cosmetics": new_cosmetics})
 
         return jsonify({
             "message": "Vare kjøpt!",
@@ -66,9 +66,19 @@ def purchase_item():
             "new_cosmetics": new_cosmetics
         }), 200
     
+    except MemberNotFound:
+        ownership.discard(member_id)
+        return jsonify({"error": "Bruker finnes ikke!"}), 404
+    except AccessDenied:
+        return jsonify({"error": "Ingen tilgang til dette medlemmet"}), 403
+    except InsufficientFunds:
+        return jsonify({"error": "Ikke nok penger!"}), 400
+    except ContentionError as e:
+        return jsonify({"error": str(e)}), 409
+
     # Håndterer generelle feil.
     except Exception as e:
-        print(f"Kjøp feilet!: {e}")
+        log.exception("Kjøp feilet!")
         return jsonify({"error": str(e)}), 500
 
 
@@ -4,12 +4,17 @@
 
 import re                                                # Brukes til regex-validering av e-post og telefon. Passer på at de følger bestemte mønstre.
 from flask import Blueprint, request, jsonify            # Flask-moduler for routing og HTTP-respons.
-from firebase_config import db                           # Firebase Admin SDK-klienter for auth og Firestore.
+from storage import get_store                            # Lagringslaget for brukerprofiler.
+from profile_cache import profile_cache                  # Nye profiler legges rett i cachen.
+from elevation import hash_pin                           # Admin-PIN lagres som hash.
 from firebase_admin import auth
+from firebase_config import get_app                      # Firebase-appen, initieres ved første kall.
 from firebase_admin.auth import EmailAlreadyExistsError  # Egen feilklasse fra Firebase knyttet opp mot eksisterende e-post.
+import logging                                           # Logger feil uten å blokkere forespørselen.
 
 # Oppretter et Blueprint for registrering.
 register = Blueprint('register',__name__, template_folder='../frontend')
+log = logging.getLogger(__name__)
 
 # Funksjon: Sjekker om e-post har gyldig format. 
 def is_valid_email(email):
@@ -53,17 +58,18 @@ def register_api():
                         kwargs["phone_number"] = phone
                 
                 # Oppretter bruker i Firebase Authentication.
-                user = auth.create_user(**kwargs)
+                user = auth.create_user(**kwargs, app=get_app())
 
                 # Lagrer brukerdata i Firestore.
-                db.collection("users").document(user.uid).set({
-
+                profile = {
                         'username': username,
                         'email': email,
                         'uid': user.uid,
                         'phone': phone,
-                        'admin_pin': admin_pin
-                    })
+                        'admin_pin': hash_pin(admin_pin)
+                    }
+                get_store().users.create(user.uid, profile)
+                profile_cache.put(user.uid, profile, email=user.email or email) # Første innlogging kan svares fra minnet.
                 
                 return jsonify({"message":"Bruker opprettet!", "uid": user.uid}), 201
         
@@ -72,7 +78,7 @@ def register_api():
                 return jsonify({"error": "Bruker eller email eksisterer allerede!"}), 409
         # Håndterer generell feil.
         except Exception as e:
-                print("Feil i register_api:", e)
+                log.exception("Feil i register_api")
                 return jsonify({"error": str(e)}), 500
            
 
@@ -0,0 +1,54 @@
+# storage - Lagringslaget for medlemmer, oppgaver og brukere.
+# Rutene snakker kun med dette laget, og backend velges med miljøvariabelen STORAGE_BACKEND:
+#   firestore (standard) - Firestore via firebase_config.get_db()
+#   memory               - alt i minnet, for testing og benchmarking
+#   sqlite               - lokal SQLite-fil, sti settes med SQLITE_PATH
+
+import os
+import threading
+
+_store = None
+_lock = threading.Lock()
+
+# Funksjon: Lager et lager for valgt backend.
+def create_store(backend=None):
+    backend = (backend or os.getenv("STORAGE_BACKEND", "firestore")).lower()
+
+    if backend == 'memory':
+        from storage.memory_store import MemoryStore
+        return MemoryStore()
+
+    if backend == 'sqlite':
+        from storage.sqlite_store import SQLiteStore
+        return SQLiteStore(os.getenv("SQLITE_PATH", "storage.sqlite3"))
+
+    if backend == 'firestore':
+        # Importeres først her slik at Firebase ikke initieres når en lokal backend brukes.
+        from firebase_config import get_db
+        from storage.firestore_store import FirestoreStore
+        return FirestoreStore(get_db())
+
+    raise ValueError(f"Ukjent STORAGE_BACKEND: {backend}")
+
+# Funksjon: Returnerer det delte lageret for prosessen. Opprettes ved første kall.
+def get_store():
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = create_store()
+    return _store
+
+# Funksjon: Glemmer et Firestore-lager som er arvet fra foreldreprosessen, slik at
+# hver worker lager sitt eget med sin egen klient. Lokale lagre beholdes.
+def reset_after_fork():
+    global _store, _lock
+    _lock = threading.Lock()
+    if _store is not None and _store.name == 'firestore':
+        _store = None
+
+# Funksjon: Bytter ut det delte lageret, f.eks. i tester og benchmarks.
+def set_store(store):
+    global _store
+    with _lock:
+        _store = store
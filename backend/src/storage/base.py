@@ -0,0 +1,184 @@
+# base.py - Felles hjelpefunksjoner for lagringslagene.
+# Brukes av minne- og SQLite-lagringen for å etterligne hvordan Firestore oppdaterer dokumenter.
+
+import base64    # Cursorer for sidevisning kodes som URL-sikker tekst.
+import copy      # Dype kopier slik at kallere aldri deler objekter med lageret.
+import hashlib
+import json
+import secrets   # Tilfeldige dokument-ID-er.
+import string
+
+# Samme tegnsett og lengde som Firestore bruker for automatiske dokument-ID-er.
+_ID_ALPHABET = string.ascii_letters + string.digits
+
+def new_id():
+    return ''.join(secrets.choice(_ID_ALPHABET) for _ in range(20))
+
+# Funksjon: Lager en ID med samme format som new_id(), men som alltid blir lik for de samme delene.
+# Brukes ved import, slik at en import som kjøres på nytt skriver over de samme dokumentene.
+def stable_id(*parts):
+    digest = hashlib.sha256('\x1f'.join(map(str, parts)).encode('utf-8')).digest()
+    return ''.join(_ID_ALPHABET[byte % len(_ID_ALPHABET)] for byte in digest[:20])
+
+# Markerer at et felt skal slettes i update(), tilsvarende firestore.DELETE_FIELD.
+DELETE_FIELD = object()
+
+# Funksjon: Oppdaterer et dokument på samme måte som Firestore sin update().
+# Nøkler med punktum ("character.color") setter et felt inne i et nøstet objekt.
+def apply_update(data, fields):
+    for path, value in fields.items():
+        parts = path.split('.')
+        target = data
+        for part in parts[:-1]:
+            if not isinstance(target.get(part), dict):
+                target[part] = {}
+            target = target[part]
+        if value is DELETE_FIELD:
+            target.pop(parts[-1], None)
+        else:
+            target[parts[-1]] = copy.deepcopy(value)
+    return data
+
+# Funksjon: Fletter et dokument inn i et annet på samme måte som Firestore sin set(merge=True).
+# Nøstede objekter flettes, mens andre verdier (også lister) skrives over. Felt som ikke er med beholdes.
+def merge_document(data, fields):
+    for key, value in fields.items():
+        if isinstance(value, dict) and isinstance(data.get(key), dict):
+            merge_document(data[key], value)
+        else:
+            data[key] = copy.deepcopy(value)
+    return data
+
+# Funksjon: Velger ut feltene i en projeksjon. Brukes der lagringen ikke kan gjøre det i spørringen.
+def project(data, fields):
+    if fields is None:
+        return data
+    return {key: data[key] for key in fields if key in data}
+
+# Feltene i en oppgave som sendes til frontend. Resten (memberId, adminId, createdAt ...) er interne.
+TASK_FIELDS = ('id', 'title', 'price', 'completed')
+
+def public_task(record):
+    return {key: record[key] for key in TASK_FIELDS if key in record}
+
+# Feltene klienten ikke kan endre med tasks.replace() (update-member). Fullføring og pris går bare gjennom
+# complete-rutene, som betaler ut og teller statistikken atomisk. Ellers kunne en klient med en gammel liste
+# satt en utbetalt oppgave tilbake til åpen og fått betalt for den på nytt.
+LOCKED_TASK_FIELDS = ('completed', 'completedAt', 'price')
+
+# Funksjon: Endringene klienten kan gjøre på en eksisterende oppgave. Returnerer bare feltene som er endret.
+def client_task_changes(record, task):
+    return {key: value for key, value in public_task(task).items()
+            if key not in LOCKED_TASK_FIELDS and record.get(key) != value}
+
+# Funksjon: Lager en ny oppgave fra klientens liste. Den starter alltid som åpen.
+def client_task_record(member_id, admin_id, task, created_at):
+    fields = {key: value for key, value in public_task(task).items() if key not in ('completed', 'completedAt')}
+    return task_record(member_id, admin_id, fields, created_at)
+
+# Funksjon: Lager en cursor for sidevisning av oppgaver. Oppgavene sorteres på (createdAt, id).
+def encode_cursor(record):
+    raw = json.dumps([record['createdAt'], record['id']]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+# Funksjon: Leser en cursor. Gir ValueError hvis den er ugyldig.
+def decode_cursor(cursor):
+    try:
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError("Ugyldig cursor")
+    if not isinstance(created_at, (int, float)) or not isinstance(task_id, str):
+        raise ValueError("Ugyldig cursor")
+    return created_at, task_id
+
+# Funksjon: Lager en oppgavepost klar for lagring.
+def task_record(member_id, admin_id, task, created_at):
+    record = dict(task)
+    record['memberId'] = member_id
+    record['adminId'] = admin_id
+    record.setdefault('completed', False)
+    record.setdefault('createdAt', created_at)
+    if record['completed']:
+        # Fullførte oppgaver har alltid completedAt, så Firestore kan arkivere dem med en indeksert spørring.
+        record.setdefault('completedAt', record['createdAt'])
+    return record
+
+# Funksjon: Sorteringsnøkkel for oppgaver, samme rekkefølge som Firestore-spørringen.
+def sort_key(record):
+    return (record['createdAt'], record['id'])
+
+# Maks antall oppgaver som arkiveres i én operasjon. I Firestore er det to skrivinger per oppgave
+# (ny historikkpost og sletting) pluss medlemmet, og en batch tillater maks 500.
+ARCHIVE_BATCH = 200
+
+# Funksjon: Når oppgaven ble fullført. Oppgaver fullført før completedAt fantes bruker createdAt.
+def completed_at(record):
+    return record.get('completedAt', record['createdAt'])
+
+# Funksjon: Sant når oppgaven er fullført før tidspunktet og kan flyttes til historikken.
+def archivable(record, completed_before):
+    return bool(record.get('completed')) and completed_at(record) < completed_before
+
+# Funksjon: Legger arkiverte oppgaver til de løpende summene på medlemmet (feltet history).
+def add_history_totals(member, records):
+    history = member.setdefault('history', {})
+    history['count'] = history.get('count', 0) + len(records)
+    history['earned'] = history.get('earned', 0) + sum(record.get('price', 0) for record in records)
+    return history
+
+# Tellere som holdes oppdatert ved hver skriving, på medlemmet (feltet stats) og per admin.
+#   tasksAdded, tasksCompleted - antall oppgaver lagt til og fullført
+#   earned                     - kroner tjent på fullførte oppgaver
+#   purchases, spent           - antall kjøp og kroner brukt i butikken
+STAT_FIELDS = ('tasksAdded', 'tasksCompleted', 'earned', 'purchases', 'spent')
+
+def empty_stats():
+    return dict.fromkeys(STAT_FIELDS, 0)
+
+# Funksjon: Legger endringene til tellerne i stats. Returnerer stats.
+def add_stats(stats, deltas):
+    for field, delta in deltas.items():
+        stats[field] = stats.get(field, 0) + delta
+    return stats
+
+# Funksjon: Summerer endringene i tellerne per medlem for nye oppgaveposter.
+# Poster som allerede er fullført (f.eks. fra import) teller også som fullført og tjent.
+def added_task_stats(records):
+    deltas = {}
+    for record in records:
+        member_deltas = deltas.setdefault((record['memberId'], record.get('adminId')), {"tasksAdded": 0})
+        member_deltas["tasksAdded"] += 1
+        if record.get('completed'):
+            add_stats(member_deltas, {"tasksCompleted": 1, "earned": record.get('price', 0)})
+    return deltas
+
+# Funksjon: Postene med ID-er som ikke finnes fra før, og bare den første av poster med samme ID.
+# exists er en funksjon som sier om en oppgave-ID allerede er lagret. Brukes av insert_missing().
+def new_records(records, exists):
+    seen = set()
+    result = []
+    for record in records:
+        if record['id'] not in seen and not exists(record['id']):
+            seen.add(record['id'])
+            result.append(record)
+    return result
+
+# Feil fra lagringslaget. Rutene gjør dem om til riktig HTTP-statuskode.
+class StorageError(Exception):
+    pass
+
+class MemberNotFound(StorageError):
+    pass
+
+class TaskNotFound(StorageError):
+    pass
+
+class AccessDenied(StorageError):
+    pass
+
+class InsufficientFunds(StorageError):
+    pass
+
+# Kastes når en skriving fortsatt kolliderer med andre skrivinger etter alle nye forsøk.
+class ContentionError(StorageError):
+    pass
@@ -0,0 +1,49 @@
+# firestore_async.py - Asynkron lesing fra Firestore med firestore.AsyncClient.
+# Brukes av ASGI-modusen (asgi.py) for de mest brukte leserutene. Dataformatet er det samme
+# som i FirestoreStore, og alle skrivinger går fortsatt gjennom det vanlige lagringslaget.
+
+# Klasse: Asynkron lesing av medlemmer.
+class AsyncFirestoreMembers:
+    def __init__(self, client):
+        self._col = client.collection('members')
+
+    async def get(self, member_id):
+        doc = await self._col.document(member_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    # Leser kun adminId-feltet, ikke hele dokumentet.
+    async def get_owner(self, member_id):
+        doc = await self._col.document(member_id).get(field_paths=['adminId'])
+        return (doc.to_dict() or {}).get('adminId') if doc.exists else None
+
+    async def list_by_admin(self, admin_id):
+        return [(doc.id, doc.to_dict()) async for doc in self._col.where('adminId', '==', admin_id).stream()]
+
+# Klasse: Asynkron lesing av oppgaver.
+class AsyncFirestoreTasks:
+    def __init__(self, client):
+        self._col = client.collection('tasks')
+
+    async def list(self, member_id):
+        query = self._col.where('memberId', '==', member_id).order_by('createdAt').order_by('__name__')
+        return [doc.to_dict() async for doc in query.stream()]
+
+    async def list_by_admin(self, admin_id):
+        result = {}
+        query = self._col.where('adminId', '==', admin_id).order_by('createdAt').order_by('__name__')
+        async for doc in query.stream():
+            record = doc.to_dict()
+            result.setdefault(record['memberId'], []).append(record)
+        return result
+
+# Klasse: Samler de asynkrone repositoriene.
+class AsyncFirestoreStore:
+    name = 'firestore-async'
+
+    def __init__(self, client):
+        self._client = client
+        self.members = AsyncFirestoreMembers(client)
+        self.tasks = AsyncFirestoreTasks(client)
+
+    def close(self):
+        pass
@@ -0,0 +1,511 @@
+# firestore_store.py - Lagring i Firestore. Dette er standardlagringen i produksjon.
+# Samme grensesnitt som minne- og SQLite-lagringen, slik at rutene ikke trenger å vite hvilken som brukes.
+
+import time                                        # Tidsstempel for når oppgaver opprettes og fullføres.
+from firebase_admin import firestore               # Spesielle verdier som Increment og DELETE_FIELD.
+from google.api_core.exceptions import NotFound    # Kastes når update() treffer et dokument som ikke finnes.
+from google.api_core.exceptions import FailedPrecondition, Aborted # Samtidige endringer av samme dokument.
+from storage.base import DELETE_FIELD, task_record, public_task, new_records
+from storage.base import client_task_record, client_task_changes
+from storage.base import ARCHIVE_BATCH, empty_stats, add_stats, added_task_stats
+from storage.base import StorageError, MemberNotFound, TaskNotFound, AccessDenied, InsufficientFunds
+from storage.retry import run_with_retry
+
+# Maks antall skrivinger i én batch.
+BATCH_LIMIT = 500
+
+# Maks antall verdier i en in-spørring.
+IN_QUERY_LIMIT = 30
+
+# Klasse: Medlemmer i samlingen "members".
+class FirestoreMembers:
+    def __init__(self, client):
+        self._client = client
+        self._col = client.collection('members')
+        self._stats = client.collection('admin_stats')
+
+    def get(self, member_id):
+        doc = self._col.document(member_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    # Leser kun adminId-feltet, ikke hele dokumentet.
+    def get_owner(self, member_id):
+        doc = self._col.document(member_id).get(field_paths=['adminId'])
+        return (doc.to_dict() or {}).get('adminId') if doc.exists else None
+
+    # Strømmer medlemmene til admin. Med limit/after sorteres det på dokument-ID, og fields
+    # sendes som select() slik at Firestore kun returnerer de feltene som trengs.
+    def list_by_admin(self, admin_id, limit=None, after=None, fields=None):
+        query = self._col.where('adminId', '==', admin_id)
+        if fields is not None:
+            query = query.select(fields)
+        if limit is not None or after is not None:
+            query = query.order_by('__name__')
+            if after is not None:
+                query = query.start_after({'__name__': after})
+            if limit is not None:
+                query = query.limit(limit)
+        return ((doc.id, doc.to_dict()) for doc in query.stream())
+
+    def create(self, data):
+        doc_ref = self._col.document() # Nytt dokument med en tilfeldig ID.
+        doc_ref.set(data)
+        return doc_ref.id
+
+    def create_many(self, datas):
+        refs = [self._col.document() for _ in datas]
+        for chunk in _chunks(list(zip(refs, datas)), BATCH_LIMIT):
+            batch = self._client.batch()
+            for ref, data in chunk:
+                batch.set(ref, data)
+            batch.commit()
+        return [ref.id for ref in refs]
+
+    # Lagrer medlemmer med gitte ID-er. items er (medlem-ID, data)-par. Et medlem som finnes fra før
+    # flettes med dataene, så felt som ikke er med (f.eks. stats og history) beholdes.
+    def put_many(self, items):
+        for chunk in _chunks(list(items), BATCH_LIMIT):
+            batch = self._client.batch()
+            for member_id, data in chunk:
+                batch.set(self._col.document(member_id), data, merge=True)
+            batch.commit()
+        return [member_id for member_id, _ in items]
+
+    def update(self, member_id, fields):
+        try:
+            self._col.document(member_id).update(_to_firestore(fields))
+            return True
+        except NotFound:
+            return False
+
+    def delete(self, member_id):
+        self._col.document(member_id).delete()
+
+    def iter_all(self):
+        for doc in self._col.stream():
+            yield doc.id, doc.to_dict()
+
+    # Trekker prisen fra saldoen og legger til gjenstanden atomisk. Returnerer (ny saldo, kosmetikk).
+    # Skrivingen krever at medlemmet er uendret siden det ble lest, ellers leses det på nytt.
+    def purchase(self, member_id, admin_id, item_id, price):
+        return run_with_retry(lambda: self._purchase(member_id, admin_id, item_id, price), is_conflict)
+
+    def _purchase(self, member_id, admin_id, item_id, price):
+        member_ref = self._col.document(member_id)
+        member_doc = member_ref.get()
+        member = _check_member(member_doc, admin_id)
+        if member.get('money', 0) < price:
+            raise InsufficientFunds(member_id)
+
+        new_money = member.get('money', 0) - price
+        new_cosmetics = list(set(member.get('cosmetics', []) + [item_id]))
+        deltas = {"purchases": 1, "spent": price}
+        batch = self._client.batch()
+        batch.update(member_ref, {"money": new_money, "cosmetics": new_cosmetics, **_increments(deltas, 'stats.')},
+                     option=self._client.write_option(last_update_time=member_doc.update_time))
+        batch.set(self._stats.document(admin_id), _increments(deltas), merge=True)
+        batch.commit()
+        return new_money, new_cosmetics
+
+# Funksjon: Sjekker at medlemmet finnes og tilhører admin. Returnerer dataene i dokumentet.
+def _check_member(member_doc, admin_id):
+    if not member_doc.exists:
+        raise MemberNotFound(member_doc.id)
+    member = member_doc.to_dict()
+    if admin_id is not None and member.get('adminId') != admin_id:
+        raise AccessDenied(member_doc.id)
+    return member
+
+# Funksjon: Gjør om endringer i tellerne til Increment-verdier, som Firestore legger til atomisk.
+# prefix er 'stats.' for tellerne på medlemmet.
+def _increments(deltas, prefix=''):
+    return {f"{prefix}{field}": firestore.Increment(delta) for field, delta in deltas.items()}
+
+# Funksjon: Sant når skrivingen feilet fordi dokumentet ble endret samtidig.
+def is_conflict(error):
+    return isinstance(error, (FailedPrecondition, Aborted))
+
+# Klasse: Oppgaver som egne dokumenter i samlingen "tasks", med memberId og adminId som indekserte felt.
+# Hver oppgave kan dermed leses og skrives alene, uten å røre medlemsdokumentet.
+# Spørringene trenger de sammensatte indeksene i backend/firestore.indexes.json.
+class FirestoreTasks:
+    def __init__(self, client):
+        self._client = client
+        self._col = client.collection('tasks')
+        self._members = client.collection('members')
+        self._history = client.collection('task_history')
+        self._stats = client.collection('admin_stats')
+
+    def list(self, member_id, completed=None, limit=None, after=None):
+        query = self._col.where('memberId', '==', member_id)
+        if completed is not None:
+            query = query.where('completed', '==', completed)
+        query = query.order_by('createdAt').order_by('__name__')
+        if after is not None:
+            query = query.start_after({'createdAt': after[0], '__name__': after[1]})
+        if limit is not None:
+            query = query.limit(limit)
+        return [doc.to_dict() for doc in query.stream()]
+
+    def list_by_admin(self, admin_id):
+        result = {}
+        for doc in self._col.where('adminId', '==', admin_id).order_by('createdAt').order_by('__name__').stream():
+            record = doc.to_dict()
+            result.setdefault(record['memberId'], []).append(record)
+        return result
+
+    # Henter oppgavene til flere medlemmer. Firestore tillater maks 30 verdier i en in-spørring.
+    def list_by_members(self, member_ids):
+        result = {}
+        for chunk in _chunks(list(member_ids), IN_QUERY_LIMIT):
+            query = self._col.where('memberId', 'in', chunk).order_by('createdAt').order_by('__name__')
+            for doc in query.stream():
+                record = doc.to_dict()
+                result.setdefault(record['memberId'], []).append(record)
+        return result
+
+    def get(self, task_id):
+        doc = self._col.document(task_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def add(self, member_id, admin_id, task):
+        return self.insert([task_record(member_id, admin_id, task, time.time())])[0]
+
+    def add_many(self, member_id, admin_id, tasks):
+        now = time.time()
+        return self.insert([task_record(member_id, admin_id, task, now) for task in tasks])
+
+    # Lagrer ferdige oppgaveposter, som kan tilhøre flere medlemmer, i batcher.
+    # Tellerne på medlemmene og til admin oppdateres i samme batch som oppgavene. Finnes ikke et av
+    # medlemmene, feiler oppdateringen av tellerne og hele batchen, og MemberNotFound kastes.
+    # Med count_stats=False endres ikke tellerne, f.eks. for data som allerede er talt (migrate_tasks.py).
+    # Da leses medlemmene først, siden det ikke er noen oppdatering av medlemmet som kan feile.
+    def insert(self, records, count_stats=True):
+        if not count_stats:
+            self._check_members({record['memberId'] for record in records})
+        for chunk in _chunks(records, BATCH_LIMIT // 3): # Oppgaven, medlemmet og admin kan gi tre skrivinger hver.
+            self._commit_insert(chunk, count_stats)
+        return records
+
+    def _check_members(self, member_ids):
+        refs = [self._members.document(member_id) for member_id in member_ids]
+        missing = [snap.id for snap in self._client.get_all(refs, field_paths=['adminId']) if not snap.exists]
+        if missing:
+            raise MemberNotFound(', '.join(sorted(missing)))
+
+    # Som insert, men oppgaver med ID-er som finnes fra før hoppes over. Returnerer postene som ble skrevet.
+    # Oppgavene leses først, og skrives med create(), så en oppgave som lages samtidig ikke blir skrevet over.
+    def insert_missing(self, records):
+        written, seen = [], set() # seen: ID-ene som er skrevet i en tidligere bit.
+        for chunk in _chunks(records, BATCH_LIMIT // 3):
+            refs = [self._col.document(record['id']) for record in chunk]
+            existing = {snap.id for snap in self._client.get_all(refs, field_paths=['memberId']) if snap.exists}
+            chunk = new_records(chunk, lambda task_id: task_id in existing or task_id in seen)
+            self._commit_insert(chunk, create=True)
+            seen.update(record['id'] for record in chunk)
+            written.extend(chunk)
+        return written
+
+    # Som insert, men oppgavene til medlemmer som ikke finnes hoppes over. Returnerer ID-ene til disse medlemmene.
+    # Medlemmene leses kun når en batch feiler, og batchen skrives da på nytt uten dem.
+    def insert_skip_missing(self, records):
+        missing = set()
+        for chunk in _chunks(records, BATCH_LIMIT // 3):
+            chunk = [record for record in chunk if record['memberId'] not in missing]
+            try:
+                self._commit_insert(chunk)
+            except MemberNotFound:
+                refs = [self._members.document(member_id) for member_id in {record['memberId'] for record in chunk}]
+                missing.update(snap.id for snap in self._client.get_all(refs, field_paths=['adminId']) if not snap.exists)
+                self._commit_insert([record for record in chunk if record['memberId'] not in missing])
+        return missing
+
+    def _commit_insert(self, chunk, count_stats=True, create=False):
+        if not chunk:
+            return
+        batch = self._client.batch()
+        for record in chunk:
+            if create:
+                batch.create(self._col.document(record['id']), record)
+            else:
+                batch.set(self._col.document(record['id']), record)
+        deltas = added_task_stats(chunk) if count_stats else {}
+        admins = {}
+        for (member_id, admin_id), member_deltas in deltas.items():
+            batch.update(self._members.document(member_id), _increments(member_deltas, 'stats.'))
+            if admin_id is not None:
+                add_stats(admins.setdefault(admin_id, {}), member_deltas)
+        for admin_id, admin_deltas in admins.items():
+            batch.set(self._stats.document(admin_id), _increments(admin_deltas), merge=True)
+        try:
+            batch.commit()
+        except NotFound:
+            raise MemberNotFound(', '.join(member_id for member_id, _ in deltas))
+
+    # Fullfører oppgaven og øker saldoen atomisk. Returnerer (oppgave, tillegg, ny saldo).
+    # Medlem og oppgave leses i ett kall, og begge skrives i én batch med forutsetning om at
+    # ingen av dem er endret siden de ble lest. Ved kollisjon leses de på nytt og det prøves igjen.
+    def complete(self, member_id, task_id, admin_id=None):
+        return run_with_retry(lambda: self._complete(member_id, task_id, admin_id), is_conflict)
+
+    def _complete(self, member_id, task_id, admin_id):
+        member_ref = self._members.document(member_id)
+        task_ref = self._col.document(task_id)
+        snapshots = {snap.reference.path: snap for snap in self._client.get_all([member_ref, task_ref])}
+        member_doc, task_doc = snapshots[member_ref.path], snapshots[task_ref.path]
+
+        member = _check_member(member_doc, admin_id)
+        if not task_doc.exists or task_doc.get('memberId') != member_id:
+            raise TaskNotFound(task_id)
+        record = task_doc.to_dict()
+        if record.get('completed'):
+            return record, 0, member.get('money', 0)
+
+        record['completed'] = True
+        record['completedAt'] = time.time()
+        new_money = member.get('money', 0) + record['price']
+        deltas = {"tasksCompleted": 1, "earned": record['price']}
+        batch = self._client.batch()
+        batch.update(task_ref, {"completed": True, "completedAt": record['completedAt']},
+                     option=self._client.write_option(last_update_time=task_doc.update_time))
+        batch.update(member_ref, {"money": new_money, **_increments(deltas, 'stats.')},
+                     option=self._client.write_option(last_update_time=member_doc.update_time))
+        if member.get('adminId'):
+            batch.set(self._stats.document(member['adminId']), _increments(deltas), merge=True)
+        batch.commit()
+        return record, record['price'], new_money
+
+    # Fullfører flere oppgaver atomisk. items er (medlem-ID, oppgave-ID)-par.
+    # Alle dokumentene leses i ett kall og skrives i én batch med forutsetninger, som complete().
+    # Returnerer ett resultat per par: (oppgave, tillegg, ny saldo) eller feilen (StorageError) for paret.
+    def complete_many(self, items, admin_id=None):
+        return run_with_retry(lambda: self._complete_many(items, admin_id), is_conflict)
+
+    def _complete_many(self, items, admin_id):
+        refs = {}
+        for member_id, task_id in items:
+            for ref in (self._members.document(member_id), self._col.document(task_id)):
+                refs[ref.path] = ref
+        snapshots = {snap.reference.path: snap for snap in self._client.get_all(list(refs.values()))}
+
+        results = []
+        money = {}       # medlem-ID -> saldo etter oppgavene så langt
+        completed = {}   # oppgave-ID -> (ref, snapshot) for oppgaver som skal skrives
+        members = {}     # medlem-ID -> (ref, snapshot) for medlemmer som skal skrives
+        member_stats = {} # medlem-ID -> endringer i tellerne
+        admin_stats = {}  # admin-ID -> endringer i tellerne
+        now = time.time()
+        for member_id, task_id in items:
+            member_ref, task_ref = self._members.document(member_id), self._col.document(task_id)
+            try:
+                member_doc, task_doc = snapshots[member_ref.path], snapshots[task_ref.path]
+                member = _check_member(member_doc, admin_id)
+                money.setdefault(member_id, member.get('money', 0))
+                if not task_doc.exists or task_doc.get('memberId') != member_id:
+                    raise TaskNotFound(task_id)
+                record = task_doc.to_dict()
+                if record.get('completed') or task_id in completed:
+                    record['completed'] = True
+                    results.append((record, 0, money[member_id]))
+                    continue
+
+                record['completed'] = True
+                record['completedAt'] = now
+                money[member_id] += record['price']
+                completed[task_id] = (task_ref, task_doc)
+                members[member_id] = (member_ref, member_doc)
+                deltas = {"tasksCompleted": 1, "earned": record['price']}
+                add_stats(member_stats.setdefault(member_id, {}), deltas)
+                if member.get('adminId'):
+                    add_stats(admin_stats.setdefault(member['adminId'], {}), deltas)
+                results.append((record, record['price'], money[member_id]))
+            except StorageError as e:
+                results.append(e)
+
+        if completed:
+            writes = len(completed) + len(members) + len(admin_stats)
+            if writes > BATCH_LIMIT: # Alt må skrives atomisk, så det kan ikke deles opp i flere batcher.
+                raise ValueError(f"For mange skrivinger i én batch: {writes} (maks {BATCH_LIMIT})")
+            batch = self._client.batch()
+            for task_ref, task_doc in completed.values():
+                batch.update(task_ref, {"completed": True, "completedAt": now},
+                             option=self._client.write_option(last_update_time=task_doc.update_time))
+            for member_id, (member_ref, member_doc) in members.items():
+                batch.update(member_ref, {"money": money[member_id], **_increments(member_stats[member_id], 'stats.')},
+                             option=self._client.write_option(last_update_time=member_doc.update_time))
+            for admin_id, deltas in admin_stats.items():
+                batch.set(self._stats.document(admin_id), _increments(deltas), merge=True)
+            batch.commit()
+        return results
+
+    # Erstatter medlemmets oppgaver med listen fra frontend. Kun endringene skrives.
+    # Kaster MemberNotFound hvis medlemmet er slettet, så det ikke blir liggende oppgaver uten medlem.
+    def replace(self, member_id, admin_id, tasks):
+        if not self._members.document(member_id).get(field_paths=['adminId']).exists:
+            raise MemberNotFound(member_id)
+        now = time.time()
+        current = {record['id']: record for record in self.list(member_id)}
+        kept = {}
+        writes = []
+        for task in tasks:
+            record = current.pop(task['id'], None) or kept.get(task['id'])
+            if record is None:
+                record = client_task_record(member_id, admin_id, task, now)
+                writes.append(('set', task['id'], record))
+            else:
+                changes = client_task_changes(record, task)
+                if changes:
+                    record = dict(record, **changes)
+                    writes.append(('update', task['id'], changes))
+            kept[task['id']] = record
+        writes.extend(('delete', task_id, None) for task_id in current)
+
+        for chunk in _chunks(writes, BATCH_LIMIT):
+            batch = self._client.batch()
+            for action, task_id, data in chunk:
+                ref = self._col.document(task_id)
+                if action == 'set':
+                    batch.set(ref, data)
+                elif action == 'update':
+                    batch.update(ref, data)
+                else:
+                    batch.delete(ref)
+            batch.commit()
+        return [public_task(record) for record in kept.values()]
+
+    # Flytter fullførte oppgaver eldre enn completed_before til samlingen task_history og øker summene
+    # på medlemmet i én batch. Oppgavene slettes med forutsetning om at de er uendret siden de ble lest,
+    # så en oppgave som endres samtidig blir ikke arkivert med gamle data. Returnerer de arkiverte oppgavene.
+    def archive(self, member_id, completed_before, limit=ARCHIVE_BATCH):
+        return run_with_retry(lambda: self._archive(member_id, completed_before, limit), is_conflict)
+
+    # Filteret, rekkefølgen og grensen ligger i spørringen, så en bit koster høyst limit lesinger
+    # i stedet for alle de fullførte oppgavene til medlemmet.
+    def _archive(self, member_id, completed_before, limit):
+        completed = self._col.where('memberId', '==', member_id).where('completed', '==', True)
+        docs = list(completed.where('completedAt', '<', completed_before)
+                    .order_by('completedAt').order_by('__name__').limit(limit).stream())
+        if len(docs) < limit:
+            docs.extend(self._legacy_archivable(completed, completed_before, limit - len(docs)))
+        if not docs:
+            return []
+
+        records = [doc.to_dict() for doc in docs]
+        batch = self._client.batch()
+        for doc, record in zip(docs, records):
+            batch.set(self._history.document(doc.id), record)
+            batch.delete(doc.reference, option=self._client.write_option(last_update_time=doc.update_time))
+        batch.update(self._members.document(member_id), {
+            "history.count": firestore.Increment(len(records)),
+            "history.earned": firestore.Increment(sum(record.get('price', 0) for record in records)),
+        })
+        try:
+            batch.commit()
+        except NotFound:
+            raise MemberNotFound(member_id)
+        return records
+
+    # Oppgaver fullført før completedAt fantes (f.eks. flyttet med migrate_tasks.py) mangler feltet og kommer
+    # ikke med i spørringen over. De regnes som fullført ved createdAt, så de hentes side for side blant
+    # oppgavene opprettet før grensen. Oppgaver som har completedAt hoppes over, de tas av spørringen over.
+    def _legacy_archivable(self, completed, completed_before, limit):
+        query = completed.where('createdAt', '<', completed_before).order_by('createdAt').order_by('__name__')
+        docs = []
+        last = None
+        while len(docs) < limit:
+            page = query.start_after(last) if last is not None else query
+            page = list(page.limit(limit).stream())
+            docs.extend(doc for doc in page if 'completedAt' not in doc.to_dict())
+            if len(page) < limit:
+                break
+            last = page[-1]
+        return docs[:limit]
+
+    def delete_for_member(self, member_id):
+        _delete_where(self._client, self._col, member_id)
+
+# Klasse: Arkiverte oppgaver i samlingen "task_history". Dokumentene legges bare til, og endres aldri.
+class FirestoreHistory:
+    def __init__(self, client):
+        self._client = client
+        self._col = client.collection('task_history')
+
+    def list(self, member_id, limit=None, after=None):
+        query = self._col.where('memberId', '==', member_id).order_by('createdAt').order_by('__name__')
+        if after is not None:
+            query = query.start_after({'createdAt': after[0], '__name__': after[1]})
+        if limit is not None:
+            query = query.limit(limit)
+        return [doc.to_dict() for doc in query.stream()]
+
+    def delete_for_member(self, member_id):
+        _delete_where(self._client, self._col, member_id)
+
+# Funksjon: Sletter alle dokumentene til et medlem i en samling, i batcher.
+def _delete_where(client, col, member_id):
+    refs = [doc.reference for doc in col.where('memberId', '==', member_id).select([]).stream()]
+    for chunk in _chunks(refs, BATCH_LIMIT):
+        batch = client.batch()
+        for ref in chunk:
+            batch.delete(ref)
+        batch.commit()
+
+# Funksjon: Deler en liste i biter. Firestore tillater maks 500 skrivinger per batch.
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+# Klasse: Brukerprofiler i samlingen "users".
+class FirestoreUsers:
+    def __init__(self, client):
+        self._col = client.collection('users')
+
+    def get(self, uid):
+        doc = self._col.document(uid).get()
+        return doc.to_dict() if doc.exists else None
+
+    def create(self, uid, data):
+        self._col.document(uid).set(data)
+
+    def iter_all(self):
+        for doc in self._col.stream():
+            yield doc.id, doc.to_dict()
+
+    def update(self, uid, fields):
+        try:
+            self._col.document(uid).update(fields)
+            return True
+        except NotFound:
+            return False
+
+# Klasse: Tellere per admin i samlingen "admin_stats", ett dokument per admin (se STAT_FIELDS i storage/base.py).
+class FirestoreStats:
+    def __init__(self, client):
+        self._col = client.collection('admin_stats')
+
+    def get(self, admin_id):
+        doc = self._col.document(admin_id).get()
+        return dict(empty_stats(), **(doc.to_dict() or {})) if doc.exists else empty_stats()
+
+    # Overskriver tellerne, brukes ved etterfylling.
+    def set(self, admin_id, stats):
+        self._col.document(admin_id).set(stats)
+
+# Funksjon: Oversetter lagringslagets spesialverdier til Firestore sine.
+def _to_firestore(fields):
+    return {path: (firestore.DELETE_FIELD if value is DELETE_FIELD else value) for path, value in fields.items()}
+
+# Klasse: Samler repositoriene rundt én Firestore-klient.
+class FirestoreStore:
+    name = 'firestore'
+
+    def __init__(self, client):
+        self.client = client
+        self.members = FirestoreMembers(client)
+        self.tasks = FirestoreTasks(client)
+        self.history = FirestoreHistory(client)
+        self.stats = FirestoreStats(client)
+        self.users = FirestoreUsers(client)
+
+    def close(self):
+        pass
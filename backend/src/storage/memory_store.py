@@ -0,0 +1,325 @@
+# memory_store.py - Lagring i minnet. Brukes til lokal kjøring, testing og benchmarking.
+# All data forsvinner når prosessen avsluttes.
+
+import copy                           # Returnerer kopier slik at kallere ikke endrer lageret direkte.
+import threading                      # En felles lås gjør alle operasjoner atomiske.
+import time                           # Tidsstempel for når oppgaver opprettes og fullføres.
+from storage.base import new_id, apply_update, project, task_record, public_task, sort_key
+from storage.base import client_task_record, client_task_changes
+from storage.base import ARCHIVE_BATCH, archivable, add_history_totals
+from storage.base import empty_stats, add_stats, added_task_stats, merge_document, new_records
+from storage.base import StorageError, MemberNotFound, TaskNotFound, AccessDenied, InsufficientFunds
+
+# Klasse: Medlemmer lagret i en ordbok.
+class MemoryMembers:
+    def __init__(self, store):
+        self._store = store
+
+    def get(self, member_id):
+        with self._store.lock:
+            data = self._store.member_docs.get(member_id)
+            return copy.deepcopy(data) if data is not None else None
+
+    def get_owner(self, member_id):
+        with self._store.lock:
+            data = self._store.member_docs.get(member_id)
+            return data.get('adminId') if data is not None else None
+
+    # Medlemmene sorteres på ID, som i Firestore. after er ID-en til siste medlem på forrige side.
+    def list_by_admin(self, admin_id, limit=None, after=None, fields=None):
+        with self._store.lock:
+            member_ids = sorted(member_id for member_id, data in self._store.member_docs.items()
+                                if data.get('adminId') == admin_id and (after is None or member_id > after))
+            if limit is not None:
+                member_ids = member_ids[:limit]
+            return [(member_id, project(copy.deepcopy(self._store.member_docs[member_id]), fields))
+                    for member_id in member_ids]
+
+    def create(self, data):
+        member_id = new_id()
+        with self._store.lock:
+            self._store.member_docs[member_id] = copy.deepcopy(data)
+        return member_id
+
+    def create_many(self, datas):
+        return [self.create(data) for data in datas]
+
+    # Lagrer medlemmer med gitte ID-er. items er (medlem-ID, data)-par. Et medlem som finnes fra før
+    # flettes med dataene, så felt som ikke er med (f.eks. stats og history) beholdes.
+    def put_many(self, items):
+        with self._store.lock:
+            for member_id, data in items:
+                merge_document(self._store.member_docs.setdefault(member_id, {}), data)
+        return [member_id for member_id, _ in items]
+
+    def update(self, member_id, fields):
+        with self._store.lock:
+            data = self._store.member_docs.get(member_id)
+            if data is None:
+                return False
+            apply_update(data, fields)
+            return True
+
+    def delete(self, member_id):
+        with self._store.lock:
+            self._store.member_docs.pop(member_id, None)
+
+    def iter_all(self):
+        with self._store.lock:
+            return [(member_id, copy.deepcopy(data)) for member_id, data in self._store.member_docs.items()]
+
+    # Trekker prisen fra saldoen og legger til gjenstanden atomisk. Returnerer (ny saldo, kosmetikk).
+    def purchase(self, member_id, admin_id, item_id, price):
+        with self._store.lock:
+            member = self._store.member_docs.get(member_id)
+            if member is None:
+                raise MemberNotFound(member_id)
+            if member.get('adminId') != admin_id:
+                raise AccessDenied(member_id)
+            if member.get('money', 0) < price:
+                raise InsufficientFunds(member_id)
+
+            member['money'] = member.get('money', 0) - price
+            member['cosmetics'] = list(set(member.get('cosmetics', []) + [item_id]))
+            self._store.bump_stats(member, admin_id, {"purchases": 1, "spent": price})
+            return member['money'], list(member['cosmetics'])
+
+# Klasse: Oppgaver som egne poster, indeksert på medlem.
+class MemoryTasks:
+    def __init__(self, store):
+        self._store = store
+
+    def _member_tasks(self, member_id):
+        return self._store.task_docs.setdefault(member_id, {})
+
+    def list(self, member_id, completed=None, limit=None, after=None):
+        with self._store.lock:
+            records = [t for t in self._store.task_docs.get(member_id, {}).values()
+                       if completed is None or t.get('completed') == completed]
+            records.sort(key=sort_key)
+            if after is not None:
+                records = [t for t in records if sort_key(t) > tuple(after)]
+            if limit is not None:
+                records = records[:limit]
+            return copy.deepcopy(records)
+
+    def list_by_admin(self, admin_id):
+        with self._store.lock:
+            result = {}
+            for member_id, tasks in self._store.task_docs.items():
+                records = sorted((t for t in tasks.values() if t.get('adminId') == admin_id), key=sort_key)
+                if records:
+                    result[member_id] = copy.deepcopy(records)
+            return result
+
+    def list_by_members(self, member_ids):
+        with self._store.lock:
+            return {member_id: copy.deepcopy(sorted(self._store.task_docs[member_id].values(), key=sort_key))
+                    for member_id in member_ids if self._store.task_docs.get(member_id)}
+
+    def get(self, task_id):
+        with self._store.lock:
+            member_id = self._store.task_index.get(task_id)
+            if member_id is None:
+                return None
+            return copy.deepcopy(self._store.task_docs[member_id][task_id])
+
+    def add(self, member_id, admin_id, task):
+        return self.add_many(member_id, admin_id, [task])[0]
+
+    def add_many(self, member_id, admin_id, tasks):
+        now = time.time()
+        return self.insert([task_record(member_id, admin_id, task, now) for task in tasks])
+
+    # Lagrer ferdige oppgaveposter, som kan tilhøre flere medlemmer.
+    # Kaster MemberNotFound uten å skrive noe hvis et av medlemmene ikke finnes.
+    # Med count_stats=False endres ikke tellerne, f.eks. for data som allerede er talt (migrate_tasks.py).
+    def insert(self, records, count_stats=True):
+        with self._store.lock:
+            missing = {record['memberId'] for record in records} - set(self._store.member_docs)
+            if missing:
+                raise MemberNotFound(', '.join(sorted(missing)))
+            for record in records:
+                self._member_tasks(record['memberId'])[record['id']] = copy.deepcopy(record)
+                self._store.task_index[record['id']] = record['memberId']
+            if count_stats:
+                for (member_id, admin_id), deltas in added_task_stats(records).items():
+                    self._store.bump_stats(self._store.member_docs.get(member_id), admin_id, deltas)
+        return records
+
+    # Som insert, men oppgaver med ID-er som finnes fra før hoppes over. Returnerer postene som ble skrevet.
+    def insert_missing(self, records):
+        with self._store.lock:
+            return self.insert(new_records(records, lambda task_id: task_id in self._store.task_index))
+
+    # Som insert, men oppgavene til medlemmer som ikke finnes hoppes over. Returnerer ID-ene til disse medlemmene.
+    def insert_skip_missing(self, records):
+        with self._store.lock:
+            missing = {record['memberId'] for record in records} - set(self._store.member_docs)
+            self.insert([record for record in records if record['memberId'] not in missing])
+        return missing
+
+    # Fullfører oppgaven og øker saldoen atomisk. Returnerer (oppgave, tillegg, ny saldo).
+    def complete(self, member_id, task_id, admin_id=None):
+        with self._store.lock:
+            member = self._store.member_docs.get(member_id)
+            if member is None:
+                raise MemberNotFound(member_id)
+            if admin_id is not None and member.get('adminId') != admin_id:
+                raise AccessDenied(member_id)
+            record = self._store.task_docs.get(member_id, {}).get(task_id)
+            if record is None:
+                raise TaskNotFound(task_id)
+            if record.get('completed'):
+                return copy.deepcopy(record), 0, member.get('money', 0)
+
+            record['completed'] = True
+            record['completedAt'] = time.time()
+            member['money'] = member.get('money', 0) + record['price']
+            self._store.bump_stats(member, member.get('adminId'), {"tasksCompleted": 1, "earned": record['price']})
+            return copy.deepcopy(record), record['price'], member['money']
+
+    # Fullfører flere oppgaver atomisk. items er (medlem-ID, oppgave-ID)-par.
+    # Returnerer ett resultat per par: (oppgave, tillegg, ny saldo) eller feilen (StorageError) for paret.
+    def complete_many(self, items, admin_id=None):
+        results = []
+        with self._store.lock:
+            for member_id, task_id in items:
+                try:
+                    results.append(self.complete(member_id, task_id, admin_id))
+                except StorageError as e:
+                    results.append(e)
+        return results
+
+    # Erstatter medlemmets oppgaver med listen fra frontend. Kun endringene skrives, og status og pris
+    # på eksisterende oppgaver endres ikke (se LOCKED_TASK_FIELDS). Returnerer oppgavene slik de er lagret.
+    def replace(self, member_id, admin_id, tasks):
+        now = time.time()
+        with self._store.lock:
+            if member_id not in self._store.member_docs:
+                raise MemberNotFound(member_id)
+            member_tasks = self._member_tasks(member_id)
+            keep = set()
+            for task in tasks:
+                keep.add(task['id'])
+                current = member_tasks.get(task['id'])
+                if current is None:
+                    member_tasks[task['id']] = client_task_record(member_id, admin_id, copy.deepcopy(task), now)
+                    self._store.task_index[task['id']] = member_id
+                else:
+                    current.update(client_task_changes(current, copy.deepcopy(task)))
+            for task_id in [t for t in member_tasks if t not in keep]:
+                del member_tasks[task_id]
+                self._store.task_index.pop(task_id, None)
+            return [public_task(member_tasks[task_id]) for task_id in dict.fromkeys(task['id'] for task in tasks)]
+
+    # Flytter fullførte oppgaver eldre enn completed_before til historikken og oppdaterer
+    # summene på medlemmet atomisk. Returnerer de arkiverte oppgavene (maks limit).
+    def archive(self, member_id, completed_before, limit=ARCHIVE_BATCH):
+        with self._store.lock:
+            member = self._store.member_docs.get(member_id)
+            if member is None:
+                raise MemberNotFound(member_id)
+            member_tasks = self._store.task_docs.get(member_id, {})
+            records = sorted((t for t in member_tasks.values() if archivable(t, completed_before)), key=sort_key)[:limit]
+            if not records:
+                return []
+
+            history = self._store.history_docs.setdefault(member_id, {})
+            for record in records:
+                del member_tasks[record['id']]
+                self._store.task_index.pop(record['id'], None)
+                history[record['id']] = record
+            add_history_totals(member, records)
+            return copy.deepcopy(records)
+
+    def delete_for_member(self, member_id):
+        with self._store.lock:
+            for task_id in self._store.task_docs.pop(member_id, {}):
+                self._store.task_index.pop(task_id, None)
+
+# Klasse: Arkiverte oppgaver per medlem. Poster legges bare til, og endres aldri.
+class MemoryHistory:
+    def __init__(self, store):
+        self._store = store
+
+    def list(self, member_id, limit=None, after=None):
+        with self._store.lock:
+            records = sorted(self._store.history_docs.get(member_id, {}).values(), key=sort_key)
+            if after is not None:
+                records = [t for t in records if sort_key(t) > tuple(after)]
+            if limit is not None:
+                records = records[:limit]
+            return copy.deepcopy(records)
+
+    def delete_for_member(self, member_id):
+        with self._store.lock:
+            self._store.history_docs.pop(member_id, None)
+
+# Klasse: Brukerprofiler (admin).
+class MemoryUsers:
+    def __init__(self, store):
+        self._store = store
+
+    def get(self, uid):
+        with self._store.lock:
+            data = self._store.user_docs.get(uid)
+            return copy.deepcopy(data) if data is not None else None
+
+    def create(self, uid, data):
+        with self._store.lock:
+            self._store.user_docs[uid] = copy.deepcopy(data)
+
+    def iter_all(self):
+        with self._store.lock:
+            return [(uid, copy.deepcopy(data)) for uid, data in self._store.user_docs.items()]
+
+    def update(self, uid, fields):
+        with self._store.lock:
+            data = self._store.user_docs.get(uid)
+            if data is None:
+                return False
+            apply_update(data, fields)
+            return True
+
+# Klasse: Tellere per admin (se STAT_FIELDS i storage/base.py).
+class MemoryStats:
+    def __init__(self, store):
+        self._store = store
+
+    def get(self, admin_id):
+        with self._store.lock:
+            return dict(self._store.stats_docs.get(admin_id) or empty_stats())
+
+    # Overskriver tellerne, brukes ved etterfylling.
+    def set(self, admin_id, stats):
+        with self._store.lock:
+            self._store.stats_docs[admin_id] = dict(stats)
+
+# Klasse: Samler repositoriene for minnelagringen.
+class MemoryStore:
+    name = 'memory'
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.member_docs = {}
+        self.user_docs = {}
+        self.task_docs = {}   # medlem-ID -> {oppgave-ID -> oppgave}
+        self.task_index = {}  # oppgave-ID -> medlem-ID
+        self.history_docs = {} # medlem-ID -> {oppgave-ID -> arkivert oppgave}
+        self.stats_docs = {}   # admin-ID -> tellere
+        self.members = MemoryMembers(self)
+        self.tasks = MemoryTasks(self)
+        self.history = MemoryHistory(self)
+        self.stats = MemoryStats(self)
+        self.users = MemoryUsers(self)
+
+    # Oppdaterer tellerne på medlemmet og til admin. Kalles mens låsen holdes, i samme operasjon som skrivingen.
+    def bump_stats(self, member, admin_id, deltas):
+        if member is not None:
+            add_stats(member.setdefault('stats', {}), deltas)
+        if admin_id is not None:
+            add_stats(self.stats_docs.setdefault(admin_id, empty_stats()), deltas)
+
+    def close(self):
+        pass
@@ -0,0 +1,50 @@
+# retry.py - Nye forsøk med backoff når samtidige skrivinger kolliderer.
+# Teller konflikter og nye forsøk slik at de kan overvåkes.
+
+import random     # Tilfeldig spredning (jitter) så ikke alle forsøker igjen samtidig.
+import threading
+import time
+from storage.base import ContentionError
+
+# Klasse: Tellere for atomiske skrivinger.
+class WriteStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0   # Alle forsøk, inkludert det første.
+        self.conflicts = 0  # Forsøk som feilet på grunn av en samtidig skriving.
+        self.retries = 0    # Nye forsøk etter en konflikt.
+        self.failures = 0   # Skrivinger som ga opp etter maks antall forsøk.
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "conflicts": self.conflicts,
+                "retries": self.retries,
+                "failures": self.failures,
+            }
+
+write_stats = WriteStats()
+
+# Funksjon: Kjører fn() og prøver igjen med eksponentiell backoff når is_conflict(feil) er sann.
+# Andre feil sendes rett videre. Etter max_attempts kastes ContentionError.
+def run_with_retry(fn, is_conflict, max_attempts=5, base_delay=0.02, max_delay=0.5, stats=write_stats):
+    for attempt in range(1, max_attempts + 1):
+        stats.add(attempts=1)
+        try:
+            return fn()
+        except Exception as e:
+            if not is_conflict(e):
+                raise
+            stats.add(conflicts=1)
+            if attempt == max_attempts:
+                stats.add(failures=1)
+                raise ContentionError("For mange samtidige endringer, prøv igjen.") from e
+            stats.add(retries=1)
+            delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+            time.sleep(delay * random.uniform(0.5, 1.0))
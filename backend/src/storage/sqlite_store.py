@@ -0,0 +1,453 @@
+# sqlite_store.py - Lagring i en lokal SQLite-database.
+# Gjør det mulig å kjøre backend uten nettverkskall mot Firestore, f.eks. lokalt eller på egen server.
+# Dokumentene lagres som JSON, mens feltene det søkes på (adminId) har egne kolonner med indeks.
+
+import json                           # Dokumentene lagres som JSON-tekst.
+import sqlite3                        # Innebygd SQLite-støtte i Python.
+import threading                      # Én tilkobling deles mellom tråder og beskyttes med en lås.
+import time                           # Tidsstempel for når oppgaver opprettes og fullføres.
+from contextlib import contextmanager
+from storage.base import new_id, apply_update, project, task_record, public_task
+from storage.base import client_task_record, client_task_changes
+from storage.base import ARCHIVE_BATCH, archivable, add_history_totals
+from storage.base import empty_stats, add_stats, added_task_stats, merge_document, new_records
+from storage.base import StorageError, MemberNotFound, TaskNotFound, AccessDenied, InsufficientFunds
+from storage.retry import run_with_retry
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    id TEXT PRIMARY KEY,
+    admin_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS members_admin_id ON members (admin_id);
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    member_id TEXT NOT NULL,
+    admin_id TEXT,
+    completed INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_member ON tasks (member_id, completed, created_at, id);
+CREATE INDEX IF NOT EXISTS tasks_member_order ON tasks (member_id, created_at, id);
+CREATE INDEX IF NOT EXISTS tasks_admin ON tasks (admin_id, created_at, id);
+CREATE TABLE IF NOT EXISTS task_history (
+    id TEXT PRIMARY KEY,
+    member_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS task_history_member ON task_history (member_id, created_at, id);
+CREATE TABLE IF NOT EXISTS admin_stats (
+    admin_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS users (
+    uid TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+# Klasse: Medlemmer lagret i tabellen members.
+class SQLiteMembers:
+    def __init__(self, store):
+        self._store = store
+
+    def get(self, member_id):
+        with self._store.lock:
+            row = self._store.conn.execute("SELECT data FROM members WHERE id = ?", (member_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_owner(self, member_id):
+        with self._store.lock:
+            row = self._store.conn.execute("SELECT admin_id FROM members WHERE id = ?", (member_id,)).fetchone()
+        return row[0] if row else None
+
+    # Medlemmene sorteres på ID, som i Firestore. after er ID-en til siste medlem på forrige side.
+    def list_by_admin(self, admin_id, limit=None, after=None, fields=None):
+        sql = "SELECT id, data FROM members WHERE admin_id = ?"
+        params = [admin_id]
+        if after is not None:
+            sql += " AND id > ?"
+            params.append(after)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._store.lock:
+            rows = self._store.conn.execute(sql, params).fetchall()
+        return [(member_id, project(json.loads(data), fields)) for member_id, data in rows]
+
+    def create(self, data):
+        member_id = new_id()
+        with self._store.transaction() as conn:
+            conn.execute("INSERT INTO members (id, admin_id, data) VALUES (?, ?, ?)",
+                         (member_id, data.get('adminId'), json.dumps(data)))
+        return member_id
+
+    def create_many(self, datas):
+        rows = [(new_id(), data.get('adminId'), json.dumps(data)) for data in datas]
+        with self._store.transaction() as conn:
+            conn.executemany("INSERT INTO members (id, admin_id, data) VALUES (?, ?, ?)", rows)
+        return [row[0] for row in rows]
+
+    # Lagrer medlemmer med gitte ID-er. items er (medlem-ID, data)-par. Et medlem som finnes fra før
+    # flettes med dataene, så felt som ikke er med (f.eks. stats og history) beholdes.
+    def put_many(self, items):
+        with self._store.transaction() as conn:
+            for member_id, data in items:
+                row = conn.execute("SELECT data FROM members WHERE id = ?", (member_id,)).fetchone()
+                merged = merge_document(json.loads(row[0]), data) if row else data
+                conn.execute("INSERT OR REPLACE INTO members (id, admin_id, data) VALUES (?, ?, ?)",
+                             (member_id, merged.get('adminId'), json.dumps(merged)))
+        return [member_id for member_id, _ in items]
+
+    def update(self, member_id, fields):
+        with self._store.transaction() as conn:
+            row = conn.execute("SELECT data FROM members WHERE id = ?", (member_id,)).fetchone()
+            if not row:
+                return False
+            data = apply_update(json.loads(row[0]), fields)
+            conn.execute("UPDATE members SET admin_id = ?, data = ? WHERE id = ?",
+                         (data.get('adminId'), json.dumps(data), member_id))
+            return True
+
+    def delete(self, member_id):
+        with self._store.transaction() as conn:
+            conn.execute("DELETE FROM members WHERE id = ?", (member_id,))
+
+    def iter_all(self):
+        with self._store.lock:
+            rows = self._store.conn.execute("SELECT id, data FROM members ORDER BY id").fetchall()
+        return [(member_id, json.loads(data)) for member_id, data in rows]
+
+    # Trekker prisen fra saldoen og legger til gjenstanden i én transaksjon. Returnerer (ny saldo, kosmetikk).
+    def purchase(self, member_id, admin_id, item_id, price):
+        return self._store.run(lambda conn: self._purchase(conn, member_id, admin_id, item_id, price))
+
+    def _purchase(self, conn, member_id, admin_id, item_id, price):
+        member = _load_member(conn, member_id, admin_id)
+        if member.get('money', 0) < price:
+            raise InsufficientFunds(member_id)
+
+        member['money'] = member.get('money', 0) - price
+        member['cosmetics'] = list(set(member.get('cosmetics', []) + [item_id]))
+        deltas = {"purchases": 1, "spent": price}
+        add_stats(member.setdefault('stats', {}), deltas)
+        conn.execute("UPDATE members SET data = ? WHERE id = ?", (json.dumps(member), member_id))
+        _bump_admin_stats(conn, admin_id, deltas)
+        return member['money'], member['cosmetics']
+
+# Funksjon: Leser et medlem inne i en transaksjon og sjekker eierskap.
+def _load_member(conn, member_id, admin_id):
+    row = conn.execute("SELECT data FROM members WHERE id = ?", (member_id,)).fetchone()
+    if not row:
+        raise MemberNotFound(member_id)
+    member = json.loads(row[0])
+    if admin_id is not None and member.get('adminId') != admin_id:
+        raise AccessDenied(member_id)
+    return member
+
+# Funksjon: Oppdaterer tellerne til admin inne i en transaksjon.
+def _bump_admin_stats(conn, admin_id, deltas):
+    if admin_id is None:
+        return
+    row = conn.execute("SELECT data FROM admin_stats WHERE admin_id = ?", (admin_id,)).fetchone()
+    stats = add_stats(json.loads(row[0]) if row else empty_stats(), deltas)
+    conn.execute("INSERT OR REPLACE INTO admin_stats (admin_id, data) VALUES (?, ?)", (admin_id, json.dumps(stats)))
+
+# Klasse: Oppgaver som egne rader, indeksert på medlem og fullføringsstatus.
+class SQLiteTasks:
+    def __init__(self, store):
+        self._store = store
+
+    def list(self, member_id, completed=None, limit=None, after=None):
+        sql = "SELECT data FROM tasks WHERE member_id = ?"
+        params = [member_id]
+        if completed is not None:
+            sql += " AND completed = ?"
+            params.append(int(completed))
+        if after is not None:
+            sql += " AND (created_at, id) > (?, ?)"
+            params.extend(after)
+        sql += " ORDER BY created_at, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._store.lock:
+            rows = self._store.conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def list_by_admin(self, admin_id):
+        with self._store.lock:
+            rows = self._store.conn.execute(
+                "SELECT member_id, data FROM tasks WHERE admin_id = ? ORDER BY created_at, id", (admin_id,)).fetchall()
+        result = {}
+        for member_id, data in rows:
+            result.setdefault(member_id, []).append(json.loads(data))
+        return result
+
+    def list_by_members(self, member_ids):
+        member_ids = list(member_ids)
+        if not member_ids:
+            return {}
+        placeholders = ", ".join("?" * len(member_ids))
+        with self._store.lock:
+            rows = self._store.conn.execute(
+                f"SELECT member_id, data FROM tasks WHERE member_id IN ({placeholders}) ORDER BY created_at, id",
+                member_ids).fetchall()
+        result = {}
+        for member_id, data in rows:
+            result.setdefault(member_id, []).append(json.loads(data))
+        return result
+
+    def get(self, task_id):
+        with self._store.lock:
+            row = self._store.conn.execute("SELECT data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def add(self, member_id, admin_id, task):
+        return self.add_many(member_id, admin_id, [task])[0]
+
+    def add_many(self, member_id, admin_id, tasks):
+        now = time.time()
+        return self.insert([task_record(member_id, admin_id, task, now) for task in tasks])
+
+    # Lagrer ferdige oppgaveposter, som kan tilhøre flere medlemmer. Tellerne oppdateres i samme transaksjon.
+    # Kaster MemberNotFound og ruller tilbake hvis et av medlemmene ikke finnes.
+    # Med count_stats=False endres ikke tellerne, f.eks. for data som allerede er talt (migrate_tasks.py).
+    def insert(self, records, count_stats=True):
+        with self._store.transaction() as conn:
+            self._insert(conn, records, count_stats)
+        return records
+
+    # Som insert, men oppgaver med ID-er som finnes fra før hoppes over. Returnerer postene som ble skrevet.
+    def insert_missing(self, records):
+        with self._store.transaction() as conn:
+            exists = lambda task_id: conn.execute("SELECT 1 FROM tasks WHERE id = ?", (task_id,)).fetchone() is not None
+            records = new_records(records, exists)
+            self._insert(conn, records)
+        return records
+
+    # Som insert, men oppgavene til medlemmer som ikke finnes hoppes over. Returnerer ID-ene til disse medlemmene.
+    def insert_skip_missing(self, records):
+        member_ids = list({record['memberId'] for record in records})
+        with self._store.transaction() as conn:
+            found = set()
+            for start in range(0, len(member_ids), 500): # SQLite tillater et begrenset antall parametre.
+                chunk = member_ids[start:start + 500]
+                found.update(row[0] for row in conn.execute(
+                    f"SELECT id FROM members WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+            self._insert(conn, [record for record in records if record['memberId'] in found])
+        return set(member_ids) - found
+
+    def _insert(self, conn, records, count_stats=True):
+        conn.executemany(
+            "INSERT OR REPLACE INTO tasks (id, member_id, admin_id, completed, created_at, data) VALUES (?, ?, ?, ?, ?, ?)",
+            [_task_row(record) for record in records])
+        for (member_id, admin_id), deltas in added_task_stats(records).items():
+            member = _load_member(conn, member_id, None)
+            if count_stats:
+                add_stats(member.setdefault('stats', {}), deltas)
+                conn.execute("UPDATE members SET data = ? WHERE id = ?", (json.dumps(member), member_id))
+                _bump_admin_stats(conn, admin_id, deltas)
+
+    # Fullfører oppgaven og øker saldoen i én transaksjon. Returnerer (oppgave, tillegg, ny saldo).
+    def complete(self, member_id, task_id, admin_id=None):
+        return self._store.run(lambda conn: self._complete(conn, member_id, task_id, admin_id))
+
+    def _complete(self, conn, member_id, task_id, admin_id):
+        member = _load_member(conn, member_id, admin_id)
+        row = conn.execute("SELECT data FROM tasks WHERE id = ? AND member_id = ?", (task_id, member_id)).fetchone()
+        if not row:
+            raise TaskNotFound(task_id)
+        record = json.loads(row[0])
+        if record.get('completed'):
+            return record, 0, member.get('money', 0)
+
+        record['completed'] = True
+        record['completedAt'] = time.time()
+        member['money'] = member.get('money', 0) + record['price']
+        deltas = {"tasksCompleted": 1, "earned": record['price']}
+        add_stats(member.setdefault('stats', {}), deltas)
+        conn.execute("UPDATE tasks SET completed = 1, data = ? WHERE id = ?", (json.dumps(record), task_id))
+        conn.execute("UPDATE members SET data = ? WHERE id = ?", (json.dumps(member), member_id))
+        _bump_admin_stats(conn, member.get('adminId'), deltas)
+        return record, record['price'], member['money']
+
+    # Fullfører flere oppgaver i én transaksjon. items er (medlem-ID, oppgave-ID)-par.
+    # Returnerer ett resultat per par: (oppgave, tillegg, ny saldo) eller feilen (StorageError) for paret.
+    def complete_many(self, items, admin_id=None):
+        def complete_all(conn):
+            results = []
+            for member_id, task_id in items:
+                try:
+                    results.append(self._complete(conn, member_id, task_id, admin_id))
+                except StorageError as e:
+                    results.append(e) # Feilen kastes før noe skrives, så de andre oppgavene påvirkes ikke.
+            return results
+        return self._store.run(complete_all)
+
+    # Erstatter medlemmets oppgaver med listen fra frontend. Kun endringene skrives.
+    def replace(self, member_id, admin_id, tasks):
+        now = time.time()
+        with self._store.transaction() as conn:
+            _load_member(conn, member_id, None) # Kaster MemberNotFound hvis medlemmet er slettet.
+            current = {r[0]: json.loads(r[1]) for r in conn.execute(
+                "SELECT id, data FROM tasks WHERE member_id = ?", (member_id,)).fetchall()}
+            kept = {}
+            for task in tasks:
+                record = current.pop(task['id'], None) or kept.get(task['id'])
+                if record is None:
+                    record, changes = client_task_record(member_id, admin_id, task, now), True
+                else:
+                    changes = client_task_changes(record, task)
+                    record.update(changes)
+                kept[task['id']] = record
+                if changes:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO tasks (id, member_id, admin_id, completed, created_at, data) VALUES (?, ?, ?, ?, ?, ?)",
+                        _task_row(record))
+            conn.executemany("DELETE FROM tasks WHERE id = ?", [(task_id,) for task_id in current])
+            return [public_task(record) for record in kept.values()]
+
+    # Flytter fullførte oppgaver eldre enn completed_before til historikken og oppdaterer
+    # summene på medlemmet i én transaksjon. Returnerer de arkiverte oppgavene (maks limit).
+    def archive(self, member_id, completed_before, limit=ARCHIVE_BATCH):
+        return self._store.run(lambda conn: self._archive(conn, member_id, completed_before, limit))
+
+    def _archive(self, conn, member_id, completed_before, limit):
+        member = _load_member(conn, member_id, None)
+        rows = conn.execute("SELECT data FROM tasks WHERE member_id = ? AND completed = 1 ORDER BY created_at, id",
+                            (member_id,)).fetchall()
+        records = [record for record in (json.loads(row[0]) for row in rows) if archivable(record, completed_before)][:limit]
+        if not records:
+            return []
+
+        conn.executemany("INSERT OR REPLACE INTO task_history (id, member_id, created_at, data) VALUES (?, ?, ?, ?)",
+                         [(r['id'], member_id, r['createdAt'], json.dumps(r)) for r in records])
+        conn.executemany("DELETE FROM tasks WHERE id = ?", [(r['id'],) for r in records])
+        add_history_totals(member, records)
+        conn.execute("UPDATE members SET data = ? WHERE id = ?", (json.dumps(member), member_id))
+        return records
+
+    def delete_for_member(self, member_id):
+        with self._store.transaction() as conn:
+            conn.execute("DELETE FROM tasks WHERE member_id = ?", (member_id,))
+
+# Klasse: Arkiverte oppgaver i tabellen task_history. Rader legges bare til, og endres aldri.
+class SQLiteHistory:
+    def __init__(self, store):
+        self._store = store
+
+    def list(self, member_id, limit=None, after=None):
+        sql = "SELECT data FROM task_history WHERE member_id = ?"
+        params = [member_id]
+        if after is not None:
+            sql += " AND (created_at, id) > (?, ?)"
+            params.extend(after)
+        sql += " ORDER BY created_at, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._store.lock:
+            rows = self._store.conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def delete_for_member(self, member_id):
+        with self._store.transaction() as conn:
+            conn.execute("DELETE FROM task_history WHERE member_id = ?", (member_id,))
+
+# Klasse: Tellere per admin i tabellen admin_stats (se STAT_FIELDS i storage/base.py).
+class SQLiteStats:
+    def __init__(self, store):
+        self._store = store
+
+    def get(self, admin_id):
+        with self._store.lock:
+            row = self._store.conn.execute("SELECT data FROM admin_stats WHERE admin_id = ?", (admin_id,)).fetchone()
+        return json.loads(row[0]) if row else empty_stats()
+
+    # Overskriver tellerne, brukes ved etterfylling.
+    def set(self, admin_id, stats):
+        with self._store.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO admin_stats (admin_id, data) VALUES (?, ?)", (admin_id, json.dumps(stats)))
+
+# Funksjon: Gjør om en oppgavepost til en rad i tabellen tasks.
+def _task_row(record):
+    return (record['id'], record['memberId'], record.get('adminId'), int(bool(record.get('completed'))),
+            record['createdAt'], json.dumps(record))
+
+# Klasse: Brukerprofiler lagret i tabellen users.
+class SQLiteUsers:
+    def __init__(self, store):
+        self._store = store
+
+    def get(self, uid):
+        with self._store.lock:
+            row = self._store.conn.execute("SELECT data FROM users WHERE uid = ?", (uid,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def create(self, uid, data):
+        with self._store.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO users (uid, data) VALUES (?, ?)", (uid, json.dumps(data)))
+
+    def iter_all(self):
+        with self._store.lock:
+            rows = self._store.conn.execute("SELECT uid, data FROM users ORDER BY uid").fetchall()
+        return [(uid, json.loads(data)) for uid, data in rows]
+
+    def update(self, uid, fields):
+        with self._store.transaction() as conn:
+            row = conn.execute("SELECT data FROM users WHERE uid = ?", (uid,)).fetchone()
+            if not row:
+                return False
+            data = apply_update(json.loads(row[0]), fields)
+            conn.execute("UPDATE users SET data = ? WHERE uid = ?", (json.dumps(data), uid))
+            return True
+
+# Funksjon: Sant når SQLite-feilen skyldes at databasen er låst av en annen skriver.
+def _is_locked(error):
+    return isinstance(error, sqlite3.OperationalError) and 'locked' in str(error)
+
+# Klasse: Samler repositoriene og eier databasetilkoblingen.
+class SQLiteStore:
+    name = 'sqlite'
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=1.0)
+        if path != ':memory:':
+            self.conn.execute("PRAGMA journal_mode=WAL") # Lesere blokkerer ikke skrivere.
+        self.conn.executescript(SCHEMA)
+        self.members = SQLiteMembers(self)
+        self.tasks = SQLiteTasks(self)
+        self.history = SQLiteHistory(self)
+        self.stats = SQLiteStats(self)
+        self.users = SQLiteUsers(self)
+
+    # Kjører en blokk som én transaksjon. Ruller tilbake hvis noe feiler.
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            else:
+                self.conn.execute("COMMIT")
+
+    # Kjører fn(conn) i en transaksjon, med nye forsøk hvis en annen prosess holder skrivelåsen.
+    def run(self, fn):
+        def attempt():
+            with self.transaction() as conn:
+                return fn(conn)
+        return run_with_retry(attempt, _is_locked)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,6 @@
+# wsgi.py - Inngangspunkt for produksjon.
+# Start med: gunicorn -c gunicorn.conf.py wsgi:app (fra src-mappa).
+
+from app import create_app
+
+app = create_app()
@@ -0,0 +1,66 @@
+# conftest.py - Felles oppsett for testene av rutene.
+# Appen kjøres mot minnelagringen, og Firebase-verifiseringen byttes ut: tokenet "test-<uid>" gir brukeren <uid>.
+# Cachene og indeksene i modulene får nye, tomme lagre før hver test.
+
+import os
+import pytest
+
+os.environ.setdefault('STORAGE_BACKEND', 'memory')
+os.environ.setdefault('SECRET_KEY', 'test-secret-key') # Uten den lages ingen admin-tokens.
+
+def fake_verify(token):
+    if not token.startswith('test-'):
+        raise ValueError("Ugyldig token")
+    return {"uid": token[len('test-'):]}
+
+# Funksjon: Headere med token for brukeren, pluss eventuelle ekstra headere.
+def auth_headers(uid, **extra):
+    headers = {"Authorization": f"Bearer test-{uid}"}
+    headers.update({key.replace('_', '-'): value for key, value in extra.items()})
+    return headers
+
+# Funksjon: Oppretter et medlem gjennom /create-member og returnerer ID-en.
+def create_member(client, uid='admin-1', name='Ola'):
+    response = client.post('/create-member', json={"name": name, "code": "1234", "color": "blue"},
+                           headers=auth_headers(uid))
+    assert response.status_code == 201
+    return response.get_json()["member_id"]
+
+@pytest.fixture
+def memory_store():
+    from storage.memory_store import MemoryStore
+    return MemoryStore()
+
+@pytest.fixture
+def app(monkeypatch, memory_store):
+    import storage
+    import auth, admin, purchase
+    from cache import LocalCache, LRUCache
+    from member_cache import member_cache
+    from profile_cache import profile_cache
+    from ownership import ownership
+    from idempotency import idempotency_store
+    from elevation import pin_attempts
+    from changes import change_hub
+    from app import create_app
+
+    storage.set_store(memory_store)
+    for module in (auth, admin, purchase):
+        monkeypatch.setattr(module, 'verify_firebase_token', fake_verify)
+
+    monkeypatch.setattr(member_cache, 'backend', LocalCache(maxsize=1024, ttl=30))
+    monkeypatch.setattr(profile_cache, 'backend', LocalCache(maxsize=1024, ttl=30))
+    monkeypatch.setattr(ownership, '_owners', LocalCache(maxsize=1024, ttl=300))
+    monkeypatch.setattr(idempotency_store, 'backend', LocalCache(maxsize=1024, ttl=300))
+    monkeypatch.setattr(idempotency_store, '_in_flight', {})
+    monkeypatch.setattr(pin_attempts, '_failures', LRUCache(maxsize=1024))
+    monkeypatch.setattr(change_hub, '_subscribers', {})
+
+    flask_app = create_app()
+    flask_app.config['TESTING'] = True
+    yield flask_app
+    storage.set_store(None)
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,89 @@
+# test_asgi.py - Tester ASGI-inngangspunktet (asgi.py).
+
+import asyncio
+import time
+import asgi
+from asgi import ThreadedWsgiToAsgi
+from conftest import create_member, fake_verify
+from member_cache import member_cache
+from metrics import metrics
+
+def http_scope(path):
+    return {"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": [],
+            "root_path": "", "scheme": "http", "server": ("test", 80), "http_version": "1.1"}
+
+async def call(app, scope):
+    sent = []
+    async def receive():
+        return {"type": "http.request", "body": b""}
+    async def send(message):
+        sent.append(message)
+    await app(scope, receive, send)
+    return sent
+
+def test_flask_requests_run_in_parallel():
+    def slow_app(environ, start_response):
+        time.sleep(0.2)
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [b"ok"]
+
+    async def main():
+        app = ThreadedWsgiToAsgi(slow_app)
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(call(app, http_scope('/')) for _ in range(4)))
+        return time.perf_counter() - start, responses
+
+    elapsed, responses = asyncio.run(main())
+    assert all(sent[0]["status"] == 200 for sent in responses)
+    assert elapsed < 0.6 # Én om gangen ville tatt minst 0.8 sekunder.
+
+def test_flask_response_is_sent_and_closed():
+    closed = []
+
+    class Body:
+        def __iter__(self):
+            return iter([b"hei ", b"verden", b" og mer"])
+
+        def close(self):
+            closed.append(True)
+
+    def app(environ, start_response):
+        start_response("201 Created", [("Content-Type", "text/plain"), ("Content-Length", "10")])
+        return Body()
+
+    sent = asyncio.run(call(ThreadedWsgiToAsgi(app), http_scope('/')))
+    assert sent[0]["status"] == 201
+    assert b"".join(message.get("body", b"") for message in sent[1:]) == b"hei verden"
+    assert sent[-1] == {"type": "http.response.body"}
+    assert closed == [True]
+
+def get(path, uid, **headers):
+    raw = [(b'authorization', f'Bearer test-{uid}'.encode())]
+    raw += [(name.replace('_', '-').encode(), value.encode()) for name, value in headers.items()]
+    sent = asyncio.run(call(asgi.application, dict(http_scope(path), headers=raw)))
+    start, body = sent[0], sent[1]
+    return start["status"], dict(start["headers"]), body["body"]
+
+def test_native_member_route_checks_owner_before_caching(app, client, monkeypatch):
+    monkeypatch.setattr(asgi, 'verify_firebase_token', fake_verify)
+    member_id = create_member(client)
+
+    status, _, _ = get(f'/member/{member_id}', 'admin-2')
+    assert status == 403
+    assert member_cache.backend.get(member_cache.member_key(member_id)) is None
+
+    status, headers, body = get(f'/member/{member_id}', 'admin-1')
+    assert status == 200 and b'"Ola"' in body
+    assert member_cache.backend.get(member_cache.member_key(member_id)) is not None
+
+def test_native_routes_get_request_id_and_metrics(app, monkeypatch):
+    monkeypatch.setattr(asgi, 'verify_firebase_token', fake_verify)
+
+    status, headers, _ = get('/members', 'admin-1', x_request_id='abc123')
+    assert status == 200
+    assert headers[b'x-request-id'] == b'abc123'
+    assert headers[b'server-timing'].startswith(b'total;dur=')
+    assert ('admin', '/members', 'GET') in metrics.routes
+
+    status, headers, _ = get('/member/finnes-ikke', 'admin-1')
+    assert status == 404 and len(headers[b'x-request-id']) == 32
@@ -0,0 +1,109 @@
+# test_auth.py - Tester tokencachen og nøkkelcachen i auth.py.
+
+import json
+import time
+from types import SimpleNamespace
+import pytest
+import auth
+from cache import LRUCache
+
+@pytest.fixture
+def verified(monkeypatch):
+    calls = []
+
+    def verify(token):
+        calls.append(token)
+        if token == 'ugyldig':
+            raise ValueError("Feil signatur")
+        return {"uid": token, "exp": time.time() + (-1 if token == 'utløpt' else 3600)}
+
+    monkeypatch.setattr(auth, '_token_cache', LRUCache(maxsize=16))
+    monkeypatch.setattr(auth, '_verify_uncached', verify)
+    return calls
+
+def test_verified_token_is_cached(verified):
+    first = auth.verify_firebase_token('admin-1')
+    first['uid'] = 'endret' # Kalleren får en kopi, ikke det som ligger i cachen.
+    assert auth.verify_firebase_token('admin-1')['uid'] == 'admin-1'
+    assert verified == ['admin-1']
+    assert auth.token_cache_stats()['hits'] == 1
+
+def test_expired_and_invalid_tokens_are_verified_again(verified):
+    auth.verify_firebase_token('utløpt')
+    auth.verify_firebase_token('utløpt')
+    assert verified == ['utløpt', 'utløpt']
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            auth.verify_firebase_token('ugyldig')
+    assert verified.count('ugyldig') == 2
+
+class FakeRequest:
+    def __init__(self):
+        self.keys = {"kid-1": "cert-1"}
+        self.calls = 0
+
+    def __call__(self, url, method='GET'):
+        self.calls += 1
+        return SimpleNamespace(status=200, data=json.dumps(self.keys).encode('utf-8'),
+                               headers={'cache-control': 'public, max-age=3600'})
+
+@pytest.fixture
+def keys(monkeypatch):
+    cache = auth.PublicKeyCache()
+    cache._request = FakeRequest()
+    monkeypatch.setattr(cache, '_start_refresher', lambda: None) # Ingen bakgrunnstråd i testene.
+    monkeypatch.setattr(auth, '_public_keys', cache)
+    return cache
+
+def test_public_keys_are_fetched_once(keys):
+    assert keys.get_keys() == {"kid-1": "cert-1"}
+    assert keys.get_keys() == {"kid-1": "cert-1"}
+    assert keys.fetches == 1
+    assert 3500 < keys._expires_at - time.time() <= 3600
+
+    keys._expires_at = time.time() - 1
+    keys.get_keys()
+    assert keys.fetches == 2
+
+def test_unknown_kid_refreshes_keys(keys, monkeypatch):
+    decoded = []
+    monkeypatch.setattr(auth.jwt, 'decode_header', lambda token: {"alg": "RS256", "kid": "kid-2"})
+
+    def decode(token, certs, audience):
+        decoded.append(dict(certs))
+        return {"iss": auth.ISSUER_PREFIX + audience, "sub": "admin-1"}
+    monkeypatch.setattr(auth.jwt, 'decode', decode)
+
+    keys.get_keys()
+    keys._request.keys = {"kid-2": "cert-2"} # Google har rotert nøklene.
+    claims = auth._verify_locally('token', 'prosjekt')
+    assert claims['uid'] == 'admin-1'
+    assert keys.fetches == 2
+    assert decoded == [{"kid-2": "cert-2"}]
+
+def test_wrong_issuer_is_rejected(keys, monkeypatch):
+    monkeypatch.setattr(auth.jwt, 'decode_header', lambda token: {"alg": "RS256", "kid": "kid-1"})
+    monkeypatch.setattr(auth.jwt, 'decode', lambda token, certs, audience: {"iss": "https://annen", "sub": "admin-1"})
+    with pytest.raises(ValueError):
+        auth._verify_locally('token', 'prosjekt')
+    assert keys.fetches == 1
+
+def test_unknown_kid_refresh_is_rate_limited(keys, monkeypatch):
+    monkeypatch.setattr(auth.jwt, 'decode_header', lambda token: {"alg": "RS256", "kid": token})
+    monkeypatch.setattr(auth.jwt, 'decode', lambda token, certs, audience: {"iss": auth.ISSUER_PREFIX + audience,
+                                                                            "sub": "admin-1"})
+    keys.get_keys()
+    for kid in ("falsk-1", "falsk-2", "falsk-3"):
+        with pytest.raises(ValueError):
+            auth._verify_locally(kid, 'prosjekt')
+    assert keys.fetches == 2 # Første henting, pluss én for den første ukjente kid-en.
+
+    # En gyldig kid fungerer fortsatt uten ny henting.
+    assert auth._verify_locally('kid-1', 'prosjekt')['uid'] == 'admin-1'
+    assert keys.fetches == 2
+
+    keys._unknown_kid_at -= keys.unknown_kid_interval
+    with pytest.raises(ValueError):
+        auth._verify_locally('falsk-4', 'prosjekt')
+    assert keys.fetches == 3
@@ -0,0 +1,20 @@
+# test_bench.py - Røyktest av lasttesten (bench.py) mot minnelagringen.
+
+import json
+import bench
+
+def test_short_run_against_memory_store(app, memory_store, tmp_path, monkeypatch):
+    monkeypatch.setenv('STORAGE_BACKEND', 'memory') # bench.main() setter miljøvariabler, de nullstilles etterpå.
+    monkeypatch.setenv('LOG_LEVEL', 'WARNING')
+    baseline = tmp_path / 'baseline.json'
+    code = bench.main(['--duration', '0.5', '--warmup', '0', '--concurrency', '2', '--admins', '2',
+                       '--members', '2', '--tasks', '5', '--save-baseline', str(baseline)])
+    assert code == 0
+
+    report = json.loads(baseline.read_text(encoding='utf-8'))
+    assert report["total"]["requests"] > 0
+    assert all(row["errors"] == 0 for route, row in report.items() if route != "total")
+    assert len(memory_store.members.list_by_admin('admin-0')) == 2
+
+    # Samme kjøring sammenlignet med seg selv gir ingen regresjon.
+    assert bench.compare(report, report, 0.2) == []
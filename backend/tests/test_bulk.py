@@ -0,0 +1,59 @@
+# test_bulk.py - Tester import og eksport (bulk.py) gjennom rutene.
+
+import json
+from conftest import auth_headers
+from bulk import Importer
+
+def ndjson(*records):
+    return "".join(json.dumps(record) + "\n" for record in records)
+
+MIXED = ndjson(
+    {"type": "member", "ref": "ola", "name": "Ola", "code": "1234", "color": "blue"},
+    {"type": "member", "ref": "kari", "name": "Kari", "code": "4321", "color": "red"},
+    {"type": "task", "member": "ola", "ref": "rydde", "title": "Rydde", "price": 5},
+    {"type": "task", "member": "kari", "ref": "handle", "title": "Handle", "price": 3, "completed": True},
+    {"type": "task", "member": "finnes-ikke", "title": "Støvsuge", "price": 2},
+)
+
+def test_mixed_import(client, memory_store):
+    response = client.post('/import', data=MIXED, headers=auth_headers('admin-1'))
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report["imported"] == {"household": 0, "member": 2, "task": 2}
+    assert report["errors"] == [{"line": 5, "error": "Medlem ikke funnet!"}]
+    assert report["line"] == 5
+
+    members = dict(memory_store.members.list_by_admin('admin-1'))
+    assert sorted(data['name'] for data in members.values()) == ["Kari", "Ola"]
+    titles = sorted(t['title'] for tasks in memory_store.tasks.list_by_admin('admin-1').values() for t in tasks)
+    assert titles == ["Handle", "Rydde"]
+
+    # Importen vises i /members med en gang, selv om listen var lest inn i cachen før.
+    listed = client.get('/members', headers=auth_headers('admin-1')).get_json()
+    assert len(listed) == 2
+
+def test_tasks_for_failed_member_chunk_are_rejected(memory_store, monkeypatch):
+    def fail(items):
+        raise RuntimeError("lagringen er nede")
+    monkeypatch.setattr(memory_store.members, 'put_many', fail)
+
+    importer = Importer(memory_store, admin_id='admin-1').run(
+        (line_no, json.loads(line), None) for line_no, line in enumerate(MIXED.splitlines(), 1))
+    report = importer.report()
+    assert report["failedChunks"] == 1
+    assert report["imported"]["task"] == 0
+    assert [error["line"] for error in report["errors"]] == [1, 3, 4, 5]
+
+def test_reimport_keeps_counters(client, memory_store):
+    client.post('/import', data=MIXED, headers=auth_headers('admin-1'))
+    stats = client.get('/stats', headers=auth_headers('admin-1')).get_json()["stats"]
+
+    response = client.post('/import', data=MIXED, headers=auth_headers('admin-1'))
+    assert response.get_json()["skipped"] == 2
+    assert client.get('/stats', headers=auth_headers('admin-1')).get_json()["stats"] == stats
+    assert stats["tasksAdded"] == 2 and stats["tasksCompleted"] == 1 and stats["earned"] == 3
+
+    tasks = memory_store.tasks.list_by_admin('admin-1')
+    assert sum(len(member_tasks) for member_tasks in tasks.values()) == 2
+    for member_id, data in memory_store.members.list_by_admin('admin-1'):
+        assert data['stats']['tasksAdded'] == 1
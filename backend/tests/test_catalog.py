@@ -0,0 +1,82 @@
+# test_catalog.py - Tester varekatalogen (catalog.py): innlasting, ny fil, ugyldig fil og /catalog.
+
+import json
+import os
+import pytest
+import catalog as catalog_module
+import purchase
+from conftest import auth_headers
+from catalog import CatalogIndex
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def write_catalog(path, version, items, mtime):
+    path.write_text(json.dumps({"version": version, "items": items}), encoding='utf-8')
+    os.utime(path, ns=(mtime, mtime)) # Filsystemet kan ha grov oppløsning på mtime.
+
+@pytest.fixture
+def catalog_file(tmp_path):
+    path = tmp_path / 'catalog.json'
+    write_catalog(path, 1, [{"id": "1", "name": "Hatt", "price": 3}], 1_000_000_000)
+    return path
+
+def test_reloads_changed_file_after_interval(catalog_file):
+    clock = Clock()
+    index = CatalogIndex(str(catalog_file), check_interval=5, clock=clock)
+    assert index.get("1")["price"] == 3
+
+    write_catalog(catalog_file, 2, [{"id": "1", "name": "Hatt", "price": 4}], 2_000_000_000)
+    assert index.get("1")["price"] == 3 # Filen sjekkes ikke før intervallet er over.
+
+    clock.now = 6
+    assert index.get("1")["price"] == 4
+    assert index.stats() == {"version": 2, "items": 1, "reloads": 2, "reload_errors": 0}
+
+def test_invalid_file_keeps_previous_catalog(catalog_file):
+    clock = Clock()
+    index = CatalogIndex(str(catalog_file), check_interval=5, clock=clock)
+    index.get("1")
+
+    catalog_file.write_text("{ikke json", encoding='utf-8')
+    os.utime(catalog_file, ns=(2_000_000_000, 2_000_000_000))
+    clock.now = 6
+    assert index.get("1")["price"] == 3
+
+    write_catalog(catalog_file, 3, [{"id": "1", "price": -1}], 3_000_000_000) # Ugyldig pris.
+    clock.now = 12
+    assert index.get("1")["price"] == 3
+    assert index.stats()["reload_errors"] == 2
+    assert index.stats()["version"] == 1
+
+def test_invalid_file_at_startup_raises(tmp_path):
+    path = tmp_path / 'catalog.json'
+    path.write_text('{"items": [{"id": "1", "price": 3}, {"id": "1", "price": 4}]}', encoding='utf-8')
+    with pytest.raises(ValueError):
+        CatalogIndex(str(path)).current()
+
+def test_routes_use_reloaded_catalog(app, client, catalog_file, memory_store, monkeypatch):
+    clock = Clock()
+    index = CatalogIndex(str(catalog_file), check_interval=5, clock=clock)
+    monkeypatch.setattr(catalog_module, 'catalog', index)
+    monkeypatch.setattr(purchase, 'catalog', index)
+
+    first = client.get('/catalog')
+    assert first.get_json()["version"] == 1
+    assert client.get('/catalog', headers={"If-None-Match": first.headers['ETag']}).status_code == 304
+
+    write_catalog(catalog_file, 2, [{"id": "1", "name": "Hatt", "price": 3}, {"id": "9", "name": "Krone", "price": 1}],
+                  2_000_000_000)
+    clock.now = 6
+    response = client.get('/catalog', headers={"If-None-Match": first.headers['ETag']})
+    assert response.status_code == 200
+    assert response.get_json()["version"] == 2
+
+    member_id = memory_store.members.create({"name": "Ola", "adminId": "admin-1", "money": 1, "cosmetics": []})
+    response = client.post('/purchase', json={"memberId": member_id, "itemId": "9"}, headers=auth_headers('admin-1'))
+    assert response.status_code == 200
+    assert response.get_json()["new_money"] == 0
@@ -0,0 +1,75 @@
+# test_changes.py - Tester endringsstrømmen (changes.py og GET /changes i asgi.py).
+
+import asyncio
+import threading
+import asgi
+from changes import ChangeHub, Subscription, RESYNC, change_hub
+from conftest import fake_verify
+
+def test_push_on_full_queue_from_many_threads():
+    subscription = Subscription('admin-1', maxsize=4)
+
+    def push_many():
+        for i in range(2000):
+            subscription.push({"type": "member.deleted", "id": str(i)})
+
+    threads = [threading.Thread(target=push_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert subscription.overflows > 0
+    events = []
+    while (event := subscription.get_nowait()) is not None:
+        events.append(event)
+    assert 0 < len(events) <= 4
+    assert RESYNC in events
+
+def test_subscribe_limits():
+    hub = ChangeHub(max_clients=2)
+    assert hub.subscribe('admin-1') and hub.subscribe('admin-1')
+    assert hub.subscribe('admin-1') is None
+    assert hub.subscribe('admin-2', max_total=2) is None
+    assert hub.subscribe('admin-2', max_total=3) is not None
+
+def test_native_changes_stream(app, monkeypatch):
+    monkeypatch.setattr(asgi, 'verify_firebase_token', fake_verify)
+
+    async def main():
+        sent = []
+        chunks = asyncio.Queue()
+        disconnect = asyncio.Event()
+        messages = [{"type": "http.request", "body": b""}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            if message["type"] == "http.response.body":
+                chunks.put_nowait(message["body"].decode())
+
+        async def next_chunk():
+            return await asyncio.wait_for(chunks.get(), 2)
+
+        scope = dict(type="http", method="GET", path="/changes", query_string=b"",
+                     headers=[(b'authorization', b'Bearer test-admin-1')])
+        stream = asyncio.ensure_future(asgi.application(scope, receive, send))
+        assert "event: ready" in await next_chunk()
+        assert change_hub.stats()["clients"] == 1
+
+        # Hendelsen kommer fra en annen tråd, slik den gjør fra Flask-rutene.
+        await asyncio.to_thread(change_hub.member_deleted, 'admin-1', 'm1')
+        assert "event: member.deleted" in await next_chunk()
+
+        disconnect.set()
+        await asyncio.wait_for(stream, 2)
+        return sent
+
+    sent = asyncio.run(main())
+    assert sent[0]["status"] == 200
+    assert dict(sent[0]["headers"])[b'content-type'].startswith(b'text/event-stream')
+    assert change_hub.stats()["clients"] == 0
@@ -0,0 +1,40 @@
+# test_conditional_get.py - Tester ETag og If-None-Match på /members og /member/<id>.
+
+from conftest import auth_headers, create_member
+
+def test_member_returns_304_until_changed(client):
+    member_id = create_member(client)
+    first = client.get(f'/member/{member_id}', headers=auth_headers('admin-1'))
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert 'private' in first.headers['Cache-Control'] and 'no-cache' in first.headers['Cache-Control']
+
+    response = client.get(f'/member/{member_id}', headers=auth_headers('admin-1', If_None_Match=etag))
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert response.headers['ETag'] == etag
+
+    client.post(f'/add-task/{member_id}', json={"title": "Rydde", "price": 5}, headers=auth_headers('admin-1'))
+    response = client.get(f'/member/{member_id}', headers=auth_headers('admin-1', If_None_Match=etag))
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert len(response.get_json()["tasks"]) == 1
+
+def test_members_returns_304_until_changed(client):
+    create_member(client)
+    etag = client.get('/members', headers=auth_headers('admin-1')).headers['ETag']
+
+    response = client.get('/members', headers=auth_headers('admin-1', If_None_Match=etag))
+    assert response.status_code == 304
+
+    create_member(client)
+    response = client.get('/members', headers=auth_headers('admin-1', If_None_Match=etag))
+    assert response.status_code == 200
+    assert len(response.get_json()) == 2
+
+def test_etag_does_not_bypass_access_check(client):
+    member_id = create_member(client)
+    etag = client.get(f'/member/{member_id}', headers=auth_headers('admin-1')).headers['ETag']
+
+    response = client.get(f'/member/{member_id}', headers=auth_headers('admin-2', If_None_Match=etag))
+    assert response.status_code == 403
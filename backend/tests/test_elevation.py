@@ -0,0 +1,56 @@
+# test_elevation.py - Tester admin-PIN og sperren for mislykkede forsøk (elevation.py).
+
+from concurrent.futures import ThreadPoolExecutor
+from conftest import auth_headers, create_member
+from elevation import AttemptLimiter, hash_pin
+
+def test_reserve_is_atomic():
+    limiter = AttemptLimiter(max_attempts=5, window=300)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        waits = list(pool.map(lambda _: limiter.reserve('admin-1'), range(50)))
+    assert waits.count(0) == 5
+    assert all(wait > 0 for wait in waits if wait)
+
+def test_lockout_after_max_attempts(client, memory_store):
+    memory_store.users.create('admin-1', {"admin_pin": hash_pin('1234')})
+
+    for _ in range(5):
+        response = client.post('/verify-pin', json={"pin": "0000"}, headers=auth_headers('admin-1'))
+        assert response.status_code == 401
+    # Sperret, selv med riktig PIN.
+    response = client.post('/verify-pin', json={"pin": "1234"}, headers=auth_headers('admin-1'))
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+
+def test_correct_pin_resets_attempts(client, memory_store):
+    memory_store.users.create('admin-1', {"admin_pin": hash_pin('1234')})
+
+    for _ in range(4):
+        client.post('/verify-pin', json={"pin": "0000"}, headers=auth_headers('admin-1'))
+    response = client.post('/verify-pin', json={"pin": "1234"}, headers=auth_headers('admin-1'))
+    assert response.status_code == 200
+    assert response.get_json()["elevationToken"]
+
+    for _ in range(4):
+        response = client.post('/verify-pin', json={"pin": "0000"}, headers=auth_headers('admin-1'))
+        assert response.status_code == 401
+
+def test_default_secret_key_disables_elevation(app, client, memory_store):
+    from itsdangerous import URLSafeTimedSerializer
+    from elevation import DEFAULT_SECRET_KEY
+    app.config['SECRET_KEY'] = DEFAULT_SECRET_KEY
+    memory_store.users.create('admin-1', {"admin_pin": hash_pin('1234')})
+
+    response = client.post('/verify-pin', json={"pin": "1234"}, headers=auth_headers('admin-1'))
+    assert response.status_code == 503
+    assert 'elevationToken' not in response.get_json()
+
+    # Et token signert med standardnøkkelen (som står i koden) godtas ikke.
+    member_id = create_member(client)
+    client.post(f'/add-task/{member_id}', json={"title": "Rydde", "price": 5}, headers=auth_headers('admin-1'))
+    task_id = memory_store.tasks.list(member_id)[0]['id']
+    forged = URLSafeTimedSerializer(DEFAULT_SECRET_KEY, salt='admin-elevation').dumps({"uid": "admin-1"})
+    response = client.post(f'/complete-task/{member_id}/{task_id}',
+                           headers=auth_headers('admin-1', X_Admin_Elevation=forged))
+    assert response.status_code == 403
+    assert memory_store.members.get(member_id)['money'] == 0
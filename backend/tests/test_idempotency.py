@@ -0,0 +1,84 @@
+# test_idempotency.py - Tester Idempotency-Key (idempotency.py).
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from conftest import auth_headers, create_member
+from cache import LocalCache
+from elevation import issue_token
+from idempotency import IdempotencyStore
+
+def test_replay_returns_stored_response(client, memory_store):
+    member_id = create_member(client)
+    headers = auth_headers('admin-1', Idempotency_Key='k1')
+    body = {"title": "Rydde", "price": 5}
+
+    first = client.post(f'/add-task/{member_id}', json=body, headers=headers)
+    second = client.post(f'/add-task/{member_id}', json=body, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert 'Idempotent-Replayed' not in first.headers
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert second.get_data() == first.get_data()
+    assert len(memory_store.tasks.list(member_id)) == 1
+
+def test_same_key_with_other_request_is_422(client):
+    member_id = create_member(client)
+    other_id = create_member(client)
+    headers = auth_headers('admin-1', Idempotency_Key='k1')
+
+    assert client.post(f'/add-task/{member_id}', json={"title": "Rydde", "price": 5}, headers=headers).status_code == 200
+    assert client.post(f'/add-task/{member_id}', json={"title": "Rydde", "price": 6}, headers=headers).status_code == 422
+    # Andre parametere gir også 422, selv om stien og body er de samme.
+    response = client.post(f'/add-task/{member_id}?x=1', json={"title": "Rydde", "price": 5}, headers=headers)
+    assert response.status_code == 422
+    # Nøkkelen gjelder per sti, så samme nøkkel på et annet medlem er en ny forespørsel.
+    assert client.post(f'/add-task/{other_id}', json={"title": "Rydde", "price": 5}, headers=headers).status_code == 200
+
+def test_forbidden_response_is_not_stored(app, client):
+    member_id = create_member(client)
+    client.post(f'/add-task/{member_id}', json={"title": "Rydde", "price": 5}, headers=auth_headers('admin-1'))
+    task_id = client.get(f'/member/{member_id}', headers=auth_headers('admin-1')).get_json()["tasks"][0]["id"]
+    body = {"items": [{"memberId": member_id, "taskId": task_id}]}
+
+    response = client.post('/batch/complete-tasks', json=body, headers=auth_headers('admin-1', Idempotency_Key='k2'))
+    assert response.status_code == 403 # Admin-PIN er ikke bekreftet.
+
+    with app.app_context():
+        elevation = issue_token('admin-1')
+    response = client.post('/batch/complete-tasks', json=body,
+                           headers=auth_headers('admin-1', Idempotency_Key='k2', X_Admin_Elevation=elevation))
+    assert response.status_code == 200
+    assert 'Idempotent-Replayed' not in response.headers
+    assert response.get_json()["results"][0]["money"] == 5
+
+def test_concurrent_requests_run_once():
+    store = IdempotencyStore(LocalCache(maxsize=16, ttl=60), wait_seconds=5)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def handler():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"status": 201, "body": b"ok", "mimetype": "text/plain"}
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        first = pool.submit(store.run, 'k', 'fp', handler)
+        started.wait(5)
+        others = [pool.submit(store.run, 'k', 'fp', handler) for _ in range(3)]
+        while store.coalesced < 3: # Alle tre venter på den første.
+            time.sleep(0.01)
+        release.set()
+        results = [first.result()] + [future.result() for future in others]
+
+    assert len(calls) == 1
+    assert results[0][1] is False and all(replayed for _, replayed in results[1:])
+    assert all(entry["body"] == b"ok" for entry, _ in results)
+    assert store.stats()["in_flight"] == 0
+
+def test_server_error_is_not_stored():
+    store = IdempotencyStore(LocalCache(maxsize=16, ttl=60), wait_seconds=5)
+    assert store.run('k', 'fp', lambda: {"status": 500, "body": b"", "mimetype": "text/plain"})[0]["status"] == 500
+    entry, replayed = store.run('k', 'fp', lambda: {"status": 200, "body": b"ok", "mimetype": "text/plain"})
+    assert entry["status"] == 200 and not replayed
@@ -0,0 +1,35 @@
+# test_logging.py - Tester request-ID og JSON-loggingen (logging_setup.py).
+
+import json
+import logging
+import queue
+from conftest import auth_headers
+from logging_setup import JsonFormatter, NonBlockingQueueHandler, RequestIdFilter, request_id
+
+def test_request_id_is_echoed_or_generated(client):
+    response = client.get('/members', headers=auth_headers('admin-1', X_Request_ID='abc-123'))
+    assert response.headers['X-Request-ID'] == 'abc-123'
+
+    generated = client.get('/members', headers=auth_headers('admin-1')).headers['X-Request-ID']
+    assert len(generated) == 32
+    assert request_id.get() is None # Nullstilt etter forespørselen.
+
+def test_record_gets_request_id_and_is_json():
+    record = logging.LogRecord('admin', logging.INFO, __file__, 1, "Medlem %s opprettet", ("m1",), None)
+    token = request_id.set('abc-123')
+    try:
+        RequestIdFilter().filter(record)
+    finally:
+        request_id.reset(token)
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["msg"] == "Medlem m1 opprettet"
+    assert entry["request_id"] == 'abc-123'
+    assert entry["level"] == "INFO"
+
+def test_full_queue_drops_records():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    for _ in range(3):
+        handler.handle(logging.LogRecord('admin', logging.INFO, __file__, 1, "melding", (), None))
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 2
@@ -0,0 +1,100 @@
+# test_member_cache.py - Tester at rutene som endrer et medlem tømmer lesecachen (member_cache.py).
+# Hver test leser /members og /member/<id> inn i cachen først, endrer medlemmet og leser på nytt.
+
+from conftest import auth_headers, create_member
+from elevation import issue_token
+
+def members(client):
+    return client.get('/members', headers=auth_headers('admin-1')).get_json()
+
+def member(client, member_id):
+    return client.get(f'/member/{member_id}', headers=auth_headers('admin-1')).get_json()
+
+def prime(client, member_id):
+    members(client)
+    return member(client, member_id)
+
+def elevated(app):
+    with app.app_context():
+        return auth_headers('admin-1', X_Admin_Elevation=issue_token('admin-1'))
+
+def add_task(client, member_id, title='Rydde', price=5):
+    client.post(f'/add-task/{member_id}', json={"title": title, "price": price}, headers=auth_headers('admin-1'))
+    return member(client, member_id)["tasks"][-1]["id"]
+
+def test_create_members(client):
+    create_member(client)
+    assert len(members(client)) == 1
+
+    create_member(client, name='Kari')
+    assert len(members(client)) == 2
+
+    body = {"members": [{"name": "Per", "code": "1111", "color": "red"}]}
+    client.post('/batch/create-members', json=body, headers=auth_headers('admin-1'))
+    assert sorted(data['name'] for data in members(client)) == ["Kari", "Ola", "Per"]
+
+def test_update_member(client):
+    member_id = create_member(client)
+    prime(client, member_id)
+
+    client.put(f'/update-member/{member_id}', json={"name": "Kari"}, headers=auth_headers('admin-1'))
+    assert member(client, member_id)["name"] == "Kari"
+    assert members(client)[0]["name"] == "Kari"
+
+def test_add_tasks(client):
+    member_id = create_member(client)
+    prime(client, member_id)
+
+    client.post(f'/add-task/{member_id}', json={"title": "Rydde", "price": 5}, headers=auth_headers('admin-1'))
+    assert [t["title"] for t in member(client, member_id)["tasks"]] == ["Rydde"]
+    assert len(members(client)[0]["tasks"]) == 1
+
+    body = {"items": [{"memberId": member_id, "title": "Handle", "price": 3}]}
+    client.post('/batch/add-tasks', json=body, headers=auth_headers('admin-1'))
+    assert [t["title"] for t in member(client, member_id)["tasks"]] == ["Rydde", "Handle"]
+    assert len(members(client)[0]["tasks"]) == 2
+
+def test_complete_tasks(app, client):
+    member_id = create_member(client)
+    first = add_task(client, member_id, price=5)
+    second = add_task(client, member_id, 'Handle', price=3)
+    prime(client, member_id)
+
+    client.post(f'/complete-task/{member_id}/{first}', headers=elevated(app))
+    assert member(client, member_id)["money"] == 5
+    assert members(client)[0]["money"] == 5
+
+    body = {"items": [{"memberId": member_id, "taskId": second}]}
+    client.post('/batch/complete-tasks', json=body, headers=elevated(app))
+    assert member(client, member_id)["money"] == 8
+    assert members(client)[0]["money"] == 8
+
+def test_purchase(app, client):
+    member_id = create_member(client)
+    task_id = add_task(client, member_id, price=5)
+    client.post(f'/complete-task/{member_id}/{task_id}', headers=elevated(app))
+    prime(client, member_id)
+
+    response = client.post('/purchase', json={"memberId": member_id, "itemId": "1"}, headers=auth_headers('admin-1'))
+    assert response.status_code == 200
+    assert member(client, member_id)["money"] == 2 # Hatten koster 3.
+    assert members(client)[0]["cosmetics"] == response.get_json()["new_cosmetics"]
+
+def test_compact_tasks(app, client):
+    member_id = create_member(client)
+    task_id = add_task(client, member_id)
+    client.post(f'/complete-task/{member_id}/{task_id}', headers=elevated(app))
+    prime(client, member_id)
+
+    response = client.post('/compact-tasks', json={"olderThanDays": 0}, headers=auth_headers('admin-1'))
+    assert response.get_json()["archived"] == 1
+    assert member(client, member_id)["tasks"] == []
+    assert members(client)[0]["tasks"] == []
+
+def test_delete_member(client):
+    member_id = create_member(client)
+    prime(client, member_id)
+
+    client.delete(f'/delete-member/{member_id}', headers=auth_headers('admin-1'))
+    assert members(client) == []
+    assert client.get(f'/member/{member_id}', headers=auth_headers('admin-1')).status_code == 404
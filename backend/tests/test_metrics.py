@@ -0,0 +1,73 @@
+# test_metrics.py - Tester /metrics og tellingen av Firestore-kall (metrics.py).
+
+from conftest import auth_headers
+from metrics import InstrumentedFirestore, begin_request, end_request
+
+# Navnene på klassene er det målingen ser på, som i google-cloud-firestore.
+class DocumentReference:
+    def __init__(self, doc_id):
+        self.id = doc_id
+
+    def get(self):
+        return {"id": self.id}
+
+class WriteBatch:
+    def __init__(self):
+        self.ops = []
+        self.committed = False
+
+    def set(self, ref, data):
+        self.ops.append(("set", ref, data))
+        return self
+
+    def delete(self, ref):
+        self.ops.append(("delete", ref))
+        return self
+
+    def commit(self):
+        self.committed = True
+        return ["ok"] * len(self.ops)
+
+class Client:
+    def document(self, doc_id):
+        return DocumentReference(doc_id)
+
+    def batch(self):
+        return WriteBatch()
+
+def test_metrics_is_hidden_without_token(client, monkeypatch):
+    monkeypatch.delenv('METRICS_TOKEN', raising=False)
+    monkeypatch.delenv('METRICS_PUBLIC', raising=False)
+    assert client.get('/metrics').status_code == 404
+
+    monkeypatch.setenv('METRICS_PUBLIC', '1')
+    assert client.get('/metrics').status_code == 200
+
+def test_metrics_requires_token(client, monkeypatch):
+    monkeypatch.setenv('METRICS_TOKEN', 'hemmelig')
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', headers=auth_headers('admin-1')).status_code == 403
+
+    response = client.get('/metrics', headers={"Authorization": "Bearer hemmelig"})
+    assert response.status_code == 200
+    assert 'firestore_operations_total' in response.get_data(as_text=True)
+
+def test_batch_writes_are_counted_on_commit():
+    client = InstrumentedFirestore(Client())
+    timings, token = begin_request()
+    try:
+        batch = client.batch()
+        batch.set(client.document('a'), {"x": 1})
+        batch.set(client.document('b'), {"x": 2})
+        batch.delete(client.document('c'))
+        assert timings.writes == 0 # Ingenting er sendt ennå.
+
+        batch.commit()
+        assert timings.writes == 3
+        # Biblioteket får de ekte referansene, ikke innpakningen.
+        assert all(isinstance(op[1], DocumentReference) for op in batch._target.ops)
+
+        client.document('a').get()
+        assert timings.reads == 1 and timings.writes == 3
+    finally:
+        end_request(token)
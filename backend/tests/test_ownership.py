@@ -0,0 +1,62 @@
+# test_ownership.py - Tester eierskapsindeksen (ownership.py) gjennom rutene.
+
+from conftest import auth_headers, create_member
+from ownership import ownership
+
+def test_owner_is_indexed_on_create(client, memory_store):
+    member_id = create_member(client, 'admin-1')
+    assert ownership.owner(member_id) == 'admin-1'
+
+    response = client.post(f'/add-task/{member_id}', json={"title": "Rydde", "price": 5},
+                           headers=auth_headers('admin-2'))
+    assert response.status_code == 403
+    assert memory_store.tasks.list(member_id) == []
+
+def test_unknown_member_is_404(client):
+    response = client.post('/add-task/finnes-ikke', json={"title": "Rydde", "price": 5},
+                           headers=auth_headers('admin-1'))
+    assert response.status_code == 404
+
+def test_delete_member_drops_index_entry(client):
+    member_id = create_member(client, 'admin-1')
+    assert client.delete(f'/delete-member/{member_id}', headers=auth_headers('admin-1')).status_code == 200
+
+    response = client.put(f'/update-member/{member_id}', json={"name": "Kari"}, headers=auth_headers('admin-1'))
+    assert response.status_code == 404
+
+def test_member_deleted_elsewhere_gives_404_and_no_orphans(client, memory_store):
+    first = create_member(client, 'admin-1')
+    second = create_member(client, 'admin-1', 'Kari')
+    # Slettet av en annen prosess, så indeksen her har fortsatt medlemmene.
+    memory_store.members.delete(first)
+    memory_store.members.delete(second)
+    assert ownership.owner(first) == 'admin-1'
+
+    response = client.post(f'/add-task/{first}', json={"title": "Rydde", "price": 5},
+                           headers=auth_headers('admin-1'))
+    assert response.status_code == 404
+    response = client.put(f'/update-member/{second}', json={"tasks": [{"id": "t1", "title": "Rydde", "price": 5}]},
+                          headers=auth_headers('admin-1'))
+    assert response.status_code == 404
+
+    assert memory_store.tasks.list(first) == []
+    assert memory_store.tasks.list(second) == []
+    # Indeksen er ryddet, så neste oppslag går til lagringen.
+    assert ownership.owner(first) is None
+    assert ownership.owner(second) is None
+
+def test_batch_reports_members_deleted_elsewhere_per_item(client, memory_store):
+    kept = create_member(client, 'admin-1')
+    deleted = create_member(client, 'admin-1', 'Kari')
+    memory_store.members.delete(deleted)
+
+    items = [{"memberId": kept, "title": "Rydde", "price": 5},
+             {"memberId": deleted, "title": "Støvsuge", "price": 3},
+             {"memberId": kept, "title": "Handle", "price": 2}]
+    response = client.post('/batch/add-tasks', json={"items": items}, headers=auth_headers('admin-1'))
+    assert response.status_code == 200
+    assert [result["status"] for result in response.get_json()["results"]] == [201, 404, 201]
+
+    assert [t['title'] for t in memory_store.tasks.list(kept)] == ["Rydde", "Handle"]
+    assert memory_store.tasks.list(deleted) == []
+    assert ownership.owner(deleted) is None
@@ -0,0 +1,69 @@
+# test_profile_cache.py - Tester profilcachen (profile_cache.py) gjennom /register, /login og /verify-pin.
+
+from types import SimpleNamespace
+import pytest
+import login, register
+from conftest import auth_headers
+from elevation import is_hashed
+from profile_cache import profile_cache
+
+@pytest.fixture
+def firebase(monkeypatch):
+    lookups = []
+
+    def create_user(email, password, display_name, app=None, **kwargs):
+        return SimpleNamespace(uid='admin-1', email=email)
+
+    def get_user_by_email(email, app=None):
+        lookups.append(email)
+        return SimpleNamespace(uid='admin-1', email=email)
+
+    monkeypatch.setattr(register.auth, 'create_user', create_user)
+    monkeypatch.setattr(login.auth, 'get_user_by_email', get_user_by_email)
+    monkeypatch.setattr(register, 'get_app', lambda: None)
+    monkeypatch.setattr(login, 'get_app', lambda: None)
+    return lookups
+
+def test_login_after_register_is_served_from_cache(client, memory_store, firebase, monkeypatch):
+    body = {"username": "ola", "email": "Ola@Example.com", "password": "hemmelig", "admin_pin": "1234"}
+    assert client.post('/register', json=body).status_code == 201
+
+    def fail(uid):
+        raise AssertionError("Profilen skulle vært i cachen")
+    monkeypatch.setattr(memory_store.users, 'get', fail)
+
+    response = client.post('/login', json={"email": "ola@example.com", "password": "hemmelig"})
+    assert response.status_code == 200
+    assert response.get_json()["uid"] == 'admin-1'
+    assert firebase == []
+
+def test_login_miss_is_cached(client, memory_store, firebase):
+    memory_store.users.create('admin-1', {"username": "ola", "admin_pin": "1234"})
+
+    for _ in range(2):
+        response = client.post('/login', json={"email": "ola@example.com", "password": "hemmelig"})
+        assert response.get_json()["username"] == "ola"
+    assert firebase == ["ola@example.com"]
+
+def test_pin_upgrade_invalidates_profile(client, memory_store):
+    memory_store.users.create('admin-1', {"username": "ola", "admin_pin": "1234"}) # Eldre PIN i klartekst.
+    assert profile_cache.by_uid('admin-1')["admin_pin"] == "1234"
+
+    response = client.post('/verify-pin', json={"pin": "1234"}, headers=auth_headers('admin-1'))
+    assert response.status_code == 200
+    assert is_hashed(memory_store.users.get('admin-1')["admin_pin"])
+    # Cachen har ikke lenger PIN-en i klartekst.
+    assert is_hashed(profile_cache.by_uid('admin-1')["admin_pin"])
+
+    response = client.post('/verify-pin', json={"pin": "1234"}, headers=auth_headers('admin-1'))
+    assert response.status_code == 200
+    assert client.post('/verify-pin', json={"pin": "0000"}, headers=auth_headers('admin-1')).status_code == 401
+
+def test_profile_changed_elsewhere_is_read_after_invalidate(client, memory_store):
+    memory_store.users.create('admin-1', {"username": "ola", "admin_pin": "1234"})
+    profile_cache.by_uid('admin-1')
+
+    memory_store.users.update('admin-1', {"username": "kari"})
+    assert profile_cache.by_uid('admin-1')["username"] == "ola" # Innenfor TTL.
+    profile_cache.invalidate('admin-1')
+    assert profile_cache.by_uid('admin-1')["username"] == "kari"
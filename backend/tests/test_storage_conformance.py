@@ -0,0 +1,398 @@
+# test_storage_conformance.py - Felles tester som alle lagringslagene må bestå.
+# Minne og SQLite kjøres alltid. Firestore kjøres kun mot emulatoren (FIRESTORE_EMULATOR_HOST).
+
+import os
+import time
+import uuid
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from storage import create_store
+from storage.base import DELETE_FIELD, encode_cursor, decode_cursor, task_record, public_task, empty_stats, stable_id
+from storage.base import MemberNotFound, TaskNotFound, AccessDenied, InsufficientFunds
+
+BACKENDS = ['memory', 'sqlite']
+if os.getenv('FIRESTORE_EMULATOR_HOST'):
+    BACKENDS.append('firestore')
+
+@pytest.fixture(params=BACKENDS)
+def store(request, monkeypatch):
+    if request.param == 'sqlite':
+        monkeypatch.setenv('SQLITE_PATH', ':memory:')
+    if request.param == 'firestore':
+        from google.cloud import firestore
+        from storage.firestore_store import FirestoreStore
+        s = FirestoreStore(firestore.Client(project='conformance-test'))
+    else:
+        s = create_store(request.param)
+    yield s
+    s.close()
+
+# Unike admin-ID-er slik at testene ikke ser hverandres data i emulatoren.
+def new_admin():
+    return f'admin-{uuid.uuid4().hex}'
+
+def new_member(admin_id='admin-1', name='Ola'):
+    return {
+        "name": name,
+        "code": "1234",
+        "money": 0,
+        "tasks": [],
+        "character": {"type": "pinnefigur", "color": "blue"},
+        "adminId": admin_id,
+    }
+
+def test_create_and_get_member(store):
+    member_id = store.members.create(new_member())
+    assert isinstance(member_id, str) and member_id
+
+    member = store.members.get(member_id)
+    assert member["name"] == "Ola"
+    assert member["adminId"] == "admin-1"
+    assert store.members.get("finnes-ikke") is None
+
+def test_list_by_admin_only_returns_own_members(store):
+    admin_id = new_admin()
+    own = store.members.create(new_member(admin_id, 'Ola'))
+    store.members.create(new_member(new_admin(), 'Kari'))
+
+    listed = dict(store.members.list_by_admin(admin_id))
+    assert list(listed) == [own]
+    assert listed[own]["name"] == "Ola"
+
+def test_list_by_admin_pages_and_fields(store):
+    admin_id = new_admin()
+    created = sorted(store.members.create(new_member(admin_id, f'Barn {i}')) for i in range(5))
+
+    first = list(store.members.list_by_admin(admin_id, limit=2))
+    assert [member_id for member_id, _ in first] == created[:2]
+    rest = list(store.members.list_by_admin(admin_id, after=first[-1][0]))
+    assert [member_id for member_id, _ in rest] == created[2:]
+
+    projected = list(store.members.list_by_admin(admin_id, limit=1, fields=['name', 'money']))
+    assert [member_id for member_id, _ in projected] == created[:1]
+    assert set(projected[0][1]) == {"name", "money"}
+
+def test_list_tasks_by_members(store):
+    admin_id = new_admin()
+    first = store.members.create(new_member(admin_id))
+    second = store.members.create(new_member(admin_id))
+    store.tasks.add(first, admin_id, {"id": "t1", "title": "Rydde", "price": 5})
+    store.tasks.add(first, admin_id, {"id": "t2", "title": "Støvsuge", "price": 3})
+
+    tasks = store.tasks.list_by_members([first, second])
+    assert [task["title"] for task in tasks[first]] == ["Rydde", "Støvsuge"]
+    assert second not in tasks
+
+def test_update_supports_nested_paths(store):
+    member_id = store.members.create(new_member())
+
+    assert store.members.update(member_id, {"character.color": "red", "money": 5})
+    member = store.members.get(member_id)
+    assert member["character"] == {"type": "pinnefigur", "color": "red"}
+    assert member["money"] == 5
+
+    assert not store.members.update("finnes-ikke", {"money": 1})
+
+    store.members.update(member_id, {"tasks": DELETE_FIELD})
+    assert "tasks" not in store.members.get(member_id)
+
+def test_returned_documents_are_copies(store):
+    member_id = store.members.create(new_member())
+    store.members.get(member_id)["name"] = "Endret"
+    assert store.members.get(member_id)["name"] == "Ola"
+
+def test_delete_member(store):
+    admin_id = new_admin()
+    member_id = store.members.create(new_member(admin_id))
+    store.members.delete(member_id)
+    assert store.members.get(member_id) is None
+    assert list(store.members.list_by_admin(admin_id)) == []
+
+def new_task(task_id, title='Rydde rommet', price=10, **extra):
+    return dict({"id": task_id, "title": title, "price": price, "completed": False}, **extra)
+
+def test_add_and_list_tasks(store):
+    admin_id = new_admin()
+    member_id = store.members.create(new_member(admin_id))
+    other_id = store.members.create(new_member(admin_id, 'Kari'))
+
+    store.tasks.add(member_id, admin_id, new_task('t1', createdAt=1))
+    store.tasks.add_many(member_id, admin_id, [new_task('t3', createdAt=2), new_task('t2', createdAt=2)])
+    store.tasks.add(other_id, admin_id, new_task('t4', createdAt=3))
+
+    assert [t['id'] for t in store.tasks.list(member_id)] == ['t1', 't2', 't3']
+    assert store.tasks.get('t4')['memberId'] == other_id
+    assert store.tasks.get('finnes-ikke') is None
+
+    by_member = store.tasks.list_by_admin(admin_id)
+    assert [t['id'] for t in by_member[member_id]] == ['t1', 't2', 't3']
+    assert [t['id'] for t in by_member[other_id]] == ['t4']
+
+def test_task_pages(store):
+    admin_id = new_admin()
+    member_id = store.members.create(new_member(admin_id))
+    store.tasks.add_many(member_id, admin_id, [new_task(f't{i}', createdAt=i) for i in range(5)])
+
+    first = store.tasks.list(member_id, limit=2)
+    assert [t['id'] for t in first] == ['t0', 't1']
+    rest = store.tasks.list(member_id, limit=10, after=decode_cursor(encode_cursor(first[-1])))
+    assert [t['id'] for t in rest] == ['t2', 't3', 't4']
+
+def test_complete_task(store):
+    admin_id = new_admin()
+    member_id = store.members.create(new_member(admin_id))
+    store.tasks.add(member_id, admin_id, new_task('t1', price=10))
+
+    task, added, money = store.tasks.complete(member_id, 't1', admin_id=admin_id)
+    assert task['completed'] and added == 10 and money == 10
+    assert store.members.get(member_id)['money'] == 10
+
+    # En fullført oppgave gir ikke penger to ganger.
+    assert store.tasks.complete(member_id, 't1')[1:] == (0, 10)
+    assert store.members.get(member_id)['money'] == 10
+
+    assert [t['id'] for t in store.tasks.list(member_id, completed=True)] == ['t1']
+    assert store.tasks.list(member_id, completed=False) == []
+
+    with pytest.raises(TaskNotFound):
+        store.tasks.complete(member_id, 'finnes-ikke')
+    with pytest.raises(AccessDenied):
+        store.tasks.complete(member_id, 't1', admin_id=new_admin())
+    with pytest.raises(MemberNotFound):
+        store.tasks.complete('finnes-ikke', 't1')
+
+def test_archive_completed_tasks(store):
+    admin_id = new_admin()
+    member_id = store.members.create(new_member(admin_id))
+    store.tasks.add_many(member_id, admin_id, [new_task(f't{i}', price=i, createdAt=i) for i in range(4)])
+    for task_id in ('t1', 't2', 't3'):
+        store.tasks.complete(member_id, task_id)
+
+    # Ingenting er fullført før tidspunktet, og åpne oppgaver arkiveres aldri.
+    assert store.tasks.archive(member_id, completed_before=0) == []
+
+    archived = store.tasks.archive(member_id, completed_before=time.time() + 60, limit=2)
+    assert [t['id'] for t in archived] == ['t1', 't2']
+    archived = store.tasks.archive(member_id, completed_before=time.time() + 60, limit=2)
+    assert [t['id'] for t in archived] == ['t3']
+    assert store.tasks.archive(member_id, completed_before=time.time() + 60) == []
+
+    assert [t['id'] for t in store.tasks.list(member_id)] == ['t0']
+    assert store.members.get(member_id)['history'] == {"count": 3, "earned": 6}
+    assert store.members.get(member_id)['money'] == 6
+
+    first = store.history.list(member_id, limit=2)
+    assert [t['id'] for t in first] == ['t1', 't2']
+    rest = store.history.list(member_id, after=decode_cursor(encode_cursor(first[-1])))
+    assert [t['id'] for t in rest] == ['t3']
+
+    with pytest.raises(MemberNotFound):
+        store.tasks.archive('finnes-ikke', completed_before=time.time())
+
+    store.history.delete_for_member(member_id)
+    assert store.history.list(member_id) == []
+
+def test_concurrent_completions_do_not_lose_money(store):
+    admin_id = new_admin()
+    member_id = store.members.create(new_member(admin_id))
+    store.tasks.add_many(member_id, admin_id, [new_task(f't{i}', price=1) for i in range(20)])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: store.tasks.complete(member_id, f't{i % 20}', admin_id), range(40)))
+
+    assert store.members.get(member_id)['money'] == 20
+
+def test_batch_operations(store):
+    admin_id = new_admin()
+    first, second = store.members.create_many([new_member(admin_id, 'Ola'), new_member(admin_id, 'Kari')])
+    assert {m for m, _ in store.members.list_by_admin(admin_id)} == {first, second}
+
+    store.tasks.insert([task_record(first, admin_id, new_task('b1', price=2), 1),
+                        task_record(second, admin_id, new_task('b2', price=3), 1)])
+    results = store.tasks.complete_many([(first, 'b1'), (second, 'b2'), (second, 'b2'), (first, 'b2')], admin_id)
+
+    assert results[0][1:] == (2, 2)
+    assert results[1][1:] == (3, 3)
+    assert results[2][1:] == (0, 3) # Samme oppgave to ganger gir bare penger én gang.
+    assert isinstance(results[3], TaskNotFound)
+    assert store.members.get(first)['money'] == 2
+    assert store.members.get(second)['money'] == 3
+
+def test_purchase(store):
+    admin_id = new_admin()
+    member_id = store.members.create(dict(new_member(admin_id), money=10))
+
+    money, cosmetics = store.members.purchase(member_id, admin_id, 'hatt', 4.0)
+    assert money == 6 and cosmetics == ['hatt']
+    member = store.members.get(member_id)
+    assert member['money'] == 6 and member['cosmetics'] == ['hatt']
+
+    with pytest.raises(InsufficientFunds):
+        store.members.purchase(member_id, admin_id, 'sko', 7.0)
+    with pytest.raises(AccessDenied):
+        store.members.purchase(member_id, new_admin(), 'sko', 1.0)
+    with pytest.raises(MemberNotFound):
+        store.members.purchase('finnes-ikke', admin_id, 'sko', 1.0)
+    assert store.members.get(member_id)['money'] == 6
+
+def test_stats_counters(store):
+    admin_id = new_admin()
+    member_id = store.members.create(dict(new_member(admin_id), money=10))
+    assert store.stats.get(admin_id) == empty_stats()
+
+    store.tasks.add(member_id, admin_id, new_task('t1', price=5))
+    store.tasks.add_many(member_id, admin_id, [new_task('t2', price=3), new_task('t3', price=2)])
+    store.tasks.complete(member_id, 't1')
+    store.tasks.complete(member_id, 't1') # Allerede fullført, teller ikke.
+    store.tasks.complete_many([(member_id, 't2'), (member_id, 'finnes-ikke')])
+    store.members.purchase(member_id, admin_id, 'hatt', 4.0)
+
+    expected = {"tasksAdded": 3, "tasksCompleted": 2, "earned": 8, "purchases": 1, "spent": 4}
+    assert store.members.get(member_id)['stats'] == expected
+    assert store.stats.get(admin_id) == expected
+
+    other_id = store.members.create(new_member(admin_id, 'Kari'))
+    store.tasks.add(other_id, admin_id, new_task('t4'))
+    assert store.stats.get(admin_id)['tasksAdded'] == 4
+
+    store.stats.set(admin_id, empty_stats())
+    assert store.stats.get(admin_id) == empty_stats()
+
+def test_replace_tasks(store):
+    admin_id = new_admin()
+    member_id = store.members.create(new_member(admin_id))
+    store.tasks.add_many(member_id, admin_id, [new_task('t1', createdAt=1), new_task('t2', createdAt=2)])
+
+    store.tasks.replace(member_id, admin_id, [new_task('t1', title='Ny tittel'), new_task('t3')])
+    tasks = {t['id']: t for t in store.tasks.list(member_id)}
+    assert set(tasks) == {'t1', 't3'}
+    assert tasks['t1']['title'] == 'Ny tittel'
+
+    store.tasks.delete_for_member(member_id)
+    assert store.tasks.list(member_id) == []
+
+def test_archive_tasks_without_completed_at(store):
+    admin_id = new_admin()
+    member_id = store.members.create(new_member(admin_id))
+    # Oppgaver fullført før completedAt fantes regnes som fullført ved createdAt.
+    legacy = [dict(new_task(f'gammel{i}', price=1, completed=True, createdAt=i), memberId=member_id, adminId=admin_id)
+              for i in (1, 2, 3)]
+    store.tasks.insert(legacy, count_stats=False)
+    store.tasks.add(member_id, admin_id, new_task('ny', createdAt=0))
+    store.tasks.complete(member_id, 'ny') # Opprettet først, men fullført nå.
+
+    assert [t['id'] for t in store.tasks.archive(member_id, completed_before=10, limit=2)] == ['gammel1', 'gammel2']
+    assert [t['id'] for t in store.tasks.archive(member_id, completed_before=10, limit=2)] == ['gammel3']
+    assert store.tasks.archive(member_id, completed_before=10) == []
+    assert [t['id'] for t in store.tasks.archive(member_id, completed_before=time.time() + 60)] == ['ny']
+
+    # Nye fullførte poster får alltid completedAt.
+    assert task_record(member_id, admin_id, new_task('t1', completed=True), 7)['completedAt'] == 7
+    assert 'completedAt' not in task_record(member_id, admin_id, new_task('t2'), 7)
+
+    store.history.delete_for_member(member_id)
+
+def test_replace_keeps_status_and_price(store):
+    admin_id = new_admin()
+    member_id = store.members.create(new_member(admin_id))
+    store.tasks.add_many(member_id, admin_id, [new_task('t1', price=5, createdAt=1), new_task('t2', createdAt=2)])
+    store.tasks.complete(member_id, 't1', admin_id=admin_id)
+
+    # En gammel liste fra klienten: t1 er fortsatt åpen, t2 er fullført og har ny pris.
+    stored = store.tasks.replace(member_id, admin_id, [
+        new_task('t1', title='Ny tittel', price=50),
+        new_task('t2', price=99, completed=True, completedAt=5),
+        new_task('t3', completed=True),
+    ])
+    tasks = {t['id']: t for t in store.tasks.list(member_id)}
+    assert tasks['t1']['completed'] is True and tasks['t1']['price'] == 5
+    assert tasks['t1']['title'] == 'Ny tittel'
+    assert tasks['t2']['completed'] is False and tasks['t2']['price'] == 10
+    assert 'completedAt' not in tasks['t2']
+    assert tasks['t3']['completed'] is False # Nye oppgaver starter som åpne.
+    assert stored == [public_task(tasks[task_id]) for task_id in ('t1', 't2', 't3')]
+
+def test_task_writes_require_member(store):
+    admin_id = new_admin()
+    member_id = store.members.create(new_member(admin_id))
+
+    with pytest.raises(MemberNotFound):
+        store.tasks.add('finnes-ikke', admin_id, new_task('t1'))
+    with pytest.raises(MemberNotFound):
+        store.tasks.replace('finnes-ikke', admin_id, [new_task('t2')])
+    # Ingenting skrives når ett av medlemmene mangler, heller ikke for medlemmet som finnes.
+    with pytest.raises(MemberNotFound):
+        store.tasks.insert([task_record(member_id, admin_id, new_task('t3'), 1),
+                            task_record('finnes-ikke', admin_id, new_task('t4'), 2)])
+
+    assert store.tasks.list(member_id) == []
+    assert store.tasks.list('finnes-ikke') == []
+    assert store.stats.get(admin_id)['tasksAdded'] == 0
+
+def test_insert_without_stats(store):
+    admin_id = new_admin()
+    member_id = store.members.create(new_member(admin_id))
+    store.tasks.insert([task_record(member_id, admin_id, new_task('t1'), 1)], count_stats=False)
+
+    assert [t['id'] for t in store.tasks.list(member_id)] == ['t1']
+    assert store.stats.get(admin_id)['tasksAdded'] == 0
+    assert store.members.get(member_id).get('stats', {}).get('tasksAdded', 0) == 0
+    with pytest.raises(MemberNotFound):
+        store.tasks.insert([task_record('finnes-ikke', admin_id, new_task('t2'), 2)], count_stats=False)
+
+def test_insert_skip_missing(store):
+    admin_id = new_admin()
+    member_id = store.members.create(new_member(admin_id))
+    records = [task_record(member_id, admin_id, new_task('t1'), 1),
+               task_record('finnes-ikke', admin_id, new_task('t2'), 2),
+               task_record(member_id, admin_id, new_task('t3'), 3)]
+
+    assert store.tasks.insert_skip_missing(records) == {'finnes-ikke'}
+    assert [t['id'] for t in store.tasks.list(member_id)] == ['t1', 't3']
+    assert store.tasks.list('finnes-ikke') == []
+    assert store.stats.get(admin_id)['tasksAdded'] == 2
+
+def test_insert_missing(store):
+    admin_id = new_admin()
+    member_id = store.members.create(new_member(admin_id))
+    store.tasks.add(member_id, admin_id, new_task('t1', title='Original'))
+
+    records = [task_record(member_id, admin_id, new_task('t1', title='Ny'), 1),
+               task_record(member_id, admin_id, new_task('t2', completed=True), 2),
+               task_record(member_id, admin_id, new_task('t2', completed=True), 3)]
+    assert [r['id'] for r in store.tasks.insert_missing(records)] == ['t2']
+    assert store.tasks.get('t1')['title'] == 'Original'
+    # Fullførte oppgaver fra f.eks. import teller også som fullført og tjent.
+    assert store.stats.get(admin_id)['tasksAdded'] == 2
+    assert store.stats.get(admin_id)['tasksCompleted'] == 1
+    assert store.stats.get(admin_id)['earned'] == 10
+
+    assert store.tasks.insert_missing(records) == []
+    assert store.stats.get(admin_id)['tasksAdded'] == 2
+
+def test_users(store):
+    assert store.users.get('uid-1') is None
+    store.users.create('uid-1', {"username": "admin", "email": "a@b.no", "admin_pin": "1234"})
+
+    assert store.users.get('uid-1')["username"] == "admin"
+    assert store.users.update('uid-1', {"admin_pin": "4321"})
+    assert store.users.get('uid-1')["admin_pin"] == "4321"
+    assert not store.users.update('uid-2', {"admin_pin": "0000"})
+
+def test_put_many_and_iter_users(store):
+    admin_id = new_admin()
+    member_id = stable_id('member', admin_id, 'm1')
+    assert member_id == stable_id('member', admin_id, 'm1')
+    assert store.members.put_many([(member_id, new_member(admin_id))]) == [member_id]
+
+    # Samme ID igjen skriver over i stedet for å lage et nytt medlem, men tellerne og historikken beholdes.
+    store.tasks.add(member_id, admin_id, new_task('t1'))
+    store.members.update(member_id, {"history": {"count": 2, "earned": 7}})
+    store.members.put_many([(member_id, new_member(admin_id, 'Kari'))])
+    members = list(store.members.list_by_admin(admin_id))
+    assert [(m_id, data['name']) for m_id, data in members] == [(member_id, 'Kari')]
+    assert members[0][1]['stats']['tasksAdded'] == 1
+    assert members[0][1]['history'] == {"count": 2, "earned": 7}
+
+    store.users.create(admin_id, {"username": "admin", "email": "a@b.no", "admin_pin": "1234"})
+    assert dict(store.users.iter_all())[admin_id]["username"] == "admin"
@@ -0,0 +1,42 @@
+# test_update_member.py - Tester oppgavelisten i /update-member (tasks.replace).
+
+from conftest import auth_headers, create_member
+from elevation import issue_token
+
+def test_stale_task_list_does_not_pay_twice(app, client, memory_store):
+    member_id = create_member(client)
+    client.post(f'/add-task/{member_id}', json={"title": "Rydde", "price": 5}, headers=auth_headers('admin-1'))
+    stale = client.get(f'/member/{member_id}', headers=auth_headers('admin-1')).get_json()["tasks"]
+    task_id = stale[0]["id"]
+
+    with app.app_context():
+        elevated = auth_headers('admin-1', X_Admin_Elevation=issue_token('admin-1'))
+    assert client.post(f'/complete-task/{member_id}/{task_id}', headers=elevated).status_code == 200
+
+    # Klienten sender lista den hadde før oppgaven ble fullført.
+    response = client.put(f'/update-member/{member_id}', json={"tasks": stale}, headers=auth_headers('admin-1'))
+    assert response.status_code == 200
+    assert memory_store.tasks.get(task_id)['completed'] is True
+
+    client.post(f'/complete-task/{member_id}/{task_id}', headers=elevated)
+    assert memory_store.members.get(member_id)['money'] == 5
+
+def test_client_cannot_complete_or_reprice_tasks(client, memory_store):
+    member_id = create_member(client)
+    client.post(f'/add-task/{member_id}', json={"title": "Rydde", "price": 5}, headers=auth_headers('admin-1'))
+    task = client.get(f'/member/{member_id}', headers=auth_headers('admin-1')).get_json()["tasks"][0]
+
+    tasks = [dict(task, completed=True, price=100, title="Rydde rommet")]
+    response = client.put(f'/update-member/{member_id}', json={"tasks": tasks}, headers=auth_headers('admin-1'))
+    assert response.status_code == 200
+    stored = memory_store.tasks.get(task["id"])
+    assert (stored['completed'], stored['price'], stored['title']) == (False, 5, "Rydde rommet")
+    assert memory_store.stats.get('admin-1')['tasksCompleted'] == 0
+
+def test_task_without_id_is_400(client, memory_store):
+    member_id = create_member(client)
+    for tasks in ([{"title": "Rydde", "price": 5}], [{"id": "", "title": "Rydde"}], ["t1"]):
+        response = client.put(f'/update-member/{member_id}', json={"name": "Kari", "tasks": tasks},
+                              headers=auth_headers('admin-1'))
+        assert response.status_code == 400
+    assert memory_store.members.get(member_id)['name'] == "Ola" # Ingenting er skrevet.
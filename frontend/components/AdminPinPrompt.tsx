@@ -13,6 +13,7 @@ import {
 } from "react-native";
 import LinearGradient from "react-native-linear-gradient";  // For bakgrunnsgradient.
 import auth from "@react-native-firebase/auth";             // Henter ID-token.
+import { useAppContext } from "../context/AppContext";      // Lagrer admin-tokenet fra backend.
 
 // Props som forventes.
 type Props = {
@@ -24,6 +25,7 @@ type Props = {
 // Hovedkomponent.
 export default function AdminPinPrompt({ visible, onSuccess, onCancel }: Props) {
   const [pin, setPin] = useState(""); // Inputfelt for PIN.
+  const { setElevation } = useAppContext();
 
   // Sjekker PIN mot backend.
   const handleConfirm = async () => {
@@ -43,6 +45,7 @@ export default function AdminPinPrompt({ visible, onSuccess, onCancel }: Props)
 
       const data = await response.json();  
       if (response.ok) {
+        setElevation(data.elevationToken, data.expiresIn); // Admin-handlinger krever ikke ny PIN før tokenet utløper.
         onSuccess();                           // Kaller tilbake skjerm, basert på hvor PIN skal navigeres.
       } else {
         Alert.alert("Feil", "Ugyldig PIN. Prøv igjen.");
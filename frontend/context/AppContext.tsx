@@ -2,7 +2,7 @@
 // Håndterer innloggingssatus, medlemshåndtering, API-kall og admin-PIN.
 // Tilgjengelig i hele appen gjennom useAppContext().
 
-import React, { createContext, useContext, useState, useEffect, ReactNode, } from 'react';
+import React, { createContext, useContext, useState, useEffect, useRef, ReactNode, } from 'react';
 import { Alert } from 'react-native';
 import AdminPinPrompt from '../components/AdminPinPrompt';
 import { authInstance } from '../firebase';
@@ -44,6 +44,8 @@ type AppContextType = {
   getCurrentAdminId: () => string | null; 
   refreshMember: (memberId: string) => Promise<void>;
   completeTask: (memberId: string, taskId: string) => Promise<void>;
+  setElevation: (token: string, expiresIn: number) => void;
+  hasElevation: () => boolean;
 };
 
 // Oppretter en React-kontekst med en udefinert startverdi.
@@ -55,6 +57,18 @@ export const AppProvider = ({ children }: { children: ReactNode }) => {
   const [isAdmin, setIsAdmin] = useState(false);
   const [members, setMembers] = useState<Member[]>([]);
   const [showPinPrompt, setShowPinPrompt] = useState(false);
+  // Admin-token fra /verify-pin. Sendes med admin-handlinger til det utløper.
+  const elevation = useRef<{ token: string; expiresAt: number } | null>(null);
+
+  // Lagrer admin-tokenet. Utløpet settes litt tidligere enn i backend for å unngå avvisning underveis.
+  const setElevation = (token: string, expiresIn: number) => {
+    elevation.current = token ? { token, expiresAt: Date.now() + (expiresIn - 10) * 1000 } : null;
+  };
+
+  // Sjekker om det finnes et gyldig admin-token.
+  const hasElevation = () => {
+    return !!elevation.current && elevation.current.expiresAt > Date.now();
+  };
   
   // Henter token fra Firebase og bygger header med autorisasjon.
   const getAuthHeader = async () => {
@@ -161,14 +175,23 @@ export const AppProvider = ({ children }: { children: ReactNode }) => {
         method: 'POST',
         headers: {
           Authorization: `Bearer ${token}`,
+          'X-Admin-Elevation': elevation.current?.token ?? '',
         },
       });
 
       const data = await res.json();
+      if (res.status === 403) {
+        elevation.current = null; // Tokenet er utløpt eller ugyldig, så PIN må bekreftes på nytt.
+      }
       if (res.ok) {
         setMembers(prev =>
           prev.map(m =>
-            m.id === memberId ? {...m, tasks: data.UpdatedMember.tasks, money: data.UpdatedMember.money} : m 
+            m.id === memberId ? {
+              ...m,
+              // Backend returnerer kun oppgaven som ble fullført, så den byttes ut i den lokale lista.
+              tasks: m.tasks.map(t => t.id === taskId ? data.UpdatedMember.task : t),
+              money: data.UpdatedMember.money,
+            } : m
       )
     );
   } else {
@@ -257,6 +280,8 @@ export const AppProvider = ({ children }: { children: ReactNode }) => {
         getCurrentAdminId,
         refreshMember,
         completeTask,
+        setElevation,
+        hasElevation,
       }}
     >
       {children}
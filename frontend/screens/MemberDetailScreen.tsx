@@ -21,8 +21,10 @@ import AdminPinPrompt from '../components/AdminPinPrompt';   // For å bekrefte
 
 type Props = NativeStackScreenProps<RootStackParamList, 'MemberDetail'>;
 
-// Tilgjengelige varer i butikken.
-const shopItems = [
+type ShopItem = { id: string; name: string; price: number };
+
+// Varer i butikken. Brukes til katalogen er hentet fra backend (GET /catalog).
+const defaultShopItems: ShopItem[] = [
   { id: '1', name: '🎩 Hatt', price: 3 },
   { id: '2', name: '🕶️ Briller', price: 5 },
   { id: '3', name: '👕T-skjorte', price: 2 },
@@ -35,7 +37,7 @@ export default function MemberDetailScreen({ route, navigation }: Props) {
   const { memberId } = route.params;
   // Henter funksjoner og medlemsdata.
   const { refreshMember } = useAppContext();
-  const { members, updateMember, completeTask } = useAppContext();
+  const { members, updateMember, completeTask, hasElevation } = useAppContext();
   const member = members.find((m) => m.id === memberId);
   // Lokale states.
   const [enteredCode, setEnteredCode] = useState('');
@@ -43,12 +45,25 @@ export default function MemberDetailScreen({ route, navigation }: Props) {
   const [activeTab, setActiveTab] = useState<'tasks' | 'shop'>('tasks');
   const [showPinPrompt, setShowPinPrompt] = useState(false);
   const [taskToComplete, setTaskToComplete] = useState<string |null>(null);
+  const [shopItems, setShopItems] = useState<ShopItem[]>(defaultShopItems);
 
   // Henter den oppdaterte informasjonen om medlem når skjermen åpnes.
   useEffect(() => {
     refreshMember(memberId);
   }, [memberId]);
 
+  // Henter varekatalogen fra backend, slik at prisene er de samme som ved kjøp.
+  useEffect(() => {
+    fetch("http://<DIN_IP_ELLER_HOST>:3000/catalog")
+      .then((res) => (res.ok ? res.json() : null))
+      .then((data) => {
+        if (data && Array.isArray(data.items)) {
+          setShopItems(data.items);
+        }
+      })
+      .catch((error) => console.error('Feil ved henting av katalog:', error));
+  }, []);
+
   // Viser til fallback hvis medlemmet ikke finnes.
   if (!memberId || !member) {
     return (
@@ -61,7 +76,7 @@ export default function MemberDetailScreen({ route, navigation }: Props) {
   const equipped = member.equippedCosmetics || [];
 
   // Logikken for kjøp knyttet til de kosmetiske elementene i butikken.
-  const handlePurchase = async (item: { id: string; name: string; price: number}) => {
+  const handlePurchase = async (item: ShopItem) => {
     try {
       console.log("Kjører handlePurchase", item);
 
@@ -78,7 +93,7 @@ export default function MemberDetailScreen({ route, navigation }: Props) {
           Authorization: `Bearer ${token}`,
         },
         body: JSON.stringify({
-          item: item,
+          itemId: item.id,
           memberId: member.id,
         }),
       });
@@ -194,6 +209,11 @@ export default function MemberDetailScreen({ route, navigation }: Props) {
                   {!task.completed && (
                     <TouchableOpacity
                     onPress={() => {
+                      // PIN trengs bare hvis admin-tokenet fra forrige bekreftelse har utløpt.
+                      if (hasElevation()) {
+                        completeTask(member.id, task.id);
+                        return;
+                      }
                       setTaskToComplete(task.id);
                       setShowPinPrompt(true);
                     }}